@@ -1,34 +1,9 @@
 import argparse
-from chart_generator import generate_price_chart, generate_availability_chart, generate_correlation_chart
-from strategy_analyzer import (generate_strategy_trend, compare_strategies,
-                               generate_strategy_report, analyze_strategy_performance)
-import matplotlib as mpl
+import config
 
-import matplotlib.pyplot as plt
+# pandas / matplotlib 及图表模块只在所选命令需要时导入（--help 与简单报告无需加载绘图库）
 
 
-def set_chinese_font():
-    """设置中文字体，返回是否成功"""
-    try:
-        # 方法1: 直接设置 rcParams（推荐）
-        plt.rcParams['font.family'] = 'sans-serif'
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei']
-        plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-
-        # 方法2: 使用 FontProperties 对象（如果需要单独设置）
-        # 注意：这里不需要访问 .name 属性
-        # chinese_font = fm.FontProperties(fname='path/to/SimHei.ttf')
-        # 然后在绘图时使用：plt.title("标题", fontproperties=chinese_font)
-
-        print("中文字体设置成功")
-        return True
-    except Exception as e:
-        print(f"设置中文字体失败: {e}")
-        return False
-
-# 在绘图前调用
-set_chinese_font()
-
 def main():
     parser = argparse.ArgumentParser(description="魔兽世界市场数据分析工具")
     subparsers = parser.add_subparsers(dest="command", help="可用命令")
@@ -52,6 +27,20 @@ def main():
     corr_parser.add_argument("--days", type=int, default=30, help="分析天数 (默认: 30)")
     corr_parser.add_argument("--output", default="price_correlation.png", help="输出文件名")
 
+    # 全部物品相关性矩阵
+    matrix_parser = subparsers.add_parser("correlation-matrix", help="全部物品的价格相关性矩阵热力图、相关性最强的物品对及滚动相关")
+    matrix_parser.add_argument("items", nargs="*", help="物品名称列表 (默认: 全部有历史数据的物品)")
+    matrix_parser.add_argument("--days", type=int, default=30, help="分析天数 (默认: 30)")
+    matrix_parser.add_argument("--freq", help="对齐网格间隔，如 5min / h / D (默认: 按天数所选K线层级)")
+    matrix_parser.add_argument("--tolerance", help="as-of 对齐容差，如 10min (默认: 两个网格间隔)")
+    matrix_parser.add_argument("--window", type=int, help="滚动相关窗口网格点数 (默认: config.CORRELATION_WINDOW)")
+    matrix_parser.add_argument("--top", type=int, default=20, help="输出相关性最强的物品对数 (默认: 20)")
+    matrix_parser.add_argument("--returns", action="store_true", help="计算对数收益而不是价格水平的相关性")
+    matrix_parser.add_argument("--output", default="correlation_matrix.png", help="热力图输出文件名")
+    matrix_parser.add_argument("--pairs-output", default="correlation_pairs.csv", help="物品对排名输出文件名")
+    matrix_parser.add_argument("--matrix-output", help="完整相关矩阵 CSV 输出文件名")
+    matrix_parser.add_argument("--rolling-output", help="物品对滚动相关序列 CSV 输出文件名")
+
     # 策略分析命令
     strategy_parser = subparsers.add_parser("strategy", help="策略收益分析")
     strategy_subparsers = strategy_parser.add_subparsers(dest="strategy_command", help="策略分析命令")
@@ -76,33 +65,127 @@ def main():
     report_parser.add_argument("--days", type=int, default=30, help="分析天数 (默认: 30)")
     report_parser.add_argument("--output", default="strategy_report.csv", help="输出文件名")
 
+    # 重建策略聚合
+    strategy_subparsers.add_parser("rebuild-aggregates", help="从策略历史重新生成按天的策略聚合")
+
     # 完整策略分析
     analyze_parser = strategy_subparsers.add_parser("analyze", help="完整策略分析")
     analyze_parser.add_argument("strategy", help="策略名称")
     analyze_parser.add_argument("--ore", help="矿石名称")
     analyze_parser.add_argument("--days", type=int, default=90, help="分析天数 (默认: 90)")
 
+    # 历史回测
+    backtest_parser = subparsers.add_parser("backtest", help="回测历史数据中的所有策略")
+    backtest_parser.add_argument("--start", help="开始时间 (如 2025-08-01)")
+    backtest_parser.add_argument("--end", help="结束时间 (如 2025-08-31，只给日期时包含当天)")
+    backtest_parser.add_argument("--output", default="backtest_results.csv", help="输出文件名 (.csv 或 .parquet，后者需要 pyarrow)")
+
+    # 列式历史导出为 CSV
+    export_parser = subparsers.add_parser("export-history", help="将列式/增量存储的历史导出为 CSV 格式")
+    export_parser.add_argument("--output-dir", help="导出目录 (默认: 历史数据目录)")
+
+    # 蒙特卡洛模拟
+    simulate_parser = subparsers.add_parser("simulate", help="对最新市场快照做蒙特卡洛模拟，给出收益分布")
+    simulate_parser.add_argument("--hours", type=int, default=100000, help="模拟小时数 (默认: 100000)")
+    simulate_parser.add_argument("--seed", type=int, help="随机种子")
+    simulate_parser.add_argument("--output", help="输出 CSV 文件名")
+
+    # 历史汇总与裁剪
+    compact_parser = subparsers.add_parser("compact", help="将历史汇总为小时/天K线并按保留期裁剪过期数据")
+    compact_parser.add_argument("--rebuild", action="store_true", help="删除全部K线并从原始数据重新汇总（不裁剪）")
+
+    # 组合优化
+    optimize_parser = subparsers.add_parser("optimize", help="对最新市场快照求解炸矿/制作/采购的最优组合（线性规划）")
+    optimize_parser.add_argument("--mining-seconds", type=float, help="每小时炸矿时间预算秒数 (默认: config.OPTIMIZER_MINING_SECONDS)")
+    optimize_parser.add_argument("--crafting-seconds", type=float, help="每小时制作时间预算秒数 (默认: config.OPTIMIZER_CRAFTING_SECONDS)")
+
+    # 敏感性分析
+    sensitivity_parser = subparsers.add_parser("sensitivity", help="对最新市场快照扫描价格或税率/暴击率，给出盈亏平衡点与最优策略切换边界")
+    sensitivity_parser.add_argument("--axis", action="append", required=True,
+                                    help="扫描参数 物品名|TAX_RATE|CRIT_RATE[=起点:终点[:点数]]，价格以金币计，可指定两次做二维网格")
+    sensitivity_parser.add_argument("--points", type=int, help="未指定点数时每个参数的网格点数 (默认: config.SENSITIVITY_POINTS)")
+    sensitivity_parser.add_argument("--output", help="最优策略网格 CSV 输出文件名")
+    sensitivity_parser.add_argument("--boundaries-output", help="盈亏平衡与切换边界 CSV 输出文件名")
+
+    # 批量渲染
+    batch_parser = subparsers.add_parser("batch", help="按规格文件批量生成图表与报告（数据只读取一次）")
+    batch_parser.add_argument("specs", help="规格文件 (JSON 列表)")
+    batch_parser.add_argument("--workers", type=int, default=1, help="并行绘图进程数 (默认: 1)")
+
+    # 中文字体
+    font_parser = subparsers.add_parser("font", help="显示图表使用的中文字体（--refresh 重新查找并更新缓存）")
+    font_parser.add_argument("--refresh", action="store_true", help="忽略缓存重新查找字体")
+
     args = parser.parse_args()
+    config.ensure_data_dirs()
 
     if args.command == "price":
+        from chart_generator import generate_price_chart
         generate_price_chart(args.items, args.days, args.output)
     elif args.command == "availability":
+        from chart_generator import generate_availability_chart
         generate_availability_chart(args.items, args.days, args.output)
     elif args.command == "correlation":
+        from chart_generator import generate_correlation_chart
         generate_correlation_chart(args.item1, args.item2, args.days, args.output)
+    elif args.command == "correlation-matrix":
+        from correlation import generate_correlation_matrix
+        generate_correlation_matrix(args.items, args.days, args.output, args.pairs_output, args.matrix_output,
+                                    args.rolling_output, args.top, args.window, args.freq, args.tolerance,
+                                    args.returns)
     elif args.command == "strategy":
         if args.strategy_command == "trend":
+            from strategy_analyzer import generate_strategy_trend
             generate_strategy_trend(args.strategy, args.ore, args.days, args.output)
         elif args.strategy_command == "compare":
+            from strategy_analyzer import compare_strategies
             compare_strategies(args.strategies, args.ore, args.days, args.output)
         elif args.strategy_command == "report":
+            from strategy_analyzer import generate_strategy_report
             generate_strategy_report(args.ore, args.days, args.output)
         elif args.strategy_command == "analyze":
+            from strategy_analyzer import analyze_strategy_performance
             analyze_strategy_performance(args.strategy, args.ore, args.days)
+        elif args.strategy_command == "rebuild-aggregates":
+            from strategy_aggregates import get_strategy_aggregates
+            get_strategy_aggregates().rebuild()
+        else:
+            print("请指定有效的策略分析命令: trend, compare, report, analyze 或 rebuild-aggregates")
+    elif args.command == "backtest":
+        from backtest import run_backtest
+        run_backtest(start=args.start, end=args.end, output_file=args.output)
+    elif args.command == "export-history":
+        if config.HISTORY_BACKEND == "delta":
+            from delta_store import get_delta_store
+            get_delta_store().export_csv(args.output_dir)
         else:
-            print("请指定有效的策略分析命令: trend, compare, report 或 analyze")
+            from history_store import export_csv
+            export_csv(args.output_dir)
+    elif args.command == "simulate":
+        from monte_carlo import run_simulation
+        run_simulation(args.hours, args.seed, args.output)
+    elif args.command == "compact":
+        from rollups import run_compaction
+        run_compaction(rebuild=args.rebuild)
+    elif args.command == "optimize":
+        from optimizer import run_optimization
+        run_optimization(mining_seconds=args.mining_seconds, crafting_seconds=args.crafting_seconds)
+    elif args.command == "sensitivity":
+        from sensitivity import run_sensitivity
+        try:
+            run_sensitivity(args.axis, args.points, args.output, args.boundaries_output)
+        except ValueError as e:
+            print(f"错误: {e}")
+    elif args.command == "batch":
+        from batch_render import load_specs, render_batch
+        render_batch(load_specs(args.specs), args.workers)
+    elif args.command == "font":
+        from font_resolver import resolve_font_path
+        path = resolve_font_path(refresh=args.refresh)
+        print(f"中文字体: {path}" if path else "未找到中文字体，可在 config.py 中设置 CHINESE_FONT_PATH")
     else:
-        print("请指定有效命令: price, availability, correlation 或 strategy")
+        print("请指定有效命令: price, availability, correlation, correlation-matrix, strategy, backtest, export-history, simulate, "
+              "sensitivity, batch 或 font")
 
 
 if __name__ == "__main__":
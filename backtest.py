@@ -0,0 +1,151 @@
+import os
+import numpy as np
+import pandas as pd
+from config import HISTORY_DIR, REPORTS_DIR, HISTORY_BACKEND
+from market_snapshot import MarketSnapshot
+from vector_engine import get_vectorized_evaluator
+
+
+def _end_bound(end):
+    """结束时间（含）：只给日期（如 2025-08-31）时包含当天全天"""
+    if end is None:
+        return None
+    bound = pd.Timestamp(end)
+    if isinstance(end, str) and ":" not in end:
+        bound += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return bound
+
+
+def load_history(history_path=None, start=None, end=None):
+    """读取完整市场历史（full_history.csv 格式）"""
+    end = _end_bound(end)
+    if history_path is None and HISTORY_BACKEND == "columnar":
+        from history_store import load_market_history
+        start = pd.Timestamp(start).to_pydatetime() if start is not None else None
+        end = pd.Timestamp(end).to_pydatetime() if end is not None else None
+        return load_market_history(start, end)
+    if history_path is None and HISTORY_BACKEND == "delta":
+        from delta_store import get_delta_store
+        start = pd.Timestamp(start).to_pydatetime() if start is not None else None
+        end = pd.Timestamp(end).to_pydatetime() if end is not None else None
+        return get_delta_store().load_market_history(start, end)
+
+    if history_path is not None:
+        df = pd.read_csv(history_path, parse_dates=['timestamp'])
+        if start is not None:
+            df = df[df['timestamp'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['timestamp'] <= pd.Timestamp(end)]
+        return df
+
+    # 默认历史文件通过时间索引只读取 [start, end] 覆盖的部分
+    from history_reader import read_history, first_timestamp
+    from rollups import read_market_history
+    history_path = os.path.join(HISTORY_DIR, "full_history.csv")
+    df = read_history(history_path, start=start, end=end)
+    if df.empty:
+        df = pd.DataFrame(columns=["timestamp", "item", "price_g", "available"])
+
+    # 按保留期裁剪掉的原始数据用物品K线补齐
+    older = read_market_history(first_timestamp(history_path), start, end)
+    if not older.empty:
+        df = pd.concat([older, df], ignore_index=True)
+    return df
+
+
+def pivot_prices(history_df, items):
+    """将历史记录透视为 (时间 × 物品) 价格矩阵
+
+    返回 (时间戳索引, 铜币价格矩阵, 存在掩码, 可购买数量矩阵)，列顺序同 items。
+    """
+    df = history_df.copy()
+    df['price'] = (df['price_g'] * 10000).round()
+    price_table = df.pivot_table(index='timestamp', columns='item', values='price', aggfunc='last')
+    available_table = df.pivot_table(index='timestamp', columns='item', values='available', aggfunc='last')
+    price_table = price_table.reindex(columns=items)
+    available_table = available_table.reindex(index=price_table.index, columns=items)
+
+    present = price_table.notna().to_numpy()
+    prices = price_table.fillna(0).to_numpy(dtype=float)
+    available = available_table.fillna(0).to_numpy(dtype=np.int64)
+    return price_table.index, prices, present, available
+
+
+def iter_snapshots(history_df):
+    """按时间戳重建每个快照的 MarketSnapshot"""
+    for timestamp, group in history_df.groupby('timestamp', sort=True):
+        prices = np.rint(group['price_g'].to_numpy(dtype=float) * 10000).astype(np.int64)
+        market_data = MarketSnapshot.from_columns(group['item'], prices, group['available'])
+        yield timestamp.to_pydatetime(), market_data
+
+
+def latest_snapshot(history_path=None):
+    """历史中最新的市场快照，返回 (时间, MarketSnapshot)，没有历史时返回 (None, None)"""
+    history_df = load_history(history_path)
+    if history_df.empty:
+        return None, None
+    latest = history_df[history_df['timestamp'] == history_df['timestamp'].max()]
+    return next(iter_snapshots(latest))
+
+
+def run_backtest(history_path=None, output_file=None, start=None, end=None, chunk_size=10000):
+    """回测：对历史中的每个时间点评估所有矿石的所有策略
+
+    历史被透视为价格矩阵后按时间分块整体评估，结果为一张长表：
+    timestamp, ore, strategy, type, profit_copper, profit_g, is_best
+    （profit_copper 为整数铜币，长时间段汇总时不累积浮点误差）
+    """
+    if output_file is None:
+        output_file = os.path.join(REPORTS_DIR, "backtest_results.csv")
+    if output_file.endswith(".parquet"):
+        # parquet 输出依赖 pyarrow，缺少时在回测前就报错
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("输出 .parquet 需要安装 pyarrow (pip install pyarrow)，或改用 .csv 输出")
+            return None
+
+    evaluator = get_vectorized_evaluator()
+    history_df = load_history(history_path, start, end)
+    if history_df.empty:
+        print("没有可回测的历史数据")
+        return pd.DataFrame()
+
+    timestamps, prices, present, _ = pivot_prices(history_df, evaluator.items)
+    names = evaluator.strategy_names()
+    strategy_names = np.array([name for name, _ in names], dtype=object)
+    strategy_types = np.array([strategy_type for _, strategy_type in names], dtype=object)
+    ores = np.array(evaluator.ores, dtype=object)
+    n_ore, n_strategy = len(ores), len(names)
+
+    frames = []
+    for begin in range(0, len(timestamps), chunk_size):
+        stop = min(begin + chunk_size, len(timestamps))
+        table, valid_table = evaluator.evaluate_copper(prices[begin:stop], present[begin:stop])
+        best = evaluator.best_index(table, valid_table)
+
+        n_time = stop - begin
+        is_best = np.zeros(table.shape, dtype=bool)
+        np.put_along_axis(is_best, best[..., None], True, axis=-1)
+
+        valid = valid_table.reshape(-1)
+        frames.append(pd.DataFrame({
+            "timestamp": np.repeat(timestamps[begin:stop].to_numpy(), n_ore * n_strategy)[valid],
+            "ore": np.tile(np.repeat(ores, n_strategy), n_time)[valid],
+            "strategy": np.tile(strategy_names, n_time * n_ore)[valid],
+            "type": np.tile(strategy_types, n_time * n_ore)[valid],
+            "profit_copper": table.reshape(-1)[valid],
+            "profit_g": table.reshape(-1)[valid] / 10000.0,
+            "is_best": is_best.reshape(-1)[valid],
+        }))
+
+    result_df = pd.concat(frames, ignore_index=True)
+
+    if output_file.endswith(".parquet"):
+        result_df.to_parquet(output_file, index=False)
+    else:
+        result_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+
+    print(f"回测完成: {len(timestamps)} 个时间点, {len(result_df)} 条策略记录")
+    print(f"回测结果已保存至: {output_file}")
+    return result_df
@@ -0,0 +1,192 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from config import HISTORY_DIR
+from rollups import choose_tier, read_item_history, read_strategy_history
+
+# 各类规格的默认天数（与 analysis_tool.py 的命令行默认值一致）
+DEFAULT_DAYS = {
+    "price": 7,
+    "availability": 7,
+    "correlation": 30,
+    "correlation_matrix": 30,
+    "strategy_trend": 30,
+    "strategy_compare": 30,
+    "strategy_report": 30,
+    "strategy_analyze": 90,
+}
+
+
+class HistorySource:
+    """批量渲染的数据源：每个历史文件的每个层级只读取一次（按所有规格中最长的天数），各图表在内存中按时间截取
+
+    层级（分钟 / 小时 / 天数据）与单独绘图时一样按天数选择，同一物品的短窗口与长窗口图表分别读取。
+    """
+
+    def __init__(self, history_dir=None):
+        self.history_dir = history_dir or HISTORY_DIR
+        self.items = {}     # {(物品, 层级): (天数, DataFrame)}
+        self.strategy = {}  # {层级: (天数, DataFrame)}
+
+    def preload(self, specs):
+        """按规格列表一次性读取所需的全部数据源"""
+        item_days, strategy_days = {}, {}
+        for spec in specs:
+            days = spec_days(spec)
+            tier = choose_tier(days)
+            for item_name in spec_items(spec):
+                item_days[(item_name, tier)] = max(item_days.get((item_name, tier), 0), days)
+            if spec["type"] in ("strategy_trend", "strategy_compare", "strategy_analyze"):
+                strategy_days[tier] = max(strategy_days.get(tier, 0), days)
+
+        for (item_name, tier), days in item_days.items():
+            self._load_item(item_name, days)
+        for tier, days in strategy_days.items():
+            self._load_strategy(days)
+
+    def _load_item(self, item_name, days):
+        df = read_item_history(item_name, days, history_dir=self.history_dir)
+        self.items[(item_name, choose_tier(days))] = (days, df)
+        return df
+
+    def _load_strategy(self, days):
+        df = read_strategy_history(days, history_dir=self.history_dir)
+        self.strategy[choose_tier(days)] = (days, df)
+        return df
+
+    @staticmethod
+    def _recent(df, days):
+        if df.empty:
+            return df
+        return df[df['timestamp'] >= datetime.now() - timedelta(days=days)]
+
+    def item_history(self, item_name, days, columns=None):
+        cached = self.items.get((item_name, choose_tier(days)))
+        df = cached[1] if cached is not None and cached[0] >= days else self._load_item(item_name, days)
+        df = self._recent(df, days)
+        if columns is not None and not df.empty:
+            df = df[['timestamp'] + list(columns)]
+        return df.reset_index(drop=True)
+
+    def strategy_history(self, days, strategies=None, ore_name=None):
+        cached = self.strategy.get(choose_tier(days))
+        df = cached[1] if cached is not None and cached[0] >= days else self._load_strategy(days)
+        df = self._recent(df, days)
+        if df.empty:
+            return df
+        if strategies is not None:
+            df = df[df['strategy'].isin(strategies)]
+        if ore_name:
+            df = df[df['ore'] == ore_name]
+        return df.reset_index(drop=True)
+
+
+def spec_days(spec):
+    return spec.get("days", DEFAULT_DAYS.get(spec["type"], 30))
+
+
+def spec_items(spec):
+    """规格用到的物品历史"""
+    if spec["type"] in ("price", "availability"):
+        return spec["items"]
+    if spec["type"] == "correlation":
+        return [spec["item1"], spec["item2"]]
+    if spec["type"] == "correlation_matrix":
+        from correlation import tracked_items
+        return spec.get("items") or tracked_items()
+    return []
+
+
+def render(spec, source=None):
+    """渲染一个图表/报告规格"""
+    from chart_generator import generate_price_chart, generate_availability_chart, generate_correlation_chart
+    from strategy_analyzer import (generate_strategy_trend, compare_strategies,
+                                   generate_strategy_report, analyze_strategy_performance)
+
+    spec_type, days, output = spec["type"], spec_days(spec), spec.get("output")
+    if spec_type == "price":
+        generate_price_chart(spec["items"], days, output or "price_trend.png", source)
+    elif spec_type == "availability":
+        generate_availability_chart(spec["items"], days, output or "availability_trend.png", source)
+    elif spec_type == "correlation":
+        generate_correlation_chart(spec["item1"], spec["item2"], days, output or "price_correlation.png", source)
+    elif spec_type == "correlation_matrix":
+        from correlation import generate_correlation_matrix
+        generate_correlation_matrix(spec.get("items"), days, output or "correlation_matrix.png",
+                                    spec.get("pairs_output", "correlation_pairs.csv"), spec.get("matrix_output"),
+                                    spec.get("rolling_output"), spec.get("top", 20), spec.get("window"),
+                                    spec.get("freq"), spec.get("tolerance"), spec.get("returns", False), source)
+    elif spec_type == "strategy_trend":
+        generate_strategy_trend(spec["strategy"], spec.get("ore"), days, output or "strategy_trend.png", source)
+    elif spec_type == "strategy_compare":
+        compare_strategies(spec["strategies"], spec.get("ore"), days, output or "strategy_comparison.png", source)
+    elif spec_type == "strategy_report":
+        generate_strategy_report(spec.get("ore"), days, output or "strategy_report.csv")
+    elif spec_type == "strategy_analyze":
+        analyze_strategy_performance(spec["strategy"], spec.get("ore"), days, source)
+    else:
+        raise ValueError(f"未知的规格类型: {spec_type}")
+
+
+# 工作进程内的数据源（由初始化函数设置，每个进程只接收一次）
+_worker_source = None
+
+
+def _init_worker(source):
+    global _worker_source
+    import matplotlib
+    matplotlib.use("Agg")
+    _worker_source = source
+
+
+def _render_timed(spec, source):
+    start = time.perf_counter()
+    try:
+        render(spec, source)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return spec.get("output") or spec["type"], time.perf_counter() - start, error
+
+
+def _render_in_worker(spec):
+    return _render_timed(spec, _worker_source)
+
+
+def load_specs(path):
+    """读取规格文件：JSON 列表，或 {"charts": [...]}"""
+    with open(path, encoding='utf-8') as f:
+        specs = json.load(f)
+    if isinstance(specs, dict):
+        specs = specs["charts"]
+    return specs
+
+
+def render_batch(specs, workers=1):
+    """批量渲染：数据源只读取一次，字体与绘图后端只设置一次，可在多个工作进程中并行绘制
+
+    返回 [(输出, 用时秒, 错误信息或 None)]
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+
+    start = time.perf_counter()
+    source = HistorySource()
+    source.preload(specs)
+    load_seconds = time.perf_counter() - start
+
+    if workers <= 1 or len(specs) <= 1:
+        results = [_render_timed(spec, source) for spec in specs]
+    else:
+        # 先在主进程中设置字体再创建进程池，工作进程直接继承
+        from font_resolver import setup_fonts
+        setup_fonts()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source,)) as pool:
+            results = list(pool.map(_render_in_worker, specs))
+
+    print(f"\n批量渲染完成: {len(specs)} 项，数据读取 {load_seconds:.2f}s，总用时 {time.perf_counter() - start:.2f}s")
+    for output, seconds, error in results:
+        status = f"失败: {error}" if error else "完成"
+        print(f"  - {output}: {seconds:.2f}s {status}")
+    return results
@@ -0,0 +1,80 @@
+"""市场数据解析器微基准：比较 parse_market_data 与 parse_market_bytes 的每秒行数
+
+用法: python benchmarks/bench_parser.py [--rows 50000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_parser import parse_market_data, parse_market_bytes, referenced_items  # noqa: E402
+
+
+def generate_dump(rows, seed=0, invalid_ratio=0.0):
+    """生成全拍卖行规模的合成 ATR 导出（含配方物品），invalid_ratio 为无效价格行比例"""
+    rng = random.Random(seed)
+    names = sorted(referenced_items()) + [f"物品{i}" for i in range(rows)]
+    lines = ['"价格","名称","物品等级","我的售品？","可购买"']
+    for name in names[:rows]:
+        price = "无" if rng.random() < invalid_ratio else rng.randint(1, 10000000)
+        lines.append(f'{price},"{name}",{rng.randint(1, 90)},"",{rng.randint(0, 50000)}')
+    return "\n".join(lines)
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows=50000, repeat=5, seed=0, invalid_ratio=0.0):
+    """返回 {模式: 每秒行数}"""
+    text = generate_dump(rows, seed, invalid_ratio)
+    data = text.encode('utf-8')
+    whitelist = referenced_items()
+
+    # 标准解析器会逐行打印跳过提示，计时期间将输出丢弃
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    try:
+        sys.stdout = devnull
+        baseline = best_time(lambda: parse_market_data(text), repeat)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    fast = best_time(lambda: parse_market_bytes(data), repeat)
+    filtered = best_time(lambda: parse_market_bytes(data, whitelist), repeat)
+
+    return {
+        "parse_market_data": rows / baseline,
+        "parse_market_bytes": rows / fast,
+        "parse_market_bytes_whitelist": rows / filtered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="市场数据解析器微基准")
+    parser.add_argument("--rows", type=int, default=50000, help="合成导出行数 (默认: 50000)")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次 (默认: 5)")
+    parser.add_argument("--invalid-ratio", type=float, default=0.05, help="无效价格行比例 (默认: 0.05)")
+    args = parser.parse_args()
+
+    stats = Counter()
+    parse_market_bytes(generate_dump(args.rows, invalid_ratio=args.invalid_ratio).encode('utf-8'),
+                       referenced_items(), stats)
+    print(f"解析统计（白名单）: {dict(stats)}")
+
+    for mode, rate in run(args.rows, args.repeat, invalid_ratio=args.invalid_ratio).items():
+        print(f"{mode:32s} {rate:14,.0f} 行/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""基准测试套件：在多个规模的合成数据上计时解析、策略评估、历史记录、报告与图表
+
+用法:
+    python benchmarks/run.py [--scales 1k 10k 100k] [--repeat 3] [--output results.json]
+    python benchmarks/run.py --compare baseline.json [--threshold 0.2]
+
+合成数据（拍卖行导出、配方表、市场/策略历史）由固定种子生成，结果可在不同运行之间比较。
+所有历史文件写入临时目录，不会改动 data/ 下的真实数据。
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+matplotlib.use("Agg")
+
+import backtest  # noqa: E402
+import batch_render  # noqa: E402
+import chart_generator  # noqa: E402
+import correlation  # noqa: E402
+import delta_store  # noqa: E402
+import history_recorder  # noqa: E402
+import history_store  # noqa: E402
+import rollups  # noqa: E402
+import strategy_aggregates  # noqa: E402
+import strategy_analyzer  # noqa: E402
+from bench_parser import best_time  # noqa: E402
+from config import MINING_TIME_PER_ORE  # noqa: E402
+from history_writer import get_history_writer  # noqa: E402
+from market_parser import parse_market_data  # noqa: E402
+from recipe_graph import RecipeGraph  # noqa: E402
+from strategy import StrategyEvaluator  # noqa: E402
+from vector_engine import VectorizedEvaluator  # noqa: E402
+
+# 规模：导出行数、配方数量、策略历史行数、图表物品历史行数
+# （可购买数量图每个时间点绘制一根柱子，物品历史行数单独设上限）
+SCALES = {
+    "1k": {"rows": 1000, "recipes": 10, "history": 1000, "chart_history": 1000},
+    "10k": {"rows": 10000, "recipes": 100, "history": 10000, "chart_history": 2000},
+    "100k": {"rows": 100000, "recipes": 300, "history": 100000, "chart_history": 5000},
+    "1m": {"rows": 1000000, "recipes": 1000, "history": 1000000, "chart_history": 10000},
+}
+DEFAULT_SCALES = ["1k", "10k", "100k"]
+
+ORE_COUNT = 4
+OUTPUTS_PER_ORE = 8
+
+
+def generate_recipes(n_recipes, seed=0):
+    """生成合成配方表，返回 (MINING_RECIPES, CRAFTING_RECIPES, DISENCHANT_RESULTS) 格式的字典"""
+    rng = random.Random(seed)
+    gems = [f"宝石{i}" for i in range(max(20, n_recipes // 5))]
+    reagents = [f"材料{i}" for i in range(max(5, n_recipes // 20))]
+    dusts = [f"尘{i}" for i in range(max(3, n_recipes // 50))]
+
+    mining_recipes = {}
+    for o in range(ORE_COUNT):
+        outputs = rng.sample(gems, OUTPUTS_PER_ORE)
+        mining_recipes[f"矿石{o}"] = [(gem, round(rng.uniform(0.01, 0.1), 4)) for gem in outputs]
+
+    crafting_recipes, disenchant_results = {}, {}
+    for r in range(n_recipes):
+        materials = {gem: rng.randint(1, 3) for gem in rng.sample(gems, rng.randint(1, 2))}
+        materials.update({reagent: rng.randint(1, 5) for reagent in rng.sample(reagents, rng.randint(0, 2))})
+        crafting_recipes[f"配方{r}"] = {"materials": materials, "cost": round(rng.uniform(0, 1), 2)}
+        disenchant_results[f"配方{r}"] = {dust: round(rng.uniform(0.1, 2.0), 2)
+                                         for dust in rng.sample(dusts, rng.randint(1, 2))}
+    return mining_recipes, crafting_recipes, disenchant_results
+
+
+def generate_dump(rows, item_names, seed=0):
+    """生成 ATR 导出文本：先列出配方物品，其余为无关物品"""
+    rng = random.Random(seed)
+    names = list(item_names) + [f"物品{i}" for i in range(max(0, rows - len(item_names)))]
+    lines = ['"价格","名称","物品等级","我的售品？","可购买"']
+    for name in names[:rows]:
+        lines.append(f'{rng.randint(100, 10000000)},"{name}",{rng.randint(1, 90)},"",{rng.randint(0, 50000)}')
+    return "\n".join(lines)
+
+
+def generate_history(history_dir, rows, item_names, strategy_names, item_rows=None, seed=0):
+    """生成最近30天内均匀分布的策略历史与物品历史（与记录器格式一致）"""
+    rng = random.Random(seed)
+    item_rows = rows if item_rows is None else item_rows
+    os.makedirs(os.path.join(history_dir, "items"), exist_ok=True)
+    start = datetime.now() - timedelta(days=30)
+    step = timedelta(days=29) / max(1, rows)
+
+    with open(os.path.join(history_dir, "strategy_history.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(history_recorder.STRATEGY_HISTORY_HEADER)
+        for i in range(rows):
+            mining = rng.uniform(-100, 100)
+            disenchant = rng.uniform(-50, 50)
+            writer.writerow([(start + step * i).strftime("%Y-%m-%d %H:%M:%S"), f"矿石{i % ORE_COUNT}",
+                             strategy_names[i % len(strategy_names)], round(mining, 4), round(disenchant, 4),
+                             round(mining + disenchant, 4), "crafting"])
+
+    for name in item_names:
+        with open(os.path.join(history_dir, "items", f"{name}.csv"), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(history_recorder.ITEM_HISTORY_HEADER)
+            item_step = timedelta(days=29) / max(1, item_rows)
+            for i in range(item_rows):
+                writer.writerow([(start + item_step * i).strftime("%Y-%m-%d %H:%M:%S"),
+                                 round(rng.uniform(1, 100), 4), rng.randint(0, 5000)])
+
+
+@contextlib.contextmanager
+def history_dir(path):
+    """将所有读写历史的模块的历史目录（及列式、增量存储目录）指向 path"""
+    modules = (history_recorder, strategy_analyzer, strategy_aggregates, rollups, chart_generator,
+               backtest, batch_render, correlation)
+    saved = [module.HISTORY_DIR for module in modules]
+    saved_store, saved_delta = history_store.STORE_DIR, delta_store.DELTA_DIR
+    for module in modules:
+        module.HISTORY_DIR = path
+    history_store.STORE_DIR = os.path.join(path, "store")
+    delta_store.DELTA_DIR = os.path.join(path, "delta")
+    try:
+        yield path
+    finally:
+        for module, value in zip(modules, saved):
+            module.HISTORY_DIR = value
+        history_store.STORE_DIR, delta_store.DELTA_DIR = saved_store, saved_delta
+
+
+def timed(func, repeat, rows):
+    """计时（输出丢弃），返回 {"seconds", "rows", "rows_per_s"}"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        seconds = best_time(func, repeat)
+    return {"seconds": seconds, "rows": rows, "rows_per_s": rows / seconds if seconds > 0 else None}
+
+
+def run_scale(scale, repeat=3, seed=0):
+    """运行一个规模的全部基准，返回 {基准名称: 结果}"""
+    spec = SCALES[scale]
+    graph = RecipeGraph(*generate_recipes(spec["recipes"], seed))
+    results = {}
+
+    # 解析
+    text = generate_dump(spec["rows"], graph.items, seed)
+    results["parse_market_data"] = timed(lambda: parse_market_data(text), repeat, spec["rows"])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        market_data = parse_market_data(text)
+    snapshot = {name: market_data[name] for name in graph.items if name in market_data}
+
+    # 策略评估（逐配方 / 矩阵化）
+    cycles = int(3600 / MINING_TIME_PER_ORE)
+    evaluator = StrategyEvaluator(snapshot, graph)
+    mining_results = {ore_name: {item: float(prob) * float(cycles) for item, prob in outputs}
+                      for ore_name, outputs in graph.ore_outputs.items()}
+
+    def evaluate_all():
+        for ore_name in graph.ores:
+            evaluator.evaluate_all_strategies(ore_name, mining_results[ore_name])
+
+    results["evaluate_all_strategies"] = timed(evaluate_all, repeat, len(graph.ores) * len(graph.recipes))
+    engine = VectorizedEvaluator(graph)
+    results["evaluate_snapshot_compiled"] = timed(lambda: engine.evaluate_snapshot(snapshot), repeat,
+                                                  len(graph.ores) * len(graph.recipes))
+    all_strategies = {ore_name: evaluator.evaluate_all_strategies(ore_name, mining_results[ore_name])[0]
+                      for ore_name in graph.ores}
+
+    temp_dir = tempfile.mkdtemp(prefix="wow_bench_")
+    try:
+        # 历史记录（记录配方物品快照与全部矿石的策略）
+        with history_dir(os.path.join(temp_dir, "record")):
+            timestamp = datetime.now()
+            # 计时包含等待后台写入完成（即实际的磁盘写入耗时）
+            writer = get_history_writer()
+
+            def record_market():
+                history_recorder.record_market_data(snapshot, timestamp)
+                writer.flush()
+
+            results["record_market_data"] = timed(record_market, repeat, len(snapshot))
+
+            def record_strategies():
+                with writer.tick():
+                    for ore_name, strategies in all_strategies.items():
+                        history_recorder.record_all_strategies(timestamp, ore_name, strategies)
+                writer.flush()
+
+            results["record_all_strategies"] = timed(
+                record_strategies, repeat, sum(len(s) for s in all_strategies.values()))
+
+        # 报告与图表（基于合成历史）
+        chart_items = graph.items[:3]
+        strategy_names = [f"炸矿+制作{name}" for name in graph.recipe_names]
+        path = os.path.join(temp_dir, "history")
+        generate_history(path, spec["history"], chart_items, strategy_names, spec["chart_history"], seed)
+        output = os.path.join(temp_dir, "out")
+        with history_dir(path):
+            rows, chart_rows = spec["history"], spec["chart_history"]
+            # 由合成的策略历史生成按天聚合（报告基于聚合）
+            results["rebuild_strategy_aggregates"] = timed(
+                lambda: strategy_aggregates.get_strategy_aggregates().rebuild(), repeat, rows)
+            # 汇总为小时/天K线（30 天窗口的图表读取小时K线）
+            results["compact_history"] = timed(
+                lambda: rollups.get_rollup_store().rebuild(), repeat, rows + chart_rows * len(chart_items))
+            results["generate_strategy_report"] = timed(
+                lambda: strategy_analyzer.generate_strategy_report(days=30, output_file=output + ".csv"),
+                repeat, rows)
+            results["generate_strategy_trend"] = timed(
+                lambda: strategy_analyzer.generate_strategy_trend(strategy_names[0], days=30,
+                                                                  output_file=output + ".png"),
+                repeat, rows)
+            results["generate_price_chart"] = timed(
+                lambda: chart_generator.generate_price_chart(chart_items, 30, output + ".png"), repeat, chart_rows)
+            results["generate_availability_chart"] = timed(
+                lambda: chart_generator.generate_availability_chart(chart_items, 30, output + ".png"), repeat,
+                chart_rows)
+            results["generate_correlation_chart"] = timed(
+                lambda: chart_generator.generate_correlation_chart(chart_items[0], chart_items[1], 30,
+                                                                   output + ".png"), repeat, chart_rows)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+
+def compare(current, baseline, threshold=0.2):
+    """比较两次运行，打印变化并返回退化的基准列表"""
+    regressions = []
+    print(f"\n{'规模':<6} {'基准':<30} {'基线(s)':>10} {'本次(s)':>10} {'变化':>8}")
+    for scale, benchmarks in current["results"].items():
+        for name, result in benchmarks.items():
+            base = baseline.get("results", {}).get(scale, {}).get(name)
+            if base is None:
+                continue
+            ratio = result["seconds"] / base["seconds"] if base["seconds"] > 0 else float('inf')
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  退化"
+                regressions.append((scale, name, ratio))
+            print(f"{scale:<6} {name:<30} {base['seconds']:>10.4f} {result['seconds']:>10.4f} "
+                  f"{ratio - 1:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试套件")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, choices=list(SCALES),
+                        help=f"运行的规模 (默认: {' '.join(DEFAULT_SCALES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次 (默认: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据随机种子 (默认: 0)")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", metavar="BASELINE", help="与之前保存的结果 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的变慢比例 (默认: 0.2)")
+    args = parser.parse_args()
+
+    current = {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {}
+    }
+    for scale in args.scales:
+        print(f"运行规模 {scale} ({SCALES[scale]})...")
+        current["results"][scale] = run_scale(scale, args.repeat, args.seed)
+        for name, result in current["results"][scale].items():
+            print(f"  {name:<30} {result['seconds']:>10.4f}s {result['rows_per_s'] or 0:>14,.0f} 行/秒")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项基准变慢超过 {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
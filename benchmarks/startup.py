@@ -0,0 +1,80 @@
+"""冷启动基准：在子进程中计时命令行入口（解释器启动 + 导入 + 参数解析），并与启动预算比较
+
+用法:
+    python benchmarks/startup.py [--repeat 5] [--output startup_results.json]
+
+每条命令取多次运行中的最短用时；超出预算时以非零状态退出，便于在 CI 或定时任务前检查。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 命令 -> 启动预算（秒）。--help 与策略报告不应加载 matplotlib
+STARTUP_BUDGETS = {
+    "python -c pass": None,  # 解释器本身的启动时间，作为参照
+    "main.py --help": 0.3,
+    "analysis_tool.py --help": 0.3,
+    "analysis_tool.py strategy report": 1.0,
+    "analysis_tool.py price": 2.5,
+}
+
+
+def command_args(name, output_dir):
+    if name == "python -c pass":
+        return [sys.executable, "-c", "pass"]
+    script, *args = name.split()
+    if args[:2] == ["strategy", "report"]:
+        args += ["--days", "1", "--output", os.path.join(output_dir, "strategy_report.csv")]
+    elif args[:1] == ["price"]:
+        args += ["幽冥铁矿石", "--days", "1", "--output", os.path.join(output_dir, "price_trend.png")]
+    return [sys.executable, os.path.join(ROOT, script)] + args
+
+
+def measure(args, repeat):
+    """多次运行取最短用时（秒）"""
+    best = float('inf')
+    env = dict(os.environ, MPLBACKEND="Agg")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行冷启动基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每条命令运行次数，取最短 (默认: 5)")
+    parser.add_argument("--output", default="startup_results.json", help="结果 JSON 文件")
+    args = parser.parse_args()
+
+    results = {}
+    over_budget = []
+    with tempfile.TemporaryDirectory(prefix="wow_startup_") as output_dir:
+        for name, budget in STARTUP_BUDGETS.items():
+            seconds = measure(command_args(name, output_dir), args.repeat)
+            results[name] = {"seconds": seconds, "budget": budget}
+            status = ""
+            if budget is not None:
+                status = "OK" if seconds <= budget else "超出预算"
+                if seconds > budget:
+                    over_budget.append(name)
+            budget_text = f"{budget:.2f}s" if budget is not None else "-"
+            print(f"  {name:<36} {seconds:8.3f}s  预算 {budget_text:>6}  {status}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至: {args.output}")
+
+    if over_budget:
+        print(f"超出启动预算: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
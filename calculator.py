@@ -1,24 +1,42 @@
-from strategy import StrategyEvaluator
+import config
+from strategy import StrategyEvaluator, build_results
 from config import MINING_TIME_PER_ORE
+from metrics import timed
+
+
+def get_evaluation_engine(mode=None):
+    """按评估模式（默认 config.EVALUATION_MODE）选择快照评估引擎（"python" 模式返回 None）"""
+    mode = config.EVALUATION_MODE if mode is None else mode
+    if mode == "compiled":
+        from vector_engine import get_vectorized_evaluator
+        return get_vectorized_evaluator()
+    if mode == "incremental":
+        from incremental import get_incremental_evaluator
+        return get_incremental_evaluator()
+    return None
 
 
 class ProfitCalculator:
-    def __init__(self, market_data):
+    def __init__(self, market_data, compiled=False, engine=None):
         self.market_data = market_data
         # 精确计算每小时炸矿次数
         self.mining_cycles_per_hour = int(3600 / MINING_TIME_PER_ORE)
         # 策略评估器
         self.strategy_evaluator = StrategyEvaluator(market_data)
+        # 快照评估引擎（矩阵化 / 增量）：一次评估所有矿石，结果按矿石缓存
+        if engine is None and compiled:
+            from vector_engine import get_vectorized_evaluator
+            engine = get_vectorized_evaluator()
+        self.engine = engine
+        self._engine_results = None
 
     def simulate_mining(self, ore_name, cycles):
         """模拟炸矿过程"""
-        from config import MINING_RECIPES
-
-        if ore_name not in MINING_RECIPES:
+        recipe = self.strategy_evaluator.graph.ore_outputs.get(ore_name)
+        if recipe is None:
             return {}
 
         results = {}
-        recipe = MINING_RECIPES[ore_name]
 
         # 使用更精确的浮点数计算
         for item, prob in recipe:
@@ -32,15 +50,14 @@ class ProfitCalculator:
         if ore_name not in self.market_data:
             return 0.0, 0.0, 0.0, {}
 
-        ore_price = float(self.market_data[ore_name].price)
+        ore_price = self.market_data[ore_name].price
         mining_results = self.simulate_mining(ore_name, self.mining_cycles_per_hour)
 
         # 计算炸矿收益
         mining_profit = 0.0
         for item, quantity in mining_results.items():
             if item in self.market_data:
-                item_price = float(self.market_data[item].price)
-                item_price_after_tax = self.strategy_evaluator.calculate_after_tax(item_price)
+                item_price_after_tax = self.strategy_evaluator.calculate_after_tax(self.market_data[item].price)
                 mining_profit += item_price_after_tax * quantity
 
         # 计算矿石总成本
@@ -56,29 +73,25 @@ class ProfitCalculator:
 
         return net_mining_profit_g, mining_profit_pct, mining_hourly_g, mining_results
 
+    @timed("evaluate")
     def evaluate_strategies(self, ore_name):
         """评估所有策略"""
+        if self.engine is not None and ore_name in self.strategy_evaluator.graph.ore_outputs:
+            return self._evaluate_with_engine(ore_name)
+
         # 炸矿收益
-        mining_profit_g, mining_profit_pct, mining_hourly_g, mining_results = self.calculate_mining_profit(ore_name)
+        _, mining_profit_pct, _, mining_results = self.calculate_mining_profit(ore_name)
 
         # 评估所有策略
-        all_strategies, best_strategy_name, best_profit = self.strategy_evaluator.evaluate_all_strategies(
+        all_strategies, best_strategy_name, _ = self.strategy_evaluator.evaluate_all_strategies(
             ore_name, mining_results
         )
 
-        # 提取最优策略的分解收益
-        disenchant_profit_g = 0.0
-        if best_strategy_name != "纯炸矿":
-            # 策略利润 - 炸矿利润 = 分解收益
-            disenchant_profit_g = best_profit - mining_profit_g
-
-        return {
-            "mining_profit_g": mining_profit_g,
-            "mining_profit_pct": mining_profit_pct,
-            "mining_hourly_g": mining_hourly_g,
-            "disenchant_profit_g": disenchant_profit_g,
-            "disenchant_hourly_g": disenchant_profit_g,  # 无时间消耗，所以等于总收益
-            "best_strategy": best_strategy_name,
-            "strategy_profit_g": best_profit,
-            "all_strategies": all_strategies  # 用于调试
-        }
\ No newline at end of file
+        # 金额以整数铜币组合（同时给出金币字段）
+        return build_results(all_strategies, best_strategy_name, mining_profit_pct)
+
+    def _evaluate_with_engine(self, ore_name):
+        """使用快照评估引擎计算（首次调用时评估全部矿石）"""
+        if self._engine_results is None:
+            self._engine_results = self.engine.evaluate_snapshot(self.market_data)
+        return self._engine_results[ore_name]
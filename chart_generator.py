@@ -2,75 +2,25 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import numpy as np
-from datetime import datetime
-from config import HISTORY_DIR, BASE_DIR
+from config import HISTORY_DIR
+from font_resolver import setup_fonts
+from rollups import read_item_history
 import warnings
-import matplotlib.font_manager as fm  # 添加字体管理器
-
-# 设置全局字体配置（先尝试简单设置）
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei']
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
 # 忽略警告
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
-# 优化后的中文字体设置函数
-def set_chinese_font():
-    try:
-        # 获取系统中所有可用字体
-        all_fonts = [f.name for f in fm.fontManager.ttflist]
-        chinese_fonts = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS', 'WenQuanYi Micro Hei']
-
-        # 查找系统中实际存在的中文字体
-        available_chinese_fonts = [font for font in chinese_fonts if any(f.lower() == font.lower() for f in all_fonts)]
-
-        if available_chinese_fonts:
-            # 使用第一个可用的中文字体
-            plt.rcParams['font.sans-serif'] = [available_chinese_fonts[0]]
-            print(f"已设置中文字体: {available_chinese_fonts[0]}")
-            return True
-        else:
-            # 尝试使用内置字体文件
-            try:
-                # 查找可能的字体文件路径
-                font_path = None
-                possible_paths = [
-                    os.path.join(BASE_DIR, "fonts", "SimHei.ttf"),
-                    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
-                    "C:/Windows/Fonts/simhei.ttf"
-                ]
-
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        font_path = path
-                        break
-
-                if font_path:
-                    # 添加并注册字体
-                    font_prop = fm.FontProperties(fname=font_path)
-                    plt.rcParams['font.family'] = 'sans-serif'
-                    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-                    print(f"已注册字体: {font_prop.get_name()}")
-                    return True
-
-            except Exception as e:
-                print(f"字体注册失败: {e}")
-
-    except Exception as e:
-        print(f"设置中文字体失败: {e}")
-
-    print("警告: 无法设置中文字体，图表可能无法正确显示中文")
-    return False
-
-
-# 初始化字体设置
-set_chinese_font()
+def _item_history(item_name, days, columns, source=None):
+    """读取物品最近N天的历史（按天数自动选择分钟/小时/天数据；批量渲染时由数据源提供，每个文件只读取一次）"""
+    if source is not None:
+        return source.item_history(item_name, days, columns)
+    return read_item_history(item_name, days, columns, HISTORY_DIR)
 
 
-def generate_price_chart(item_names, days=7, output_file="price_trend.png"):
+def generate_price_chart(item_names, days=7, output_file="price_trend.png", source=None):
     """生成价格趋势图"""
+    setup_fonts()
     plt.figure(figsize=(14, 8))
 
     for item_name in item_names:
@@ -81,11 +31,8 @@ def generate_price_chart(item_names, days=7, output_file="price_trend.png"):
             continue
 
         try:
-            df = pd.read_csv(item_file, parse_dates=['timestamp'])
-
-            # 过滤最近N天的数据
-            cutoff_date = datetime.now() - pd.Timedelta(days=days)
-            df = df[df['timestamp'] >= cutoff_date]
+            # 只读取最近N天的数据
+            df = _item_history(item_name, days, ['price_g'], source)
 
             if df.empty:
                 print(f"警告: {item_name} 最近 {days} 天没有数据")
@@ -109,8 +56,9 @@ def generate_price_chart(item_names, days=7, output_file="price_trend.png"):
     plt.close()
 
 
-def generate_availability_chart(item_names, days=7, output_file="availability_trend.png"):
+def generate_availability_chart(item_names, days=7, output_file="availability_trend.png", source=None):
     """生成可购买数量趋势图"""
+    setup_fonts()
     plt.figure(figsize=(14, 8))
 
     for item_name in item_names:
@@ -121,11 +69,8 @@ def generate_availability_chart(item_names, days=7, output_file="availability_tr
             continue
 
         try:
-            df = pd.read_csv(item_file, parse_dates=['timestamp'])
-
-            # 过滤最近N天的数据
-            cutoff_date = datetime.now() - pd.Timedelta(days=days)
-            df = df[df['timestamp'] >= cutoff_date]
+            # 只读取最近N天的数据
+            df = _item_history(item_name, days, ['available'], source)
 
             if df.empty:
                 print(f"警告: {item_name} 最近 {days} 天没有数据")
@@ -149,8 +94,10 @@ def generate_availability_chart(item_names, days=7, output_file="availability_tr
     plt.close()
 
 
-def generate_correlation_chart(item_name1, item_name2, days=30, output_file="price_correlation.png"):
+def generate_correlation_chart(item_name1, item_name2, days=30, output_file="price_correlation.png",
+                               source=None):
     """生成两个物品价格相关性图"""
+    setup_fonts()
     plt.figure(figsize=(14, 8))
 
     # 加载两个物品的历史数据
@@ -162,13 +109,9 @@ def generate_correlation_chart(item_name1, item_name2, days=30, output_file="pri
         return
 
     try:
-        df1 = pd.read_csv(item1_file, parse_dates=['timestamp'])
-        df2 = pd.read_csv(item2_file, parse_dates=['timestamp'])
-
-        # 过滤最近N天的数据
-        cutoff_date = datetime.now() - pd.Timedelta(days=days)
-        df1 = df1[df1['timestamp'] >= cutoff_date]
-        df2 = df2[df2['timestamp'] >= cutoff_date]
+        # 只读取最近N天的价格数据
+        df1 = _item_history(item_name1, days, ['price_g'], source)
+        df2 = _item_history(item_name2, days, ['price_g'], source)
 
         if df1.empty or df2.empty:
             print("错误: 数据不足")
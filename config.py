@@ -8,11 +8,14 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 HISTORY_DIR = os.path.join(DATA_DIR, "market_history")
 REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 
-# 确保目录存在
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(HISTORY_DIR, exist_ok=True)
-os.makedirs(REPORTS_DIR, exist_ok=True)
-os.makedirs(os.path.join(HISTORY_DIR, "items"), exist_ok=True)
+
+def ensure_data_dirs():
+    """确保数据目录存在（由程序入口调用，导入配置本身不写磁盘）"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    os.makedirs(os.path.join(HISTORY_DIR, "items"), exist_ok=True)
+
 
 # 炸矿配方
 MINING_RECIPES = {
@@ -69,4 +72,82 @@ DISENCHANT_RESULTS = {
 TAX_RATE = 0.05  # 5% 税收
 MINING_TIME_PER_ORE = 0.4  # 秒/次
 CRAFTING_TIME = 5  # 秒/次（制作+分解）
-CRIT_RATE = 0.2  # 20% 暴击概率
\ No newline at end of file
+CRIT_RATE = 0.2  # 20% 暴击概率
+
+# 评估模式："compiled" 使用矩阵化评估器一次计算所有矿石，
+# "incremental" 只重算价格变化物品所影响的策略，"python" 逐配方计算
+EVALUATION_MODE = "compiled"
+
+# 历史存储后端："csv" 逐行追加 CSV 文件，"columnar" 按天追加的压缩列式记录文件（见 history_store.py），
+# "delta" 市场快照只记录变化的物品并定期写入关键帧（见 delta_store.py，策略历史仍为 CSV）
+HISTORY_BACKEND = "csv"
+
+# 监视模式轮询间隔（秒）
+WATCH_POLL_INTERVAL = 0.05
+
+# 监视模式只保留配方中用到的物品（全拍卖行导出时可大幅减少解析与记录量）
+PARSER_RECIPE_ITEMS_ONLY = False
+
+# 评估进程数：1 在当前进程内评估，0 使用全部 CPU 核心（各矿石分到不同进程计算）
+EVALUATION_WORKERS = 1
+
+# 运行指标：各阶段耗时直方图、写入字节数与处理行数（见 metrics.py）
+METRICS_ENABLED = True
+# 每次处理后写出的指标文件（None 不写出）
+METRICS_FILE = os.path.join(REPORTS_DIR, "metrics.json")
+# 本地 HTTP 指标端口（None 不启动，例如 9108）
+METRICS_HTTP_PORT = None
+# 性能剖析：None 关闭，"cprofile" 或 "tracemalloc"，结果写入报告目录
+PROFILE_MODE = None
+
+# 内存滚动统计（见 rolling.py）：保留最近 N 个快照，窗口同时受时长限制（秒，None 不限）
+ROLLING_WINDOW_SIZE = 60
+ROLLING_WINDOW_SECONDS = 3600
+# 指数移动平均的平滑系数
+ROLLING_EMA_ALPHA = 0.1
+# 只统计配方中引用到的物品价格（全拍卖行导出时避免为数万物品维护窗口）
+ROLLING_RECIPE_ITEMS_ONLY = True
+# 价格偏离窗口均值超过多少个标准差时提示异常，以及提示所需的最少样本数
+ANOMALY_ZSCORE = 3.0
+ANOMALY_MIN_SAMPLES = 10
+
+# 历史写入（见 history_writer.py）：后台线程按批次写入，每次处理的所有写入合并为一次组提交
+HISTORY_ASYNC_WRITES = True
+# 等待写入的批次上限，写入落后时处理线程在提交处等待（反压）
+HISTORY_WRITER_QUEUE_SIZE = 16
+# fsync 策略："always" 每批次，"interval" 每 HISTORY_FSYNC_INTERVAL 秒最多一次，"never" 交给操作系统
+HISTORY_FSYNC = "interval"
+HISTORY_FSYNC_INTERVAL = 5.0
+
+# 图表中文字体（见 font_resolver.py）：本地字体文件路径（None 自动查找），自动查找结果的缓存文件
+CHINESE_FONT_PATH = None
+FONT_CACHE_FILE = os.path.join(DATA_DIR, "font_cache.json")
+
+# 组合优化（见 optimizer.py）：每次处理快照后求解炸矿/制作/采购的最优组合
+OPTIMIZER_ENABLED = False
+# 每小时的炸矿与制作时间预算（秒），两者可同时进行
+OPTIMIZER_MINING_SECONDS = 3600
+OPTIMIZER_CRAFTING_SECONDS = 3600
+
+# 分层保留（见 rollups.py）：原始数据汇总为 1 小时 / 1 天K线，各层保留天数（None 永久保留）
+# 原始数据默认永久保留，升级后不会删除任何历史；设置天数后，裁剪掉的部分在回测等处由K线补齐
+ROLLUP_RETENTION_DAYS = {"raw": None, "1h": 730, "1d": None}
+# 主程序自动汇总与裁剪的间隔（秒，None 只通过 analysis_tool.py compact 手动执行）
+ROLLUP_INTERVAL = 3600
+# 图表选择能在窗口内给出至少这么多数据点的最粗层级（如 7 天用小时K线，100 天以上用天K线）
+ROLLUP_MIN_POINTS = 100
+
+# 增量存储（HISTORY_BACKEND = "delta"）：每隔多少个快照写入一次完整关键帧（重建任意时间点最多应用这么多个增量）
+DELTA_KEYFRAME_INTERVAL = 60
+
+# 相关性矩阵（见 correlation.py）：网格间隔与 as-of 对齐容差（pandas 时间间隔字符串，None 按天数所选层级的K线间隔 / 两个网格间隔）
+CORRELATION_FREQ = None
+CORRELATION_TOLERANCE = None
+# 滚动相关的窗口（网格点数），相关系数至少需要的共同样本数，热力图标注物品名称的最大物品数
+CORRELATION_WINDOW = 48
+CORRELATION_MIN_PERIODS = 20
+CORRELATION_LABEL_LIMIT = 60
+
+# 敏感性分析（见 sensitivity.py）：每个参数的默认网格点数，未指定范围时价格在当前价上下浮动的比例
+SENSITIVITY_POINTS = 201
+SENSITIVITY_PRICE_SPAN = 0.5
@@ -0,0 +1,292 @@
+import os
+import warnings
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import config
+from config import HISTORY_DIR
+from metrics import timed
+from rollups import choose_tier, read_item_history
+
+# 全部物品的价格相关性：各物品历史按时间容差做 as-of 对齐到同一时间网格
+# （网格点取该点之前、容差以内的最近一次价格），之后用矩阵乘法一次算出 N×N 相关矩阵，
+# 用累计和一次算出所选物品对的滚动相关。缺失数据按两两可用的样本计算（与 pandas corr 一致）。
+
+# 各层级默认的网格间隔（原始分钟数据按 5 分钟对齐）
+GRID_FREQ = {"raw": "5min", "1h": "h", "1d": "D"}
+
+
+def tracked_items(history_dir=None):
+    """有物品历史文件的全部物品"""
+    items_dir = os.path.join(history_dir or HISTORY_DIR, "items")
+    if not os.path.isdir(items_dir):
+        return []
+    return sorted(name[:-4] for name in os.listdir(items_dir) if name.endswith(".csv"))
+
+
+def grid_freq(days):
+    """网格间隔：config.CORRELATION_FREQ，未设置时按天数所选层级的K线间隔"""
+    return config.CORRELATION_FREQ or GRID_FREQ[choose_tier(days)]
+
+
+def align_prices(series, grid, tolerance):
+    """把各物品的价格序列 as-of 对齐到时间网格
+
+    series: {物品: DataFrame(timestamp, price_g)}；tolerance: pd.Timedelta
+    返回 (物品列表, 网格点数×物品数 的价格矩阵，容差内没有价格的位置为 NaN)。
+    所有物品拼成一个按 (物品, 时间) 排序的键数组，全部网格点用一次 searchsorted 定位。
+    """
+    names = [name for name, df in series.items() if df is not None and not df.empty]
+    if not names or len(grid) == 0:
+        return names, np.full((len(grid), len(names)), np.nan)
+
+    # 时间统一为秒，(物品序号, 秒) 编码为单个整数键
+    times = [series[name]['timestamp'].to_numpy('datetime64[s]').astype(np.int64) for name in names]
+    prices = [series[name]['price_g'].to_numpy(dtype=float) for name in names]
+    lengths = np.array([len(t) for t in times])
+    codes = np.repeat(np.arange(len(names)), lengths)
+    ts = np.concatenate(times)
+    px = np.concatenate(prices)
+    order = np.lexsort((ts, codes))
+    ts, px = ts[order], px[order]
+
+    grid_ts = grid.to_numpy('datetime64[s]').astype(np.int64)
+    base = min(ts.min(), grid_ts.min())
+    span = max(ts.max(), grid_ts.max()) - base + 1
+    keys = codes * span + (ts - base)
+    grid_keys = np.arange(len(names))[:, None] * span + (grid_ts - base)[None, :]
+
+    index = np.searchsorted(keys, grid_keys, side='right') - 1
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    valid = index >= starts[:, None]
+    index = np.maximum(index, 0)
+    valid &= grid_ts[None, :] - ts[index] <= int(tolerance.total_seconds())
+    return names, np.where(valid, px[index], np.nan).T
+
+
+def to_returns(values):
+    """价格矩阵转为相邻网格点的对数收益（任一端缺失或价格非正时为 NaN）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(np.where(values > 0, values, np.nan))
+    return np.diff(logs, axis=0)
+
+
+@timed("correlation_matrix")
+def correlation_matrix(values, min_periods=None):
+    """按两两可用样本计算相关矩阵，返回 (相关系数 N×N, 样本数 N×N)
+
+    各列先减去自身均值再做矩阵乘法，样本数少于 min_periods 或方差为零的物品对为 NaN。
+    """
+    min_periods = config.CORRELATION_MIN_PERIODS if min_periods is None else min_periods
+    mask = np.isfinite(values)
+    present = mask.any(axis=0)
+    means = np.zeros(values.shape[1])
+    means[present] = np.nanmean(values[:, present], axis=0)
+    x = np.where(mask, values - means, 0.0)
+    m = mask.astype(float)
+
+    n = m.T @ m
+    sx = x.T @ m           # sx[i, j]：i 与 j 都有数据时 i 的和
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[(n < max(min_periods, 2)) | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1.0, 1.0), n.astype(np.int64)
+
+
+def rolling_correlation(values, left, right, window, min_periods=None):
+    """物品对 (left[k], right[k]) 在每 window 个网格点上的滚动相关
+
+    返回 (网格点数-window+1)×物品对数 的矩阵，第 r 行对应以网格点 r+window-1 结束的窗口。
+    """
+    min_periods = config.CORRELATION_MIN_PERIODS if min_periods is None else min_periods
+    a, b = values[:, left], values[:, right]
+    both = np.isfinite(a) & np.isfinite(b)
+    if len(values) < window:
+        return np.empty((0, len(left)))
+
+    count_both = both.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(both, a - np.where(both, a, 0).sum(axis=0) / count_both, 0.0)
+        b = np.where(both, b - np.where(both, b, 0).sum(axis=0) / count_both, 0.0)
+
+    def window_sum(v):
+        total = np.cumsum(np.vstack([np.zeros((1, v.shape[1])), v]), axis=0)
+        return total[window:] - total[:-window]
+
+    n = window_sum(both.astype(float))
+    sa, sb = window_sum(a), window_sum(b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = window_sum(a * b) - sa * sb / n
+        var_a = window_sum(a * a) - sa * sa / n
+        var_b = window_sum(b * b) - sb * sb / n
+        corr = cov / np.sqrt(var_a * var_b)
+    # 累计和相减的舍入误差会让常数窗口的方差略大于零，按相对大小视为零
+    flat = (var_a <= 1e-12 * window_sum(a * a)) | (var_b <= 1e-12 * window_sum(b * b))
+    corr[(n < max(min(min_periods, window), 2)) | flat | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def ranked_pairs(corr, samples, top=None):
+    """按 |r| 从大到小排列的物品对下标 (左, 右)，top 为 None 时返回全部"""
+    left, right = np.triu_indices(len(corr), k=1)
+    r = corr[left, right]
+    keep = np.isfinite(r)
+    left, right, r = left[keep], right[keep], r[keep]
+    # 相关程度相同时样本多的在前
+    order = np.lexsort((-samples[left, right], -np.abs(r)))
+    if top is not None:
+        order = order[:top]
+    return left[order], right[order]
+
+
+class CorrelationAnalysis:
+    """一次对齐与相关计算的结果"""
+
+    def __init__(self, names, grid, values, corr, samples, returns):
+        self.names = names
+        self.grid = grid
+        self.values = values
+        self.corr = corr
+        self.samples = samples
+        self.returns = returns
+
+    def matrix_frame(self):
+        return pd.DataFrame(self.corr, index=self.names, columns=self.names)
+
+    def top_pairs(self, top, window):
+        """前 top 个物品对及其滚动相关，返回 (物品对 DataFrame, 滚动相关 DataFrame)"""
+        left, right = ranked_pairs(self.corr, self.samples, top)
+        rolling = rolling_correlation(self.values, left, right, window)
+        if len(rolling):
+            with warnings.catch_warnings():
+                # 整个窗口都没有有效相关的物品对结果为 NaN，不输出 RuntimeWarning
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                stats = {
+                    "rolling_mean": np.nanmean(rolling, axis=0),
+                    "rolling_min": np.nanmin(rolling, axis=0),
+                    "rolling_max": np.nanmax(rolling, axis=0),
+                }
+            # 最后一个有效的滚动相关
+            last = pd.DataFrame(rolling).ffill().iloc[-1].to_numpy()
+        else:
+            # 网格点数少于窗口，没有滚动相关
+            empty = np.full(len(left), np.nan)
+            stats = {"rolling_mean": empty, "rolling_min": empty, "rolling_max": empty}
+            last = empty
+
+        pairs = pd.DataFrame({
+            "item1": [self.names[i] for i in left],
+            "item2": [self.names[j] for j in right],
+            "correlation": self.corr[left, right],
+            "samples": self.samples[left, right],
+            **stats,
+            "rolling_last": last,
+        })
+        times = self.grid[len(self.grid) - len(rolling):] if len(rolling) else self.grid[:0]
+        series = pd.DataFrame(rolling, index=times, columns=[f"{self.names[i]}|{self.names[j]}"
+                                                              for i, j in zip(left, right)])
+        return pairs, series
+
+
+def analyze_correlations(item_names=None, days=30, freq=None, tolerance=None, returns=False,
+                         source=None, history_dir=None, now=None):
+    """读取物品历史、对齐到时间网格并计算相关矩阵
+
+    item_names 为空时使用全部有历史的物品；freq / tolerance 为 pandas 时间间隔字符串，
+    默认按天数所选层级的K线间隔与 config.CORRELATION_TOLERANCE（未设置时为两个网格间隔）。
+    returns 为 True 时计算对数收益的相关性而不是价格水平的相关性。
+    """
+    history_dir = history_dir or HISTORY_DIR
+    item_names = list(item_names or tracked_items(history_dir))
+    freq = freq or grid_freq(days)
+    # 网格间隔的时长（"D" 等日历偏移不能直接转为 Timedelta，按加到某个时间上的差值计算）
+    origin = pd.Timestamp(0)
+    step = origin + pd.tseries.frequencies.to_offset(freq) - origin
+    tolerance = pd.Timedelta(tolerance or config.CORRELATION_TOLERANCE or 2 * step)
+
+    series = {}
+    for item_name in item_names:
+        if source is not None:
+            df = source.item_history(item_name, days, ['price_g'])
+        else:
+            df = read_item_history(item_name, days, ['price_g'], history_dir)
+        series[item_name] = df
+
+    end = pd.Timestamp(now or datetime.now())
+    grid = pd.date_range(pd.Timestamp(end - timedelta(days=days)).ceil(freq), end.floor(freq), freq=freq)
+    names, values = align_prices(series, grid, tolerance)
+    if returns:
+        values, grid = to_returns(values), grid[1:]
+    corr, samples = correlation_matrix(values)
+    return CorrelationAnalysis(names, grid, values, corr, samples, returns)
+
+
+def plot_heatmap(analysis, output_file, days):
+    """相关矩阵热力图（按第一主成分排序，相关的物品聚在一起；物品较多时不标注名称）"""
+    import matplotlib.pyplot as plt
+    from font_resolver import setup_fonts
+
+    setup_fonts()
+    corr = analysis.corr
+    filled = np.nan_to_num(corr)
+    np.fill_diagonal(filled, 1.0)
+    order = np.argsort(np.linalg.eigh(filled)[1][:, -1]) if len(corr) > 2 else np.arange(len(corr))
+    names = [analysis.names[i] for i in order]
+
+    size = min(max(8, len(names) * 0.25), 30)
+    fig, ax = plt.subplots(figsize=(size + 2, size))
+    image = ax.imshow(corr[np.ix_(order, order)], cmap="RdBu_r", vmin=-1, vmax=1, interpolation="nearest")
+    fig.colorbar(image, ax=ax, shrink=0.8, label="r")
+    if len(names) <= config.CORRELATION_LABEL_LIMIT:
+        ax.set_xticks(range(len(names)))
+        ax.set_xticklabels(names, rotation=90)
+        ax.set_yticks(range(len(names)))
+        ax.set_yticklabels(names)
+    else:
+        ax.set_xticks([])
+        ax.set_yticks([])
+    kind = "收益" if analysis.returns else "价格"
+    ax.set_title(f"物品{kind}相关性矩阵 ({len(names)} 个物品, {days}天)")
+    fig.tight_layout()
+    fig.savefig(output_file)
+    plt.close(fig)
+    print(f"相关性热力图已保存至: {output_file}")
+
+
+def generate_correlation_matrix(item_names=None, days=30, output_file="correlation_matrix.png",
+                                pairs_file="correlation_pairs.csv", matrix_file=None, rolling_file=None,
+                                top=20, window=None, freq=None, tolerance=None, returns=False, source=None):
+    """全部物品（或指定物品）的相关矩阵热力图、相关性最强的物品对及其滚动相关"""
+    window = window or config.CORRELATION_WINDOW
+    analysis = analyze_correlations(item_names, days, freq, tolerance, returns, source)
+    if len(analysis.names) < 2:
+        print("错误: 至少需要两个有历史数据的物品")
+        return None
+
+    pairs, series = analysis.top_pairs(top, window)
+    if len(analysis.grid) < window:
+        print(f"提示: 网格点数 ({len(analysis.grid)}) 少于滚动窗口 ({window} 点)，不计算滚动相关"
+              f"（可减小 --window 或使用更细的 --freq）")
+    print(f"\n相关性最强的物品对 ({len(analysis.names)} 个物品, {len(analysis.grid)} 个网格点, "
+          f"滚动窗口 {window} 点):")
+    print(f"  {'物品1':<12} {'物品2':<12} {'r':>7} {'样本':>6} {'滚动均值':>8} {'滚动最小':>8} {'滚动最大':>8} {'最新':>7}")
+    for row in pairs.itertuples(index=False):
+        print(f"  {row.item1:<12} {row.item2:<12} {row.correlation:>7.3f} {row.samples:>6} "
+              f"{row.rolling_mean:>8.3f} {row.rolling_min:>8.3f} {row.rolling_max:>8.3f} {row.rolling_last:>7.3f}")
+
+    if output_file:
+        plot_heatmap(analysis, output_file, days)
+    if pairs_file:
+        pairs.to_csv(pairs_file, index=False, encoding='utf-8-sig')
+        print(f"物品对排名已保存至: {pairs_file}")
+    if matrix_file:
+        analysis.matrix_frame().to_csv(matrix_file, encoding='utf-8-sig')
+        print(f"相关矩阵已保存至: {matrix_file}")
+    if rolling_file:
+        series.rename_axis("timestamp").to_csv(rolling_file, encoding='utf-8-sig')
+        print(f"滚动相关已保存至: {rolling_file}")
+    return analysis
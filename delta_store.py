@@ -0,0 +1,367 @@
+import bisect
+import os
+import struct
+import numpy as np
+import config
+from config import HISTORY_DIR
+from market_snapshot import MarketSnapshot
+from metrics import count
+
+# 增量快照存储（HISTORY_BACKEND = "delta"）：市场快照按天写入 delta/market/<YYYY-MM-DD>.bin，
+# 每隔 DELTA_KEYFRAME_INTERVAL 个快照（以及每天第一个快照、进程重启后的第一个快照）写入完整关键帧，
+# 其余快照只记录价格或可购买数量变化的物品与下架的物品。
+# <YYYY-MM-DD>.idx 记录每个关键帧的 (时间, 字节偏移)，重建任意时间点只需从之前最近的关键帧开始应用增量。
+# 物品名称保存在 delta/items.txt（行号即物品编号，只追加）。
+
+# 记录头：时间（微秒）、类型（1 关键帧 / 0 增量）、变化物品数、下架物品数；
+# 之后依次为 物品编号 int32[n]、价格（铜币）int64[n]、可购买数量 int64[n]、下架物品编号 int32[m]
+RECORD_HEADER = struct.Struct("<qBII")
+INDEX_ENTRY = struct.Struct("<qq")
+KEYFRAME, DELTA = 1, 0
+
+DELTA_DIR = os.path.join(HISTORY_DIR, "delta")
+
+
+def _timestamp_us(timestamp):
+    return int(np.datetime64(timestamp, 'us').astype(np.int64))
+
+
+def _from_us(value):
+    return np.datetime64(int(value), 'us').item()
+
+
+def _parse_records(data, offset=0):
+    """解析记录，产出 (时间微秒, 类型, 编号, 价格, 可购买数量, 下架编号, 记录起始偏移)；遇到不完整的记录时停止"""
+    size = len(data)
+    while offset + RECORD_HEADER.size <= size:
+        ts, kind, n, m = RECORD_HEADER.unpack_from(data, offset)
+        body = offset + RECORD_HEADER.size
+        end = body + n * 20 + m * 4
+        if end > size:
+            return
+        ids = np.frombuffer(data, np.int32, n, body)
+        prices = np.frombuffer(data, np.int64, n, body + n * 4)
+        available = np.frombuffer(data, np.int64, n, body + n * 12)
+        removed = np.frombuffer(data, np.int32, m, body + n * 20)
+        yield ts, kind, ids, prices, available, removed, offset
+        offset = end
+
+
+class _State:
+    """重建过程中的当前快照（按物品编号存放的稠密数组）"""
+
+    def __init__(self, size=0):
+        self.prices = np.zeros(size, dtype=np.int64)
+        self.available = np.zeros(size, dtype=np.int64)
+        self.present = np.zeros(size, dtype=bool)
+
+    def _grow(self, size):
+        if size > len(self.present):
+            extra = size - len(self.present) + 256
+            self.prices = np.concatenate([self.prices, np.zeros(extra, dtype=np.int64)])
+            self.available = np.concatenate([self.available, np.zeros(extra, dtype=np.int64)])
+            self.present = np.concatenate([self.present, np.zeros(extra, dtype=bool)])
+
+    def apply(self, kind, ids, prices, available, removed):
+        if kind == KEYFRAME:
+            self.present[:] = False
+        if len(ids):
+            self._grow(int(ids.max()) + 1)
+            self.prices[ids] = prices
+            self.available[ids] = available
+            self.present[ids] = True
+        if len(removed):
+            self.present[removed] = False
+
+
+class DeltaStore:
+    """关键帧 + 增量的市场快照存储"""
+
+    def __init__(self, directory=None, keyframe_interval=None):
+        self.directory = directory or DELTA_DIR
+        self.keyframe_interval = keyframe_interval or config.DELTA_KEYFRAME_INTERVAL
+        self._names = None
+        self._name_ids = {}
+        self._table_map = (None, np.zeros(0, dtype=np.int64))  # (ItemTable, 表编号 -> 存储编号)
+        # 写入状态：当前文件所在的天、上一快照（稠密数组）与距上个关键帧的快照数
+        self._day = None
+        self._last = None
+        self._since_keyframe = 0
+
+    # ---- 物品编号 ----
+
+    def _items_path(self):
+        return os.path.join(self.directory, "items.txt")
+
+    def names(self, size=0):
+        """物品名称列表（编号超出已加载的名称时重新读取，其他进程可能追加了新物品）"""
+        if self._names is None or size > len(self._names):
+            self._names = []
+            if os.path.isfile(self._items_path()):
+                with open(self._items_path(), encoding='utf-8') as f:
+                    self._names = [line.rstrip("\n") for line in f]
+            self._name_ids = {name: i for i, name in enumerate(self._names)}
+        return self._names
+
+    def _store_ids(self, market_data, batch):
+        """快照中各物品的存储编号（新物品先追加到名称文件）"""
+        self.names()  # 只为其副作用：首次使用时从名称文件加载 _names / _name_ids
+        if hasattr(market_data, "ids"):
+            # MarketSnapshot：按共享物品表编号缓存映射，只查找新出现的物品
+            table, mapping = self._table_map
+            if table is not market_data.table:
+                table, mapping = market_data.table, np.zeros(0, dtype=np.int64)
+            table_ids = market_data.ids
+            if len(table_ids) and table_ids.max() >= len(mapping):
+                mapping = np.concatenate([mapping, np.full(table_ids.max() + 1 - len(mapping), -1, dtype=np.int64)])
+            missing = table_ids[mapping[table_ids] < 0] if len(table_ids) else table_ids
+            if len(missing):
+                snapshot_names = market_data.names()
+                rows = {item_id: row for row, item_id in enumerate(table_ids.tolist())}
+                for item_id in missing.tolist():
+                    mapping[item_id] = self._name_id(snapshot_names[rows[item_id]], batch)
+            self._table_map = (table, mapping)
+            return mapping[table_ids]
+        return np.array([self._name_id(name, batch) for name in market_data], dtype=np.int64)
+
+    def _name_id(self, name, batch):
+        item_id = self._name_ids.get(name)
+        if item_id is None:
+            item_id = len(self._names)
+            batch.open(self._items_path()).write((name + "\n").encode('utf-8'))
+            self._names.append(name)
+            self._name_ids[name] = item_id
+        return item_id
+
+    # ---- 写入 ----
+
+    def _paths(self, day):
+        base = os.path.join(self.directory, "market", day)
+        return base + ".bin", base + ".idx"
+
+    def _repair_tail(self, path):
+        """进程重启后追加前截掉上次未写完的记录"""
+        if not os.path.isfile(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = 0
+        for ts, kind, ids, prices, available, removed, offset in _parse_records(data):
+            end = offset + RECORD_HEADER.size + len(ids) * 20 + len(removed) * 4
+        if end < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+
+    def write(self, market_data, timestamp, batch=None):
+        """写入一个快照，返回写入的字节数
+
+        batch 为历史写入器的批次时文件由批次打开，批次结束时按 fsync 策略同步后关闭。
+        """
+        own = batch is None
+        if own:
+            from history_writer import GroupCommit
+            batch = GroupCommit(sync=False)
+        try:
+            return self._write(market_data, timestamp, batch)
+        finally:
+            if own:
+                batch.close()
+
+    def _write(self, market_data, timestamp, batch):
+        ids = self._store_ids(market_data, batch)
+        if hasattr(market_data, "prices"):
+            prices = np.asarray(market_data.prices, dtype=np.int64)
+            available = np.asarray(market_data.available, dtype=np.int64)
+        else:
+            items = list(market_data.values())
+            prices = np.array([item.price for item in items], dtype=np.int64)
+            available = np.array([item.available for item in items], dtype=np.int64)
+
+        day = timestamp.strftime("%Y-%m-%d")
+        data_path, index_path = self._paths(day)
+        if day != self._day:
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            self._repair_tail(data_path)
+            self._day, self._last = day, None
+
+        size = int(ids.max()) + 1 if len(ids) else 0
+        keyframe = self._last is None or self._since_keyframe >= self.keyframe_interval
+        if keyframe:
+            removed = np.zeros(0, dtype=np.int32)
+            changed = np.ones(len(ids), dtype=bool)
+            self._last = _State(size)
+            self._since_keyframe = 0
+        else:
+            last = self._last
+            last._grow(size)
+            changed = ~last.present[ids] | (last.prices[ids] != prices) | (last.available[ids] != available)
+            current = np.zeros(len(last.present), dtype=bool)
+            current[ids] = True
+            removed = np.flatnonzero(last.present & ~current).astype(np.int32)
+        self._last.apply(KEYFRAME if keyframe else DELTA, ids, prices, available, removed)
+        self._since_keyframe += 1
+
+        record = b"".join([
+            RECORD_HEADER.pack(_timestamp_us(timestamp), KEYFRAME if keyframe else DELTA,
+                               int(changed.sum()), len(removed)),
+            ids[changed].astype(np.int32).tobytes(),
+            prices[changed].astype(np.int64).tobytes(),
+            available[changed].astype(np.int64).tobytes(),
+            removed.tobytes(),
+        ])
+        data = batch.open(data_path)
+        offset = data.tell()
+        data.write(record)
+        if keyframe:
+            batch.open(index_path).write(INDEX_ENTRY.pack(_timestamp_us(timestamp), offset))
+
+        count("bytes_written.delta", len(record))
+        count("rows_written.delta_changed", int(changed.sum()))
+        return len(record)
+
+    # ---- 读取 ----
+
+    def days(self):
+        market_dir = os.path.join(self.directory, "market")
+        if not os.path.isdir(market_dir):
+            return []
+        return sorted(name[:-4] for name in os.listdir(market_dir) if name.endswith(".bin"))
+
+    def _keyframe_offset(self, day, start_us):
+        """当天时间不晚于 start_us 的最后一个关键帧的偏移（没有索引时从文件开头读取）"""
+        _, index_path = self._paths(day)
+        if start_us is None or not os.path.isfile(index_path):
+            return 0
+        with open(index_path, 'rb') as f:
+            data = f.read()
+        entries = [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data) - INDEX_ENTRY.size + 1,
+                                                                    INDEX_ENTRY.size)]
+        position = bisect.bisect_right([ts for ts, _ in entries], start_us) - 1
+        return entries[position][1] if position >= 0 else 0
+
+    def iter_states(self, start=None, end=None):
+        """按时间顺序重建 [start, end] 内的每个快照，产出 (时间, _State)（状态对象被复用，需要时自行复制）"""
+        start_us = _timestamp_us(start) if start is not None else None
+        end_us = _timestamp_us(end) if end is not None else None
+        start_day = start.strftime("%Y-%m-%d") if start is not None else None
+        end_day = end.strftime("%Y-%m-%d") if end is not None else None
+
+        for day in self.days():
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            data_path, _ = self._paths(day)
+            offset = self._keyframe_offset(day, start_us) if day == start_day else 0
+            with open(data_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+
+            state = _State(len(self.names()))
+            for ts, kind, ids, prices, available, removed, _ in _parse_records(data):
+                if end_us is not None and ts > end_us:
+                    return
+                state.apply(kind, ids, prices, available, removed)
+                if start_us is None or ts >= start_us:
+                    yield _from_us(ts), state
+
+    def _snapshot(self, state):
+        ids = np.flatnonzero(state.present)
+        names = self.names(int(ids[-1]) + 1 if len(ids) else 0)
+        return MarketSnapshot.from_columns([names[i] for i in ids], state.prices[ids], state.available[ids])
+
+    def iter_snapshots(self, start=None, end=None):
+        """按时间顺序产出 (时间, MarketSnapshot)"""
+        for timestamp, state in self.iter_states(start, end):
+            yield timestamp, self._snapshot(state)
+
+    def snapshot_at(self, timestamp):
+        """时间不晚于 timestamp 的最近一个快照，返回 (时间, MarketSnapshot)，没有时返回 None"""
+        day = timestamp.strftime("%Y-%m-%d")
+        for candidate in reversed([d for d in self.days() if d <= day]):
+            # 当天从最近的关键帧开始；更早的天从最后一个关键帧开始
+            start_us = _timestamp_us(timestamp) if candidate == day else None
+            data_path, _ = self._paths(candidate)
+            offset = self._keyframe_offset(candidate, start_us if start_us is not None else 2 ** 62)
+            with open(data_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+
+            state, found = _State(len(self.names())), None
+            for ts, kind, ids, prices, available, removed, _ in _parse_records(data):
+                if start_us is not None and ts > start_us:
+                    break
+                state.apply(kind, ids, prices, available, removed)
+                found = ts
+            if found is not None:
+                return _from_us(found), self._snapshot(state)
+        return None
+
+    def load_market_history(self, start=None, end=None):
+        """读取市场历史为 DataFrame（列同 full_history.csv）"""
+        import pandas as pd
+
+        frames = []
+        for timestamp, state in self.iter_states(start, end):
+            ids = np.flatnonzero(state.present)
+            names = np.array(self.names(int(ids[-1]) + 1 if len(ids) else 0), dtype=object)
+            frames.append(pd.DataFrame({
+                "timestamp": timestamp,
+                "item": names[ids],
+                "price_g": state.prices[ids] / 10000.0,
+                "available": state.available[ids],
+            }))
+        if not frames:
+            return pd.DataFrame(columns=["timestamp", "item", "price_g", "available"])
+        return pd.concat(frames, ignore_index=True)
+
+    def export_csv(self, output_dir=None):
+        """兼容导出：将尚未导出的快照（完整行）追加到 full_history.csv 与 items/<物品>.csv，返回导出的快照数"""
+        import json
+        from datetime import timedelta
+        from history_store import MARKET_HEADER, ITEM_HEADER, _append_csv
+        from money import format_gold
+
+        output_dir = output_dir or HISTORY_DIR
+        state_path = os.path.join(self.directory, "export_state.json")
+        state = {}
+        if os.path.isfile(state_path):
+            with open(state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        # 导出进度（最后导出的快照时间，微秒）按导出目录分别记录
+        last_us = state.get(os.path.abspath(output_dir))
+        start = _from_us(last_us) + timedelta(microseconds=1) if last_us is not None else None
+
+        full_rows, item_rows, exported = [], {}, 0
+        for timestamp, state_arrays in self.iter_states(start):
+            ts = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            ids = np.flatnonzero(state_arrays.present)
+            names = self.names(int(ids[-1]) + 1 if len(ids) else 0)
+            for item_id, price, available in zip(ids.tolist(), state_arrays.prices[ids].tolist(),
+                                                 state_arrays.available[ids].tolist()):
+                price_g = format_gold(price)
+                full_rows.append([ts, names[item_id], price_g, available])
+                item_rows.setdefault(names[item_id], []).append([ts, price_g, available])
+            last_us = _timestamp_us(timestamp)
+            exported += 1
+
+        if full_rows:
+            os.makedirs(os.path.join(output_dir, "items"), exist_ok=True)
+            _append_csv(os.path.join(output_dir, "full_history.csv"), MARKET_HEADER, full_rows)
+            for name, rows in item_rows.items():
+                _append_csv(os.path.join(output_dir, "items", f"{name}.csv"), ITEM_HEADER, rows)
+            state[os.path.abspath(output_dir)] = last_us
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+
+        print(f"已导出 {exported} 个市场快照到 {output_dir}")
+        return exported
+
+
+_default_store = None
+
+
+def get_delta_store():
+    """获取当前历史目录的增量存储（跨快照保留上一快照用于计算变化）"""
+    global _default_store
+    if _default_store is None or _default_store.directory != DELTA_DIR:
+        _default_store = DeltaStore(DELTA_DIR)
+    return _default_store
@@ -0,0 +1,113 @@
+import functools
+import json
+import os
+import config
+
+# 中文字体解析：按 配置的字体文件 -> 缓存 -> 常见字体文件路径 -> 已安装字体列表 的顺序查找，
+# 找到的字体文件路径写入缓存文件，之后的进程直接注册该文件，不再扫描字体列表；
+# 找不到的结果连同 matplotlib 字体列表的指纹一起缓存，字体列表变化前不再重复扫描。
+# 不访问网络（分析主机可能无法联网），找不到时回退到默认字体并提示。
+
+# 按优先级排列的中文字体名称
+CHINESE_FONT_NAMES = [
+    'SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS', 'WenQuanYi Micro Hei',
+    'Noto Sans CJK SC', 'Source Han Sans SC', 'PingFang SC',
+]
+
+# 常见的中文字体文件位置（项目目录、Linux、Windows、macOS）
+CHINESE_FONT_PATHS = [
+    os.path.join(config.BASE_DIR, "fonts", "SimHei.ttf"),
+    os.path.join(config.BASE_DIR, "NotoSansCJKsc-Regular.otf"),
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/Library/Fonts/Arial Unicode.ttf",
+]
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cached if isinstance(cached, dict) else {}
+
+
+def _write_cache(cache_file, cached):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(cached, f, ensure_ascii=False)
+    except OSError:
+        pass  # 只读目录下仍可使用本次解析的结果
+
+
+def _font_fingerprint():
+    """已安装字体列表的指纹：matplotlib 字体列表缓存文件的名称与修改时间（字体列表重建后改变）"""
+    import glob
+    import matplotlib
+    caches = sorted(glob.glob(os.path.join(matplotlib.get_cachedir(), "fontlist-*.json")))
+    return [[os.path.basename(p), os.stat(p).st_mtime_ns] for p in caches]
+
+
+def _scan_installed():
+    """在 matplotlib 已知字体中查找中文字体文件（较慢，只在没有缓存时执行）"""
+    from matplotlib import font_manager
+    by_name = {}
+    for font in font_manager.fontManager.ttflist:
+        by_name.setdefault(font.name.lower(), font.fname)
+    for name in CHINESE_FONT_NAMES:
+        if name.lower() in by_name:
+            return by_name[name.lower()]
+    return None
+
+
+def resolve_font_path(refresh=False):
+    """中文字体文件路径（找不到时为 None），结果缓存到 config.FONT_CACHE_FILE"""
+    if config.CHINESE_FONT_PATH and os.path.isfile(config.CHINESE_FONT_PATH):
+        return config.CHINESE_FONT_PATH
+
+    cache_file = config.FONT_CACHE_FILE
+    cached = _read_cache(cache_file) if cache_file and not refresh else {}
+    if cached.get("path") and os.path.isfile(cached["path"]):
+        return cached["path"]
+
+    path = next((p for p in CHINESE_FONT_PATHS if os.path.isfile(p)), None)
+    if path is None:
+        # 上次没有找到且字体列表未变化时不再扫描
+        if "fingerprint" in cached and cached["fingerprint"] == _font_fingerprint():
+            return None
+        path = _scan_installed()
+
+    if cache_file:
+        _write_cache(cache_file, {"path": path} if path else {"path": None, "fingerprint": _font_fingerprint()})
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def setup_fonts():
+    """为 matplotlib 设置中文字体（每个进程只执行一次），返回字体名称，找不到时返回 None"""
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+
+    path = resolve_font_path()
+    if path:
+        try:
+            font_manager.fontManager.addfont(path)
+            name = font_manager.FontProperties(fname=path).get_name()
+            plt.rcParams['font.sans-serif'] = [name] + [
+                font for font in plt.rcParams['font.sans-serif'] if font != name]
+            return name
+        except Exception as e:
+            print(f"字体注册失败: {path} - {e}")
+
+    print("警告: 无法找到中文字体，图表可能无法正确显示中文"
+          "（可在 config.py 中设置 CHINESE_FONT_PATH 指向本地字体文件）")
+    return None
@@ -0,0 +1,162 @@
+import json
+import os
+from io import BytesIO
+import pandas as pd
+
+# 边车索引文件后缀：<文件名>.idx，记录每天数据所在的字节范围
+INDEX_SUFFIX = ".idx"
+
+
+def _index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def _scan(f, offset, days):
+    """从 offset 开始扫描完整行，更新每天的 [起始, 结束) 字节范围，返回已索引位置"""
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # 最后一行尚未写完，下次再索引
+        day = line[:10].decode('utf-8', errors='ignore')
+        end = offset + len(line)
+        if day in days:
+            days[day][0] = min(days[day][0], offset)
+            days[day][1] = max(days[day][1], end)
+        else:
+            days[day] = [offset, end]
+        offset = end
+    return offset
+
+
+def load_index(path):
+    """读取或增量更新 CSV 历史文件的时间索引
+
+    历史文件只追加写入，因此只需扫描上次索引之后新增的部分；
+    文件变小（被重写）时重建索引。
+    """
+    size = os.path.getsize(path)
+    index = None
+    if os.path.isfile(_index_path(path)):
+        try:
+            with open(_index_path(path), encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+
+    if index is not None and index.get("indexed_size", 0) == size:
+        return index
+
+    with open(path, 'rb') as f:
+        if index is None or index.get("indexed_size", 0) > size:
+            header_line = f.readline()
+            index = {
+                "header": header_line.decode('utf-8-sig').strip().split(","),
+                "header_size": len(header_line),
+                "indexed_size": len(header_line),
+                "days": {}
+            }
+        index["indexed_size"] = _scan(f, index["indexed_size"], index["days"])
+
+    try:
+        with open(_index_path(path), 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+    except OSError:
+        pass  # 只读目录下仍可使用内存中的索引
+    return index
+
+
+def read_history(path, start=None, end=None, columns=None, filters=None):
+    """按时间范围、列和等值条件读取 CSV 历史文件
+
+    通过边车索引只读取 [start, end] 覆盖的天所在的字节范围，只解析需要的列；
+    filters 为 {列名: 值或值列表}，在解析前先按字节粗筛行。
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return pd.DataFrame(columns=columns or [])
+
+    index = load_index(path)
+    header = index["header"]
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    start_day = start.strftime("%Y-%m-%d") if start is not None else None
+    end_day = end.strftime("%Y-%m-%d") if end is not None else None
+
+    ranges = [r for day, r in index["days"].items()
+              if (start_day is None or day >= start_day) and (end_day is None or day <= end_day)]
+    if not ranges:
+        return pd.DataFrame(columns=columns or header)
+
+    begin = min(r[0] for r in ranges)
+    stop = max(r[1] for r in ranges)
+    with open(path, 'rb') as f:
+        f.seek(begin)
+        data = f.read(stop - begin)
+
+    # 字节级粗筛：只保留包含筛选值的行
+    filters = {k: ([v] if isinstance(v, str) else list(v)) for k, v in (filters or {}).items()}
+    if filters:
+        lines = data.splitlines(keepends=True)
+        for values in filters.values():
+            needles = [str(v).encode('utf-8') for v in values]
+            lines = [line for line in lines if any(n in line for n in needles)]
+        data = b"".join(lines)
+
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(["timestamp"] + list(columns) + list(filters)))
+
+    if not data:
+        return pd.DataFrame(columns=usecols or header)
+
+    df = pd.read_csv(BytesIO(data), header=None, names=header, usecols=usecols,
+                     parse_dates=['timestamp'])
+
+    # 精确过滤
+    if start is not None:
+        df = df[df['timestamp'] >= start]
+    if end is not None:
+        df = df[df['timestamp'] <= end]
+    for column, values in filters.items():
+        df = df[df[column].isin(values)]
+
+    if columns is not None:
+        df = df[list(dict.fromkeys(["timestamp"] + list(columns)))]
+    return df.reset_index(drop=True)
+
+
+def first_timestamp(path):
+    """CSV 历史文件第一行的时间（文件按时间追加写入），没有数据时返回 None"""
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return None
+    index = load_index(path)
+    if not index["days"]:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(min(r[0] for r in index["days"].values()))
+        line = f.readline()
+    return pd.Timestamp(line.decode('utf-8').split(",", 1)[0])
+
+
+def truncate_before(path, day):
+    """删除 day（YYYY-MM-DD）之前的行：保留表头重写文件并删除旧索引，返回删除的字节数"""
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return 0
+    index = load_index(path)
+    kept = [r for d, r in index["days"].items() if d >= day]
+    dropped = [r for d, r in index["days"].items() if d < day]
+    if not dropped:
+        return 0
+    keep_from = min(r[0] for r in kept) if kept else index["indexed_size"]
+
+    tmp_path = path + ".tmp"
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        dst.write(src.read(index["header_size"]))
+        src.seek(keep_from)
+        dst.write(src.read())  # 包括索引之后新追加的部分
+    removed = os.path.getsize(path) - os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+    # 文件变小后旧索引失效，直接删除以便下次读取时重建
+    if os.path.isfile(_index_path(path)):
+        os.remove(_index_path(path))
+    return removed
@@ -1,91 +1,133 @@
-import csv
 import os
 from datetime import datetime
-from config import HISTORY_DIR
+from config import HISTORY_DIR, HISTORY_BACKEND
+from history_writer import get_history_writer
+from metrics import timed, count
+from money import format_gold, strategy_copper
+from strategy_aggregates import get_strategy_aggregates
 
 
+FULL_HISTORY_HEADER = ["timestamp", "item", "price_g", "available"]
+ITEM_HISTORY_HEADER = ["timestamp", "price_g", "available"]
+STRATEGY_HISTORY_HEADER = [
+    "timestamp", "ore", "strategy", "mining_profit_g",
+    "disenchant_profit_g", "total_profit_g", "type"
+]
+
+
+@timed("record_market_data")
 def record_market_data(market_data, timestamp=None):
-    """记录市场数据到历史文件"""
+    """记录市场数据到历史文件（由历史写入器在本次处理结束时批量写入，market_data 之后不应再修改）"""
     if not market_data:
         return
 
     if timestamp is None:
         timestamp = datetime.now()
 
-    # 准备完整历史文件路径
+    # 列式存储：整个快照写入一个压缩分块
+    if HISTORY_BACKEND == "columnar":
+        from history_store import write_market_snapshot
+        get_history_writer().submit(lambda batch: write_market_snapshot(market_data, timestamp, batch=batch))
+        count("rows_written.market_history", len(market_data))
+        print(f"已记录 {len(market_data)} 条物品数据到列式存储")
+        return
+
+    # 增量存储：只记录价格或可购买数量变化的物品，定期写入关键帧
+    if HISTORY_BACKEND == "delta":
+        from delta_store import get_delta_store
+        store = get_delta_store()
+        get_history_writer().submit(lambda batch: store.write(market_data, timestamp, batch))
+        count("rows_written.market_history", len(market_data))
+        print(f"已记录 {len(market_data)} 条物品数据到增量存储")
+        return
+
+    # 完整历史文件与按物品的单独文件（路径在提交时确定）
     full_history_path = os.path.join(HISTORY_DIR, "full_history.csv")
-    os.makedirs(HISTORY_DIR, exist_ok=True)
+    items_dir = os.path.join(HISTORY_DIR, "items")
 
-    # 写入完整历史文件
-    file_exists = os.path.isfile(full_history_path)
-    with open(full_history_path, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["timestamp", "item", "price_g", "available"])
+    def write(batch):
+        time_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        start, end = batch.append(full_history_path, FULL_HISTORY_HEADER, [
+            [time_str, item.name, format_gold(item.price), item.available]  # 铜币精确转换为金币
+            for item in market_data.values()
+        ])
+        count("bytes_written.full_history", end - start)
 
+        written = 0
         for item in market_data.values():
-            price_g = item.price / 10000.0  # 转换为金币
-            writer.writerow([
-                timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                item.name,
-                f"{price_g:.4f}",
-                item.available
-            ])
-
-    # 按物品存储单独文件
-    items_dir = os.path.join(HISTORY_DIR, "items")
-    os.makedirs(items_dir, exist_ok=True)
+            start, end = batch.append(os.path.join(items_dir, f"{item.name}.csv"), ITEM_HISTORY_HEADER,
+                                      [[time_str, format_gold(item.price), item.available]])
+            written += end - start
+        count("bytes_written.items", written)
 
-    for item in market_data.values():
-        item_file = os.path.join(items_dir, f"{item.name}.csv")
-        file_exists = os.path.isfile(item_file)
+    get_history_writer().submit(write)
+    count("rows_written.market_history", len(market_data))
+    print(f"已记录 {len(market_data)} 条物品数据到历史文件")
 
-        with open(item_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["timestamp", "price_g", "available"])
 
-            price_g = item.price / 10000.0
-            writer.writerow([
-                timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                f"{price_g:.4f}",
-                item.available
-            ])
+def _strategy_row(timestamp, ore_name, strategy_name, strategy_data):
+    return [
+        timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        ore_name,
+        strategy_name,
+        format_gold(strategy_copper(strategy_data, "mining_profit")),
+        format_gold(strategy_copper(strategy_data, "disenchant_profit")),
+        format_gold(strategy_copper(strategy_data, "profit")),
+        strategy_data.get("type", "unknown")
+    ]
 
-    print(f"已记录 {len(market_data)} 条物品数据到历史文件")
+
+def _append_strategy_rows(batch, rows, history_dir=None):
+    """在写入批次中追加策略历史行，返回本次写入的 (起始, 结束) 字节偏移"""
+    strategy_history_path = os.path.join(history_dir or HISTORY_DIR, "strategy_history.csv")
+    start, end = batch.append(strategy_history_path, STRATEGY_HISTORY_HEADER, rows)
+    count("bytes_written.strategy_history", end - start)
+    return start, end
 
 
 def record_strategy_performance(timestamp, ore_name, strategy_name, strategy_data):
     """记录策略收益到历史文件"""
-    strategy_history_path = os.path.join(HISTORY_DIR, "strategy_history.csv")
-    os.makedirs(HISTORY_DIR, exist_ok=True)
-
-    file_exists = os.path.isfile(strategy_history_path)
-    with open(strategy_history_path, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow([
-                "timestamp", "ore", "strategy", "mining_profit_g",
-                "disenchant_profit_g", "total_profit_g", "type"
-            ])
-
-        writer.writerow([
-            timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            ore_name,
-            strategy_name,
-            f"{strategy_data.get('mining_profit_g', 0):.4f}",
-            f"{strategy_data.get('disenchant_profit_g', 0):.4f}",
-            f"{strategy_data.get('profit', 0):.4f}",
-            strategy_data.get("type", "unknown")
-        ])
-
+    row = _strategy_row(timestamp, ore_name, strategy_name, strategy_data)
+    history_dir = HISTORY_DIR
+    get_history_writer().submit(lambda batch: _append_strategy_rows(batch, [row], history_dir))
+    count("rows_written.strategy_history")
     print(f"已记录策略: {strategy_name} (矿石: {ore_name})")
 
 
+def _write_strategy_snapshots(batch, entries):
+    """列式存储：批次内暂存的各矿石策略收益按时间合并，每次评估写入一条记录，写完后更新聚合"""
+    from history_store import write_strategy_snapshot
+    by_time = {}
+    for timestamp, ore_name, all_strategies in entries:
+        by_time.setdefault(timestamp, {})[ore_name] = all_strategies
+
+    aggregates = get_strategy_aggregates()
+    for timestamp, strategies_by_ore in by_time.items():
+        position = write_strategy_snapshot(timestamp, strategies_by_ore, batch=batch)
+        batch.after(lambda t=timestamp, s=strategies_by_ore, p=position: aggregates.record(t, s, p))
+
+
+@timed("record_all_strategies")
 def record_all_strategies(timestamp, ore_name, all_strategies):
-    """记录所有策略的收益"""
+    """记录所有策略的收益（一次批量写入，并更新按天的策略聚合）"""
     if not all_strategies:
         return
 
-    for strategy_name, strategy_data in all_strategies.items():
-        record_strategy_performance(timestamp, ore_name, strategy_name, strategy_data)
\ No newline at end of file
+    rows = None
+    if HISTORY_BACKEND != "columnar":
+        rows = [_strategy_row(timestamp, ore_name, strategy_name, strategy_data)
+                for strategy_name, strategy_data in all_strategies.items()]
+    history_dir = HISTORY_DIR
+
+    def write(batch):
+        if rows is None:
+            # 同一次处理中各矿石的策略收益合并为一条列式记录
+            batch.stage("strategy_snapshot", _write_strategy_snapshots, (timestamp, ore_name, all_strategies))
+            return
+        position = _append_strategy_rows(batch, rows, history_dir)
+        # 批次写完后更新按天的策略聚合（策略报告直接读取聚合；补齐时需读取已写入的历史）
+        batch.after(lambda: get_strategy_aggregates().record(timestamp, {ore_name: all_strategies}, position))
+
+    get_history_writer().submit(write)
+    count("rows_written.strategy_history", len(all_strategies))
+    print(f"已记录 {len(all_strategies)} 条策略收益 (矿石: {ore_name})")
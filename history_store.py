@@ -0,0 +1,316 @@
+import csv
+import json
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+from config import HISTORY_DIR
+from metrics import count
+from money import format_gold, strategy_copper
+
+# 列式存储目录：store/<数据集>/<YYYY-MM-DD>.dat 按天追加的压缩列式记录（每个快照一条），
+# <YYYY-MM-DD>.idx 为定长索引 (时间微秒, 偏移, 长度)，读取一天只需打开两个文件
+STORE_DIR = os.path.join(HISTORY_DIR, "store")
+
+MARKET_HEADER = ["timestamp", "item", "price_g", "available"]
+ITEM_HEADER = ["timestamp", "price_g", "available"]
+STRATEGY_HEADER = [
+    "timestamp", "ore", "strategy", "mining_profit_g",
+    "disenchant_profit_g", "total_profit_g", "type"
+]
+
+INDEX_ENTRY = struct.Struct("<qqq")
+INDEX_DTYPE = np.dtype([("time", "<i8"), ("offset", "<i8"), ("length", "<i8")])
+EPOCH = datetime(1970, 1, 1)
+
+
+def _micros(timestamp):
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def _paths(store_dir, dataset, day):
+    dataset_dir = os.path.join(store_dir or STORE_DIR, dataset)
+    return os.path.join(dataset_dir, f"{day}.dat"), os.path.join(dataset_dir, f"{day}.idx")
+
+
+def _encode_columns(columns):
+    """列字典编码为一条压缩记录：一行 JSON 列描述 + 各列原始字节（字符串列为换行连接的 UTF-8）"""
+    layout, parts = [], []
+    for name, values in columns.items():
+        if isinstance(values, list) or values.dtype.kind in "UO":
+            data = "\n".join(values).encode('utf-8')
+            layout.append([name, "str", len(values), len(data)])
+        else:
+            data = np.ascontiguousarray(values).tobytes()
+            layout.append([name, values.dtype.str, len(values), len(data)])
+        parts.append(data)
+    header = json.dumps(layout, ensure_ascii=False).encode('utf-8') + b"\n"
+    return zlib.compress(header + b"".join(parts))
+
+
+def _decode_columns(blob):
+    data = zlib.decompress(blob)
+    offset = data.index(b"\n") + 1
+    columns = {}
+    for name, dtype, length, size in json.loads(data[:offset]):
+        raw = data[offset:offset + size]
+        offset += size
+        if dtype == "str":
+            columns[name] = raw.decode('utf-8').split("\n") if length else []
+        else:
+            columns[name] = np.frombuffer(raw, dtype=dtype)
+    return columns
+
+
+def _append_record(dataset, timestamp, columns, store_dir=None, batch=None):
+    """将一个快照的所有行作为一条压缩列式记录追加到当天的数据文件并登记索引，返回记录键
+
+    batch 为历史写入器的批次时文件由批次打开，批次结束时按 fsync 策略同步后关闭。
+    读取时只认数据已完整写入的索引项，写了一半的尾部会被忽略。
+    """
+    day = timestamp.strftime("%Y-%m-%d")
+    data_path, index_path = _paths(store_dir, dataset, day)
+    blob = _encode_columns(columns)
+
+    own = batch is None
+    if own:
+        from history_writer import GroupCommit
+        batch = GroupCommit(sync=False)
+    try:
+        data = batch.open(data_path)
+        offset = data.tell()
+        data.write(blob)
+
+        index = batch.open(index_path)
+        position = index.tell()
+        if position % INDEX_ENTRY.size:
+            # 丢弃上次中断时写了一半的索引项
+            position -= position % INDEX_ENTRY.size
+            index.truncate(position)
+            index.seek(position)
+        index.write(INDEX_ENTRY.pack(_micros(timestamp), offset, len(blob)))
+    finally:
+        if own:
+            batch.close()
+
+    count(f"bytes_written.store.{dataset}", len(blob) + INDEX_ENTRY.size)
+    return f"{day}/{position // INDEX_ENTRY.size:08d}"
+
+
+def next_key(key):
+    """同一天中紧接 key 的下一条记录的键"""
+    return f"{key[:10]}/{int(key[11:]) + 1:08d}"
+
+
+def write_market_snapshot(market_data, timestamp, store_dir=None, batch=None):
+    """写入一个市场快照（MarketSnapshot 直接使用数组视图），返回记录键"""
+    if hasattr(market_data, "prices"):
+        columns = {
+            "item": market_data.names(),
+            "price": market_data.prices,
+            "available": market_data.available,
+        }
+        return _append_record("market", timestamp, columns, store_dir, batch)
+
+    items = list(market_data.values())
+    columns = {
+        "item": [item.name for item in items],
+        "price": np.array([item.price for item in items], dtype=np.int64),
+        "available": np.array([item.available for item in items], dtype=np.int64),
+    }
+    return _append_record("market", timestamp, columns, store_dir, batch)
+
+
+def write_strategy_snapshot(timestamp, strategies_by_ore, store_dir=None, batch=None):
+    """写入一次评估中所有矿石的策略收益 {矿石: {策略: 数据}}（一条记录），返回记录键"""
+    ores, names, data = [], [], []
+    for ore_name, all_strategies in strategies_by_ore.items():
+        for strategy_name, strategy_data in all_strategies.items():
+            ores.append(ore_name)
+            names.append(strategy_name)
+            data.append(strategy_data)
+    columns = {
+        "ore": ores,
+        "strategy": names,
+        "mining_profit": np.array([strategy_copper(d, "mining_profit") for d in data], dtype=np.int64),
+        "disenchant_profit": np.array([strategy_copper(d, "disenchant_profit") for d in data], dtype=np.int64),
+        "total_profit": np.array([strategy_copper(d, "profit") for d in data], dtype=np.int64),
+        "type": [d.get("type", "unknown") for d in data],
+    }
+    return _append_record("strategy", timestamp, columns, store_dir, batch)
+
+
+def _read_index(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return np.frombuffer(raw[:len(raw) - len(raw) % INDEX_ENTRY.size], dtype=INDEX_DTYPE)
+
+
+def _iter_records(dataset, start=None, end=None, after=None, store_dir=None):
+    """按写入顺序遍历记录，产出 (记录键, 时间微秒, 列字典)
+
+    按日期分区和索引中的时间裁剪，只解压需要的记录；after 为已处理到的记录键（如导出进度）。
+    """
+    dataset_dir = os.path.join(store_dir or STORE_DIR, dataset)
+    if not os.path.isdir(dataset_dir):
+        return
+
+    start_day = start.strftime("%Y-%m-%d") if start is not None else None
+    end_day = end.strftime("%Y-%m-%d") if end is not None else None
+    after_day, after_n = (after[:10], int(after[11:])) if after else (None, -1)
+    start_us = _micros(start) if start is not None else None
+    end_us = _micros(end) if end is not None else None
+
+    days = sorted(name[:-4] for name in os.listdir(dataset_dir) if name.endswith(".idx"))
+    for day in days:
+        if (start_day and day < start_day) or (end_day and day > end_day) or (after_day and day < after_day):
+            continue
+        data_path, index_path = _paths(store_dir, dataset, day)
+        index = _read_index(index_path)
+        first = after_n + 1 if day == after_day else 0
+        if first >= len(index):
+            continue
+        with open(data_path, 'rb') as f:
+            f.seek(int(index["offset"][first]))
+            data = f.read()
+        base = int(index["offset"][first])
+
+        for n in range(first, len(index)):
+            us, offset, length = (int(v) for v in index[n])
+            if offset - base + length > len(data):
+                break  # 数据尚未完整写入
+            if (start_us is not None and us < start_us) or (end_us is not None and us > end_us):
+                continue
+            yield f"{day}/{n:08d}", us, _decode_columns(data[offset - base:offset - base + length])
+
+
+def _to_datetime(us):
+    return EPOCH + timedelta(microseconds=us)
+
+
+def iter_chunks(dataset, start=None, end=None, store_dir=None):
+    """按时间顺序遍历记录；产出 (时间, 列字典)"""
+    for _, us, columns in _iter_records(dataset, start, end, store_dir=store_dir):
+        yield _to_datetime(us), columns
+
+
+def _concat_records(dataset, start, end, store_dir, fields):
+    """把时间范围内的记录按列拼接：返回 (每行时间 datetime64[us], {列: 拼接后的数组或列表})"""
+    times, lengths = [], []
+    merged = {field: [] for field in fields}
+    for _, us, columns in _iter_records(dataset, start, end, store_dir=store_dir):
+        times.append(us)
+        lengths.append(len(columns[fields[0]]))
+        for field in fields:
+            merged[field].append(columns[field])
+
+    row_times = np.repeat(np.array(times, dtype="datetime64[us]"), lengths)
+    for field in fields:
+        parts = merged[field]
+        if parts and isinstance(parts[0], list):
+            merged[field] = [value for part in parts for value in part]
+        else:
+            merged[field] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    return row_times, merged
+
+
+def load_market_history(start=None, end=None, items=None, store_dir=None):
+    """读取市场历史为 DataFrame（列同 full_history.csv）"""
+    import pandas as pd
+
+    row_times, columns = _concat_records("market", start, end, store_dir, ["item", "price", "available"])
+    if not len(row_times):
+        return pd.DataFrame(columns=MARKET_HEADER)
+    df = pd.DataFrame({
+        "timestamp": row_times,
+        "item": columns["item"],
+        "price_g": columns["price"] / 10000.0,
+        "available": columns["available"],
+    })
+    if items is not None:
+        df = df[df["item"].isin(items)].reset_index(drop=True)
+    return df
+
+
+# 策略记录中的金额列：整数铜币列 -> 兼容的金币列名
+COPPER_COLUMNS = {
+    "mining_profit": "mining_profit_g",
+    "disenchant_profit": "disenchant_profit_g",
+    "total_profit": "total_profit_g",
+}
+
+
+def load_strategy_history(start=None, end=None, store_dir=None):
+    """读取策略历史为 DataFrame（列同 strategy_history.csv）"""
+    import pandas as pd
+
+    fields = ["ore", "strategy", *COPPER_COLUMNS, "type"]
+    row_times, columns = _concat_records("strategy", start, end, store_dir, fields)
+    if not len(row_times):
+        return pd.DataFrame(columns=STRATEGY_HEADER)
+    df = pd.DataFrame({"timestamp": row_times, "ore": columns["ore"], "strategy": columns["strategy"]})
+    for copper_key, gold_key in COPPER_COLUMNS.items():
+        df[gold_key] = columns[copper_key] / 10000.0
+    df["type"] = columns["type"]
+    return df
+
+
+def _append_csv(path, header, rows):
+    file_exists = os.path.isfile(path)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if not file_exists:
+            writer.writerow(header)
+        writer.writerows(rows)
+
+
+def export_csv(output_dir=None, store_dir=None):
+    """兼容导出：将尚未导出的分块追加到原有 CSV 结构
+    （full_history.csv、items/<物品>.csv、strategy_history.csv）"""
+    output_dir = output_dir or HISTORY_DIR
+    store_dir = store_dir or STORE_DIR
+    state_path = os.path.join(store_dir, "export_state.json")
+    state = {}
+    if os.path.isfile(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+    # 导出进度按导出目录分别记录
+    progress = state.get(os.path.abspath(output_dir), {})
+
+    os.makedirs(os.path.join(output_dir, "items"), exist_ok=True)
+    exported = {"market": 0, "strategy": 0}
+
+    for dataset in ("market", "strategy"):
+        full_rows, item_rows, strategy_rows = [], {}, []
+
+        for key, us, columns in _iter_records(dataset, after=progress.get(dataset), store_dir=store_dir):
+            ts = _to_datetime(us).strftime("%Y-%m-%d %H:%M:%S")
+            if dataset == "market":
+                for name, price, available in zip(columns["item"], columns["price"], columns["available"]):
+                    price_g = format_gold(price)
+                    full_rows.append([ts, name, price_g, int(available)])
+                    item_rows.setdefault(name, []).append([ts, price_g, int(available)])
+            else:
+                for row in zip(columns["ore"], columns["strategy"], columns["mining_profit"],
+                               columns["disenchant_profit"], columns["total_profit"], columns["type"]):
+                    ore, strategy, mining, disenchant, total, strategy_type = row
+                    strategy_rows.append([ts, ore, strategy, format_gold(mining), format_gold(disenchant),
+                                          format_gold(total), strategy_type])
+            progress[dataset] = key
+            exported[dataset] += 1
+
+        if full_rows:
+            _append_csv(os.path.join(output_dir, "full_history.csv"), MARKET_HEADER, full_rows)
+            for name, rows in item_rows.items():
+                _append_csv(os.path.join(output_dir, "items", f"{name}.csv"), ITEM_HEADER, rows)
+        if strategy_rows:
+            _append_csv(os.path.join(output_dir, "strategy_history.csv"), STRATEGY_HEADER, strategy_rows)
+
+    state[os.path.abspath(output_dir)] = progress
+    os.makedirs(store_dir, exist_ok=True)
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+    print(f"已导出 {exported['market']} 个市场快照、{exported['strategy']} 次策略评估到 {output_dir}")
+    return exported
@@ -0,0 +1,220 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import config
+from metrics import get_metrics, count
+
+# 后台历史写入：各记录函数只把写入操作加入当前批次，一次处理（tick）结束时整批放入有界队列，
+# 由写入线程按顺序执行（组提交），处理与评估不再等待磁盘。
+# 队列满时提交方阻塞等待（反压），不丢弃数据；进程退出前写完队列中剩余的批次。
+
+
+class GroupCommit:
+    """写入线程中执行一个批次：同一文件在批次内只打开一次，批次结束时按同步策略 flush/fsync 后关闭"""
+
+    def __init__(self, sync, max_open=64):
+        self.sync = sync
+        self.max_open = max_open
+        self._files = OrderedDict()
+        self._staged = OrderedDict()
+        self.callbacks = []
+
+    def after(self, callback):
+        """登记在批次文件全部写完并关闭后执行的操作（如依赖已写入内容的聚合更新）"""
+        self.callbacks.append(callback)
+
+    def stage(self, key, write, item):
+        """暂存需要在批次内合并写入的数据：同一 key 的数据在批次的所有操作执行后一次交给 write(批次, [数据...])"""
+        staged = self._staged.get(key)
+        if staged is None:
+            staged = self._staged[key] = (write, [])
+        staged[1].append(item)
+
+    def staged(self):
+        """取出暂存的合并写入 [(write, [数据...])]"""
+        staged, self._staged = list(self._staged.values()), OrderedDict()
+        return staged
+
+    def append(self, path, header, rows):
+        """追加 CSV 行（新文件先写表头），返回本次写入（含表头）的 (起始, 结束) 字节偏移"""
+        f = self._files.get(path)
+        if f is None:
+            if len(self._files) >= self.max_open:
+                self._finish(*self._files.popitem(last=False))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_exists = os.path.isfile(path)
+            f = self._files[path] = open(path, 'a', newline='', encoding='utf-8')
+            start = f.tell()
+            if not file_exists and header:
+                csv.writer(f).writerow(header)
+        else:
+            start = f.tell()
+        csv.writer(f).writerows(rows)
+        return start, f.tell()
+
+    def open(self, path):
+        """以追加方式打开二进制文件（列式/增量存储），与 CSV 文件一样在批次结束时按同步策略 flush/fsync 后关闭"""
+        f = self._files.get(path)
+        if f is None:
+            if len(self._files) >= self.max_open:
+                self._finish(*self._files.popitem(last=False))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = self._files[path] = open(path, 'ab')
+        return f
+
+    def _finish(self, path, f):
+        try:
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def close(self):
+        """关闭批次内打开的所有文件（某个文件出错时仍关闭其余文件，之后抛出第一个错误）"""
+        error = None
+        while self._files:
+            try:
+                self._finish(*self._files.popitem(last=False))
+            except OSError as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+
+class HistoryWriter:
+    """历史写入器
+
+    submit(操作) 把一个写入操作（接收 GroupCommit 的函数）加入当前批次；
+    在 tick() 内提交的操作于 tick 结束时作为一个批次提交，tick 外提交的操作立即单独提交。
+    async_writes 为 False 时批次在调用线程内同步执行（与旧行为相同的写入时机）。
+    fsync 策略："always" 每个批次 fsync，"interval" 距上次 fsync 超过 fsync_interval 秒的批次才 fsync，
+    "never" 只 flush 交给操作系统。
+    """
+
+    def __init__(self, async_writes=None, queue_size=None, fsync=None, fsync_interval=None):
+        self.async_writes = config.HISTORY_ASYNC_WRITES if async_writes is None else async_writes
+        self.fsync = config.HISTORY_FSYNC if fsync is None else fsync
+        self.fsync_interval = config.HISTORY_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        if self.fsync not in ("always", "interval", "never"):
+            raise ValueError(f"未知的 fsync 策略: {self.fsync}")
+        self._queue = queue.Queue(maxsize=config.HISTORY_WRITER_QUEUE_SIZE if queue_size is None else queue_size)
+        self._pending = []
+        self._depth = 0
+        self._last_sync = time.monotonic()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    @contextmanager
+    def tick(self):
+        """一次处理中的所有写入合并为一个批次（可嵌套，最外层结束时提交）"""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.commit()
+
+    def submit(self, operation):
+        self._pending.append(operation)
+        if self._depth == 0:
+            self.commit()
+
+    def commit(self):
+        """提交当前批次；异步模式下队列已满时阻塞等待写入线程（反压）"""
+        if not self._pending:
+            return
+        group, self._pending = self._pending, []
+        if not self.async_writes:
+            self._run(group)
+            return
+
+        self._start()
+        try:
+            self._queue.put_nowait(group)
+        except queue.Full:
+            start = time.perf_counter()
+            self._queue.put(group)
+            count("history_writer_backpressure")
+            get_metrics().observe("history_backpressure", (time.perf_counter() - start) * 1000.0)
+        count("history_writer_queued")
+
+    def flush(self):
+        """提交当前批次并等待队列中的所有批次写完"""
+        self.commit()
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """写完剩余批次并停止写入线程"""
+        self.flush()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def pending(self):
+        """队列中等待写入的批次数"""
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            group = self._queue.get()
+            try:
+                if group is None:
+                    return
+                self._run(group)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, group):
+        now = time.monotonic()
+        sync = self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval)
+        batch = GroupCommit(sync)
+        with get_metrics().timer("history_commit"):
+            # 单个操作失败不影响同一批次的其他写入
+            for operation in group:
+                self._guarded(operation, batch)
+            for write, items in batch.staged():
+                self._guarded(write, batch, items)
+            self._guarded(batch.close)
+            for callback in batch.callbacks:
+                self._guarded(callback)
+        if sync:
+            self._last_sync = now
+        count("history_writer_groups")
+        count("history_writer_operations", len(group))
+
+    def _guarded(self, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            self.errors += 1
+            count("history_writer_errors")
+            print(f"写入历史数据出错: {str(e)}")
+
+
+_default_writer = None
+
+
+def get_history_writer():
+    """获取共享的历史写入器（进程退出时写完队列中的剩余批次）"""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = HistoryWriter()
+        atexit.register(_default_writer.close)
+    return _default_writer
@@ -0,0 +1,137 @@
+from config import MINING_TIME_PER_ORE
+from recipe_graph import get_recipe_graph
+from strategy import StrategyEvaluator, strategy_entry, best_strategy, build_results
+
+_MISSING = object()
+
+
+class IncrementalEvaluator:
+    """增量策略评估器
+
+    策略收益被拆分为可独立缓存的组成部分：
+    - ("mining", 矿石)：纯炸矿收益，依赖矿石与其炸矿产出
+    - ("crafting" / "hybrid", 矿石, 配方)：制作分解净收益，依赖配方材料与分解产物
+    - ("purchase", 配方)：纯采购制作收益，依赖配方材料与分解产物
+    各部分缓存未取整的铜币期望值，组合出策略后再取整，与逐配方计算的结果一致。
+    每次更新只重算价格或存在状态发生变化的物品所影响的部分，再组合出各矿石的策略。
+    （可购买数量不参与收益计算，因此不会触发重算。）
+    """
+
+    def __init__(self, graph=None):
+        self.graph = graph if graph is not None else get_recipe_graph()
+        self.mining_cycles_per_hour = int(3600 / MINING_TIME_PER_ORE)
+        self.strategy_evaluator = StrategyEvaluator({}, self.graph)
+        self._values = {}
+        self._prices = {}
+        self.last_stats = {}
+
+        # 炸矿产出与配方无关、与价格无关，只需计算一次
+        self._mining_results = {}
+        for ore_name, outputs in self.graph.ore_outputs.items():
+            self._mining_results[ore_name] = {item: float(prob) * float(self.mining_cycles_per_hour)
+                                              for item, prob in outputs}
+
+        # 依赖关系：物品 -> 受其影响的组成部分（相关配方来自配方图索引）
+        self._dependents = {}
+        for ore_name, mining_results in self._mining_results.items():
+            self._depend(("mining",), ore_name, [ore_name] + list(mining_results))
+            for recipe_name in self.graph.relevant_recipes(ore_name):
+                for kind in ("crafting", "hybrid"):
+                    self._depend((kind, ore_name), recipe_name, self.graph.recipe_items(recipe_name))
+        for recipe_name in self.graph.recipe_names:
+            self._depend(("purchase",), recipe_name, self.graph.recipe_items(recipe_name))
+
+    def _depend(self, prefix, name, items):
+        key = prefix + (name,)
+        self._values[key] = None
+        for item in items:
+            self._dependents.setdefault(item, set()).add(key)
+
+    def _changed_items(self, market_data):
+        """价格或存在状态变化的物品"""
+        changed = set()
+        for item in self._dependents:
+            current = market_data.get(item)
+            price = current.price if current is not None else _MISSING
+            if self._prices.get(item, None) != price:
+                changed.add(item)
+                self._prices[item] = price
+        return changed
+
+    def _compute(self, key):
+        evaluator = self.strategy_evaluator
+        kind = key[0]
+        if kind == "mining":
+            ore_name = key[1]
+            ore_item = evaluator.market_data.get(ore_name)
+            ore_price = ore_item.price if ore_item is not None else 0
+            mining_profit = 0.0
+            for item, quantity in self._mining_results[ore_name].items():
+                if item in evaluator.market_data:
+                    mining_profit += evaluator.calculate_after_tax(evaluator.market_data[item].price) * quantity
+            total_ore_cost = ore_price * self.mining_cycles_per_hour
+            net_mining_profit = mining_profit - total_ore_cost
+            mining_profit_pct = (net_mining_profit / total_ore_cost) * 100.0 if total_ore_cost > 0 else 0.0
+            return net_mining_profit, mining_profit_pct
+        if kind == "crafting":
+            _, ore_name, recipe_name = key
+            quantities = self._mining_results[ore_name]
+        elif kind == "hybrid":
+            _, ore_name, recipe_name = key
+            quantities = evaluator.hybrid_quantities(recipe_name, self._mining_results[ore_name])
+        else:
+            recipe_name = key[1]
+            quantities = evaluator.purchase_quantities(recipe_name)
+        return evaluator.crafting_profit_copper(recipe_name, quantities, evaluator.max_crafts_per_hour)
+
+    def evaluate_snapshot(self, market_data):
+        """评估新快照，返回 {矿石: 结果}，格式同 ProfitCalculator.evaluate_strategies"""
+        self.strategy_evaluator.market_data = market_data
+
+        changed = self._changed_items(market_data)
+        stale = set()
+        for item in changed:
+            stale.update(self._dependents[item])
+        stale.update(key for key, value in self._values.items() if value is None)
+        for key in stale:
+            self._values[key] = self._compute(key)
+
+        self.last_stats = {
+            "changed_items": len(changed),
+            "recomputed": len(stale),
+            "components": len(self._values)
+        }
+
+        return {ore_name: self._assemble(ore_name, market_data) for ore_name in self.graph.ores}
+
+    def _assemble(self, ore_name, market_data):
+        """由缓存的组成部分组合出某矿石的所有策略"""
+        ore_present = ore_name in market_data
+        if ore_present:
+            mining_profit, mining_profit_pct = self._values[("mining", ore_name)]
+        else:
+            # 缺少矿石价格时无炸矿产出，只剩纯采购策略
+            mining_profit, mining_profit_pct = 0.0, 0.0
+
+        strategies = {"纯炸矿": strategy_entry(mining_profit, "mining")}
+        if ore_present:
+            for recipe_name in self.graph.relevant_recipes(ore_name):
+                strategies[f"炸矿+制作{recipe_name}"] = strategy_entry(
+                    mining_profit + self._values[("crafting", ore_name, recipe_name)], "crafting")
+                strategies[f"混合+制作{recipe_name}"] = strategy_entry(
+                    mining_profit + self._values[("hybrid", ore_name, recipe_name)], "hybrid")
+        for recipe_name in self.graph.recipe_names:
+            strategies[f"采购+制作{recipe_name}"] = strategy_entry(self._values[("purchase", recipe_name)], "purchase")
+
+        return build_results(strategies, best_strategy(strategies), mining_profit_pct)
+
+
+_default_evaluator = None
+
+
+def get_incremental_evaluator():
+    """获取跨快照共享的增量评估器"""
+    global _default_evaluator
+    if _default_evaluator is None:
+        _default_evaluator = IncrementalEvaluator()
+    return _default_evaluator
@@ -1,13 +1,198 @@
+import argparse
 import time
 from datetime import datetime
-from market_parser import parse_market_data
-from calculator import ProfitCalculator
+from market_parser import parse_market_data, parse_market_bytes, referenced_items
+from calculator import ProfitCalculator, get_evaluation_engine
 from report_generator import generate_report_entry, save_report_entry
 from history_recorder import record_market_data, record_all_strategies
+from history_writer import get_history_writer
+from metrics import get_metrics, format_tick, profile_session
+from money import format_gold
+from rolling import get_snapshot_buffer
 import config
 
 
+def evaluate_snapshots(snapshots):
+    """并行评估多个快照 {键: 市场数据}，返回 {键: {矿石: 结果}}"""
+    from parallel import get_parallel_evaluator
+    return get_parallel_evaluator().evaluate(snapshots)
+
+
+def process_snapshot(market_data, current_timestamp=None, results_by_ore=None):
+    """记录并评估一个市场快照（results_by_ore 为已并行评估好的结果）"""
+    metrics = get_metrics()
+    # 本次处理的所有历史写入在结束时作为一个批次交给后台写入线程
+    with metrics.timer("process_snapshot"), get_history_writer().tick():
+        _process_snapshot(market_data, current_timestamp, results_by_ore)
+
+    # 本次处理（含之前的解析）各阶段耗时
+    print(f"各阶段耗时: {format_tick(metrics.end_tick())}")
+    if metrics.enabled and config.METRICS_FILE:
+        metrics.write(config.METRICS_FILE)
+
+
+def _process_snapshot(market_data, current_timestamp, results_by_ore):
+    # 获取当前时间戳（用于记录市场数据和策略）
+    if current_timestamp is None:
+        current_timestamp = datetime.now()
+
+    # 记录市场数据到历史文件
+    record_market_data(market_data, current_timestamp)
+
+    # 与内存中最近一段时间的价格比较，提示异常波动
+    buffer = get_snapshot_buffer()
+    report_price_anomalies(buffer, market_data)
+
+    # 多进程模式下各矿石分到不同进程计算
+    if results_by_ore is None and config.EVALUATION_WORKERS != 1:
+        results_by_ore = evaluate_snapshots({None: market_data})[None]
+
+    # 创建计算器
+    calculator = ProfitCalculator(market_data, engine=get_evaluation_engine())
+
+    # 对于每种矿石
+    evaluated = {}
+    for ore_name in config.MINING_RECIPES:
+        print(f"\n计算矿石: {ore_name}...")
+
+        try:
+            # 计算收益
+            if results_by_ore is not None:
+                results = results_by_ore[ore_name]
+            else:
+                results = calculator.evaluate_strategies(ore_name)
+            evaluated[ore_name] = results
+
+            # 生成报告条目
+            timestamp_str = current_timestamp.strftime("%Y-%m-%d %H:%M")
+            entry = generate_report_entry(timestamp_str, ore_name, market_data, results)
+
+            # 保存报告
+            save_report_entry(entry)
+
+            # 记录所有策略收益
+            if "all_strategies" in results:
+                record_all_strategies(current_timestamp, ore_name, results["all_strategies"])
+
+            # 显示结果
+            print("\n" + "=" * 70)
+            print(f"矿石: {ore_name}")
+            print(f"矿石单价: {entry['buy_price_g']:.4f}G")
+            print(f"投入金额: {entry['investment_g']:.4f}G")
+            print(f"炸矿收益: {entry['mining_profit_g']:.4f}G ({entry['mining_profit_pct']:.4f}%)")
+            print(f"炸矿每小时收益: {entry['mining_hourly_g']:.4f}G")
+            print(f"分解收益: {entry['disenchant_profit_g']:.4f}G")
+            print(f"分解每小时收益: {entry['disenchant_hourly_g']:.4f}G")
+            print(f"最优策略: {entry['best_strategy']}")
+            print(f"策略总收益: {entry['strategy_profit_g']:.4f}G")
+
+            # 显示所有策略（可选）
+            if "all_strategies" in results:
+                print("\n所有策略收益:")
+                for strategy, data in results["all_strategies"].items():
+                    print(f"  - {strategy}: {data['profit']:.4f}G")
+
+            print("=" * 70)
+        except Exception as e:
+            print(f"计算矿石 {ore_name} 时出错: {str(e)}")
+            import traceback
+            traceback.print_exc()
+
+    buffer.push(current_timestamp, market_data, evaluated)
+
+    # 定期将历史汇总为小时/天K线并裁剪过期数据（在写入线程中于本批次写完后执行）
+    if config.ROLLUP_INTERVAL:
+        from rollups import schedule_compaction
+        schedule_compaction(get_history_writer())
+
+    # 跨矿石、配方与采购的组合优化（可选）
+    if config.OPTIMIZER_ENABLED:
+        from optimizer import get_optimizer, format_plan
+        try:
+            print("\n" + format_plan(get_optimizer().optimize(market_data)))
+        except Exception as e:
+            print(f"组合优化出错: {str(e)}")
+
+
+def report_price_anomalies(buffer, market_data):
+    """打印偏离滚动窗口均值过多的物品价格"""
+    anomalies = buffer.price_anomalies(market_data)
+    if not anomalies:
+        return
+    print(f"\n价格异常（偏离最近 {buffer.max_age // 60 if buffer.max_age else buffer.capacity} "
+          f"{'分钟' if buffer.max_age else '个快照'}均值超过 {config.ANOMALY_ZSCORE} 个标准差）:")
+    for name, price, mean, z in anomalies:
+        print(f"  - {name}: {format_gold(price)}G（均值 {format_gold(round(mean))}G，{z:+.1f}σ）")
+
+
+def watch(path, poll_interval=config.WATCH_POLL_INTERVAL, process_existing=False):
+    """监视模式：ATR 导出文件一落盘立即解析并评估"""
+    from collections import Counter
+    from watcher import ExportWatcher
+
+    print(f"监视模式: {path}（轮询间隔 {poll_interval * 1000:.0f}ms，Ctrl+C 退出）")
+    whitelist = referenced_items() if config.PARSER_RECIPE_ITEMS_ONLY else None
+
+    # 历史、策略聚合与滚动窗口都不区分来源，一个历史目录只接收一个导出来源（文件），
+    # 其他服务器/阵营的导出混入会使同一时间点出现多套价格
+    sources = {"history": None, "ignored": set()}
+
+    def on_exports(updates):
+        received = datetime.now()
+        for file_path, text in updates:
+            if sources["history"] is None:
+                sources["history"] = file_path
+            elif file_path != sources["history"]:
+                if file_path not in sources["ignored"]:
+                    sources["ignored"].add(file_path)
+                    print(f"忽略 {file_path}: 历史目录只记录一个导出来源（{sources['history']}），"
+                          f"多个服务器/阵营的导出不能混在同一份历史中")
+                continue
+
+            stats = Counter()
+            market_data = parse_market_bytes(text, whitelist, stats)
+            if not market_data:
+                print(f"未从 {file_path} 解析到有效数据")
+                continue
+            print(f"\n[{received.strftime('%Y-%m-%d %H:%M:%S')}] 从 {file_path} 解析 {len(market_data)} 条市场数据 "
+                  f"(共 {stats['rows']} 行, 跳过 {stats['skipped']}, 过滤 {stats['filtered']})")
+            process_snapshot(market_data, received)
+            elapsed_ms = (datetime.now() - received).total_seconds() * 1000
+            print(f"快照处理完成 ({file_path})，用时 {elapsed_ms:.1f}ms")
+
+    watcher = ExportWatcher(path, poll_interval, process_existing=process_existing)
+    try:
+        watcher.run(on_exports, batch=True)
+    except KeyboardInterrupt:
+        print("\n程序已终止")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="魔兽世界炸矿与市场分析系统")
+    parser.add_argument("--watch", metavar="PATH", help="监视 ATR 导出文件或目录，新数据到达即处理（不再手动粘贴）")
+    parser.add_argument("--poll-interval", type=float, default=config.WATCH_POLL_INTERVAL,
+                        help=f"监视模式轮询间隔秒数 (默认: {config.WATCH_POLL_INTERVAL})")
+    parser.add_argument("--process-existing", action="store_true", help="监视模式启动时先处理已存在的导出")
+    parser.add_argument("--metrics-port", type=int, default=config.METRICS_HTTP_PORT,
+                        help="在本地端口提供运行指标 JSON (默认: 不启动)")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc"], default=config.PROFILE_MODE,
+                        help="性能剖析模式，退出时将结果写入报告目录")
+    args = parser.parse_args()
+    config.ensure_data_dirs()
+
+    if args.metrics_port:
+        get_metrics().serve(args.metrics_port)
+        print(f"运行指标: http://127.0.0.1:{args.metrics_port}/")
+
+    with profile_session(args.profile, config.REPORTS_DIR):
+        if args.watch:
+            watch(args.watch, args.poll_interval, args.process_existing)
+        else:
+            interactive()
+
+
+def interactive():
+    """交互模式：粘贴市场数据后处理"""
     print("魔兽世界炸矿与市场分析系统")
     print("=" * 70)
     print("功能:")
@@ -45,57 +230,7 @@ def main():
 
             print(f"成功解析 {len(market_data)} 条市场数据")
 
-            # 记录市场数据到历史文件
-            record_market_data(market_data)
-
-            # 创建计算器
-            calculator = ProfitCalculator(market_data)
-
-            # 获取当前时间戳（用于记录策略）
-            current_timestamp = datetime.now()
-
-            # 对于每种矿石
-            for ore_name in config.MINING_RECIPES:
-                print(f"\n计算矿石: {ore_name}...")
-
-                try:
-                    # 计算收益
-                    results = calculator.evaluate_strategies(ore_name)
-
-                    # 生成报告条目
-                    timestamp_str = current_timestamp.strftime("%Y-%m-%d %H:%M")
-                    entry = generate_report_entry(timestamp_str, ore_name, market_data, results)
-
-                    # 保存报告
-                    save_report_entry(entry)
-
-                    # 记录所有策略收益
-                    if "all_strategies" in results:
-                        record_all_strategies(current_timestamp, ore_name, results["all_strategies"])
-
-                    # 显示结果
-                    print("\n" + "=" * 70)
-                    print(f"矿石: {ore_name}")
-                    print(f"矿石单价: {entry['buy_price_g']:.4f}G")
-                    print(f"投入金额: {entry['investment_g']:.4f}G")
-                    print(f"炸矿收益: {entry['mining_profit_g']:.4f}G ({entry['mining_profit_pct']:.4f}%)")
-                    print(f"炸矿每小时收益: {entry['mining_hourly_g']:.4f}G")
-                    print(f"分解收益: {entry['disenchant_profit_g']:.4f}G")
-                    print(f"分解每小时收益: {entry['disenchant_hourly_g']:.4f}G")
-                    print(f"最优策略: {entry['best_strategy']}")
-                    print(f"策略总收益: {entry['strategy_profit_g']:.4f}G")
-
-                    # 显示所有策略（可选）
-                    if "all_strategies" in results:
-                        print("\n所有策略收益:")
-                        for strategy, data in results["all_strategies"].items():
-                            print(f"  - {strategy}: {data['profit']:.4f}G")
-
-                    print("=" * 70)
-                except Exception as e:
-                    print(f"计算矿石 {ore_name} 时出错: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+            process_snapshot(market_data)
 
             print("\n所有矿石计算完成，数据已保存到报告文件。")
             print("下次更新将在1分钟后...")
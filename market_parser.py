@@ -1,16 +1,20 @@
 import csv
+import gc
 from io import StringIO
-from collections import namedtuple
-
-MarketItem = namedtuple('MarketItem', ['name', 'price', 'available'])
+from collections import Counter
+from metrics import timed, count
+# MarketItem 原定义在本模块，保留导入以兼容 from market_parser import MarketItem
+from market_snapshot import MarketItem, MarketSnapshot  # noqa: F401
 
 
+@timed("parse")
 def parse_market_data(text_data):
     """
     解析市场数据文本
     格式："价格","名称","物品等级","我的售品？","可购买"
+    返回 MarketSnapshot（字典式访问，按名称得到 MarketItem）
     """
-    market_data = {}
+    market_data = MarketSnapshot()
     f = StringIO(text_data)
     reader = csv.reader(f)
 
@@ -27,10 +31,12 @@ def parse_market_data(text_data):
     except StopIteration:
         return market_data
 
+    rows = 0
     for row in reader:
         # 跳过空行
         if not row or len(row) < 5:
             continue
+        rows += 1
 
         try:
             # 提取价格列（第一列）
@@ -47,9 +53,84 @@ def parse_market_data(text_data):
             available_str = row[4].strip().replace('"', '')
             available = int(available_str) if available_str.isdigit() else 0
 
-            market_data[name] = MarketItem(name, price, available)
+            market_data.set(name, price, available)
         except (ValueError, IndexError) as e:
             print(f"解析行时出错: {row} - {str(e)}")
             continue
 
-    return market_data
\ No newline at end of file
+    count("rows_parsed", rows)
+    count("bytes_parsed", len(text_data.encode('utf-8')))
+    return market_data
+
+
+def referenced_items():
+    """配方中引用到的所有物品（矿石、炸矿产出、制作材料、分解产物）"""
+    from recipe_graph import get_recipe_graph
+    return get_recipe_graph().referenced_items()
+
+
+@timed("parse")
+def parse_market_bytes(data, whitelist=None, stats=None):
+    """高吞吐解析：直接解析字节形式的 ATR 导出（适用于数万行的全拍卖行导出）
+
+    whitelist 为物品名称集合时只保留其中的物品；跳过的行只计入 stats
+    （Counter: rows/kept/filtered/skipped/duplicates），不打印。同名物品以最后一行为准。
+    """
+    if isinstance(data, bytes):
+        count("bytes_parsed", len(data))
+        data = data.decode('utf-8-sig', errors='replace')
+    else:
+        count("bytes_parsed", len(data.encode('utf-8')))
+    if stats is None:
+        stats = Counter()
+
+    market_data = MarketSnapshot()
+    set_item = market_data.set
+    rows = skipped = filtered = 0
+
+    # 批量创建对象期间暂停循环垃圾回收，避免反复触发全代扫描
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for row in csv.reader(StringIO(data)):
+            if not row:
+                continue
+            rows += 1
+            if len(row) < 5:
+                skipped += 1
+                continue
+
+            name = row[1]
+            if whitelist is not None and name not in whitelist:
+                name = name.strip().strip('"')
+                if name not in whitelist:
+                    filtered += 1
+                    continue
+
+            # 常见情况下字段已是纯数字，只有异常格式才做清理
+            # （isdigit 对 "²" 等字符也为真，需同时要求 ASCII，否则 int() 会抛出异常）
+            price_str = row[0]
+            if not (price_str.isascii() and price_str.isdigit()):
+                price_str = price_str.strip().replace(',', '').replace('"', '')
+                if not (price_str.isascii() and price_str.isdigit()):
+                    skipped += 1  # 标题行或价格无效
+                    continue
+            available_str = row[4]
+            if not (available_str.isascii() and available_str.isdigit()):
+                available_str = available_str.strip().replace('"', '')
+
+            if whitelist is None:
+                name = name.strip().strip('"')
+            available = int(available_str) if available_str.isascii() and available_str.isdigit() else 0
+            set_item(name, int(price_str), available)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    stats['rows'] += rows
+    stats['skipped'] += skipped
+    stats['filtered'] += filtered
+    stats['duplicates'] += rows - skipped - filtered - len(market_data)
+    stats['kept'] += len(market_data)
+    count("rows_parsed", rows)
+    return market_data
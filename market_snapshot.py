@@ -0,0 +1,230 @@
+from array import array
+from collections import namedtuple
+
+MarketItem = namedtuple('MarketItem', ['name', 'price', 'available'])
+
+
+class ItemTable:
+    """物品编号表：物品名称 <-> 稳定的整数编号（只增不减，进程内共享）"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.id(name)
+
+    def id(self, name):
+        """物品编号，新物品自动分配"""
+        item_id = self.ids.get(name)
+        if item_id is None:
+            item_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return item_id
+
+    def ids_for(self, names):
+        """一组物品的编号（不存在的物品会被分配编号）"""
+        return [self.id(name) for name in names]
+
+    def __len__(self):
+        return len(self.names)
+
+
+_default_table = None
+
+
+def get_item_table():
+    """共享物品编号表，配方图中的物品排在最前（编号与配方图一致）"""
+    global _default_table
+    if _default_table is None:
+        from recipe_graph import get_recipe_graph
+        _default_table = ItemTable(get_recipe_graph().items)
+    return _default_table
+
+
+class MarketSnapshot:
+    """市场快照：价格与可购买数量存放在并列的 int64 数组中，按物品编号索引
+
+    保留字典式访问（snapshot[名称] 返回 MarketItem，get / in / len / 遍历 / values / items），
+    同时提供数组视图（ids / prices / available）和按编号批量取价（gather），
+    全拍卖行快照只需几个紧凑数组，而不是数万个 namedtuple 加一个字典。
+    同名物品以最后写入的为准。
+    """
+
+    __slots__ = ("table", "_ids", "_prices", "_available", "_rows")
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else get_item_table()
+        self._ids = array('q')
+        self._prices = array('q')
+        self._available = array('q')
+        # 物品编号 -> 行号（-1 表示不存在），按需增长
+        self._rows = array('q')
+
+    @classmethod
+    def from_items(cls, items, table=None):
+        """由 MarketItem 序列或 {名称: MarketItem} 字典构建"""
+        snapshot = cls(table)
+        if isinstance(items, dict):
+            items = items.values()
+        for item in items:
+            snapshot.set(item.name, item.price, item.available)
+        return snapshot
+
+    @classmethod
+    def from_columns(cls, names, prices, available, table=None):
+        """由名称、价格（铜币）、可购买数量三列构建"""
+        snapshot = cls(table)
+        for name, price, count in zip(names, prices, available):
+            snapshot.set(name, int(price), int(count))
+        return snapshot
+
+    def _row(self, item_id):
+        if item_id < len(self._rows):
+            return self._rows[item_id]
+        return -1
+
+    def set(self, name, price, available):
+        """写入一个物品（已存在时覆盖）"""
+        item_id = self.table.id(name)
+        row = self._row(item_id)
+        if row >= 0:
+            self._prices[row] = price
+            self._available[row] = available
+            return
+        if item_id >= len(self._rows):
+            self._rows.extend([-1] * (item_id + 1 - len(self._rows)))
+        self._rows[item_id] = len(self._ids)
+        self._ids.append(item_id)
+        self._prices.append(price)
+        self._available.append(available)
+
+    def price(self, name, default=None):
+        """物品价格（铜币），不经过 MarketItem"""
+        item_id = self.table.ids.get(name)
+        row = self._row(item_id) if item_id is not None else -1
+        return self._prices[row] if row >= 0 else default
+
+    # ---- 字典式访问 ----
+
+    def __getitem__(self, name):
+        item_id = self.table.ids.get(name)
+        row = self._row(item_id) if item_id is not None else -1
+        if row < 0:
+            raise KeyError(name)
+        return MarketItem(name, self._prices[row], self._available[row])
+
+    def __setitem__(self, name, item):
+        self.set(name, item.price, item.available)
+
+    def __contains__(self, name):
+        item_id = self.table.ids.get(name)
+        return item_id is not None and self._row(item_id) >= 0
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def pop(self, name, *default):
+        """删除物品（重建数组，非热路径）"""
+        if name not in self:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        item = self[name]
+        remaining = [other for other in self.values() if other.name != name]
+        self._ids, self._prices, self._available, self._rows = array('q'), array('q'), array('q'), array('q')
+        for other in remaining:
+            self.set(other.name, other.price, other.available)
+        return item
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        names = self.table.names
+        return (names[item_id] for item_id in self._ids)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        names = self.table.names
+        return [MarketItem(names[item_id], price, available)
+                for item_id, price, available in zip(self._ids, self._prices, self._available)]
+
+    def items(self):
+        return [(item.name, item) for item in self.values()]
+
+    def copy(self):
+        snapshot = MarketSnapshot(self.table)
+        snapshot._ids = array('q', self._ids)
+        snapshot._prices = array('q', self._prices)
+        snapshot._available = array('q', self._available)
+        snapshot._rows = array('q', self._rows)
+        return snapshot
+
+    def __eq__(self, other):
+        if isinstance(other, (MarketSnapshot, dict)):
+            return len(self) == len(other) and all(other.get(item.name) == item for item in self.values())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"MarketSnapshot({len(self)} 条物品)"
+
+    # ---- 数组视图 ----
+
+    @property
+    def ids(self):
+        """物品编号 (int64 数组视图，按写入顺序)"""
+        import numpy as np
+        return np.frombuffer(self._ids, dtype=np.int64)
+
+    @property
+    def prices(self):
+        """价格（铜币，int64 数组视图，与 ids 对应）"""
+        import numpy as np
+        return np.frombuffer(self._prices, dtype=np.int64)
+
+    @property
+    def available(self):
+        """可购买数量（int64 数组视图，与 ids 对应）"""
+        import numpy as np
+        return np.frombuffer(self._available, dtype=np.int64)
+
+    def names(self):
+        return list(self)
+
+    def gather(self, item_ids):
+        """按物品编号批量取价，返回 (价格 int64 数组, 存在掩码)"""
+        import numpy as np
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        rows = np.full(len(item_ids), -1, dtype=np.int64)
+        if len(self._rows):
+            in_range = item_ids < len(self._rows)
+            rows[in_range] = np.frombuffer(self._rows, dtype=np.int64)[item_ids[in_range]]
+        present = rows >= 0
+        prices = np.zeros(len(item_ids), dtype=np.int64)
+        prices[present] = self.prices[rows[present]]
+        return prices, present
+
+    @property
+    def nbytes(self):
+        """数组占用的字节数"""
+        return sum(column.itemsize * len(column)
+                   for column in (self._ids, self._prices, self._available, self._rows))
+
+    # 序列化时按名称保存，反序列化时映射到当前进程的物品编号表（用于进程池）
+    def __getstate__(self):
+        return self.names(), self._prices.tobytes(), self._available.tobytes()
+
+    def __setstate__(self, state):
+        names, prices, available = state
+        self.table = get_item_table()
+        self._ids, self._prices, self._available, self._rows = array('q'), array('q'), array('q'), array('q')
+        price_column, available_column = array('q'), array('q')
+        price_column.frombytes(prices)
+        available_column.frombytes(available)
+        for name, price, count in zip(names, price_column, available_column):
+            self.set(name, price, count)
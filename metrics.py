@@ -0,0 +1,219 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 延迟直方图桶上限（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class StageStats:
+    """单个阶段的累计耗时与延迟直方图"""
+
+    __slots__ = ("count", "total_ms", "min_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float('inf')
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """由直方图估算分位数（取所在桶的上限）"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                return min(LATENCY_BUCKETS_MS[i], self.max_ms) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + ["+Inf"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min_ms, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class Metrics:
+    """运行指标：各阶段延迟直方图、写入字节数、处理行数
+
+    - timer(阶段) / @timed(阶段) 记录耗时，count(名称, 数量) 累加计数
+    - end_tick() 返回上次调用以来各阶段的耗时，用于每次处理后的耗时汇总
+    - write(路径) 写出 JSON 指标文件，serve(端口) 在本地 HTTP 端口提供同样的 JSON
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self._tick = {}
+
+    def observe(self, stage, ms):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.observe(ms)
+            self._tick[stage] = self._tick.get(stage, 0.0) + ms
+
+    @contextmanager
+    def timer(self, stage):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000.0)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def end_tick(self):
+        """返回并清空本次处理中各阶段的耗时 {阶段: 毫秒}"""
+        with self._lock:
+            tick, self._tick = self._tick, {}
+        return tick
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 3),
+                "stages": {stage: stats.to_dict() for stage, stats in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+            self._tick = {}
+
+    def write(self, path):
+        """写出 JSON 指标文件（先写临时文件再改名）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """在后台线程中启动本地 HTTP 端点，GET 返回当前指标 JSON"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def format_tick(tick):
+    """将 end_tick() 的结果格式化为一行耗时汇总"""
+    return ", ".join(f"{stage} {ms:.1f}ms" for stage, ms in tick.items())
+
+
+_default_metrics = None
+
+
+def get_metrics():
+    """获取进程内共享的指标记录器"""
+    global _default_metrics
+    if _default_metrics is None:
+        from config import METRICS_ENABLED
+        _default_metrics = Metrics(METRICS_ENABLED)
+    return _default_metrics
+
+
+def timed(stage):
+    """装饰器：记录函数耗时到指定阶段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    get_metrics().count(name, value)
+
+
+@contextmanager
+def profile_session(mode, output_dir):
+    """性能剖析："cprofile" 保存 .prof 统计文件，"tracemalloc" 保存内存分配最多的代码行"""
+    if not mode:
+        yield
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(output_dir, f"profile_{stamp}.prof")
+            profiler.dump_stats(path)
+            print(f"cProfile 统计已保存至: {path}（python -m pstats 查看）")
+    elif mode == "tracemalloc":
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = os.path.join(output_dir, f"tracemalloc_{stamp}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"当前 {current / 1024:.1f} KiB, 峰值 {peak / 1024:.1f} KiB\n")
+                for stat in snapshot.statistics('lineno')[:30]:
+                    f.write(f"{stat}\n")
+            print(f"内存分配统计已保存至: {path}")
+    else:
+        raise ValueError(f"未知的剖析模式: {mode}")
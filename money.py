@@ -0,0 +1,52 @@
+# 定点货币：金额以整数铜币表示（1 金 = 100 银 = 10000 铜）
+# 评估器内部按铜币计算，期望收益在组合出策略时取整为铜币（四舍六入五成双），
+# 之后的比较、报告与历史记录都使用整数，金币形式只用于显示（保留4位小数即精确到铜）。
+
+COPPER_PER_GOLD = 10000
+
+
+def to_copper(value):
+    """铜币数值（可含小数的期望值）取整为整数铜币"""
+    return int(round(value))
+
+
+def gold_to_copper(gold):
+    """金币转铜币；字符串按十进制精确解析"""
+    if isinstance(gold, str):
+        return parse_gold(gold)
+    return int(round(gold * COPPER_PER_GOLD))
+
+
+def copper_to_gold(copper):
+    """铜币转金币（浮点，仅用于显示与兼容旧接口）"""
+    return copper / COPPER_PER_GOLD
+
+
+def format_gold(copper):
+    """整数铜币格式化为金币字符串，4位小数，不经过浮点"""
+    copper = int(copper)
+    sign = "-" if copper < 0 else ""
+    gold, rest = divmod(abs(copper), COPPER_PER_GOLD)
+    return f"{sign}{gold}.{rest:04d}"
+
+
+def parse_gold(text):
+    """解析金币字符串（如 "-12.3456"）为整数铜币，超过4位的小数四舍五入"""
+    text = text.strip()
+    negative = text.startswith("-")
+    text = text.lstrip("+-")
+    whole, _, fraction = text.partition(".")
+    fraction = (fraction + "00000")[:5]
+    copper = int(whole or 0) * COPPER_PER_GOLD + int(fraction[:4])
+    if int(fraction[4]) >= 5:
+        copper += 1
+    return -copper if negative else copper
+
+
+def strategy_copper(strategy_data, field):
+    """策略条目中的铜币金额：profit / mining_profit / disenchant_profit（旧格式条目只有金币字段）"""
+    copper = strategy_data.get(f"{field}_copper")
+    if copper is None:
+        gold = strategy_data.get("profit" if field == "profit" else f"{field}_g", 0)
+        copper = gold_to_copper(gold)
+    return copper
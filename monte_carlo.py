@@ -0,0 +1,178 @@
+import numpy as np
+from config import TAX_RATE, CRIT_RATE
+from vector_engine import get_vectorized_evaluator
+
+
+class MonteCarloSimulator:
+    """炸矿与制作的随机模拟
+
+    每个模拟小时按多项分布抽取炸矿产出（每次炸矿至多产出一种宝石），
+    按二项分布抽取制作暴击次数，多个小时一次性批量抽样。
+    制作次数取整数（材料不足一次即不能制作），其余计价规则与期望值模型一致。
+    """
+
+    def __init__(self, evaluator=None, seed=None):
+        self.evaluator = evaluator if evaluator is not None else get_vectorized_evaluator()
+        self.rng = np.random.default_rng(seed)
+        self._compile()
+
+    def _compile(self):
+        evaluator = self.evaluator
+        graph = evaluator.graph
+
+        # 每个配方的材料下标与需求量（按最多材料数补齐，补齐位需求为0）
+        width = max((len(r.materials) for r in graph.recipes.values()), default=1) or 1
+        n_recipe = len(evaluator.recipes)
+        self.material_index = np.zeros((n_recipe, width), dtype=np.intp)
+        self.material_needed = np.zeros((n_recipe, width))
+        for recipe in graph.recipes.values():
+            for k, (material, needed) in enumerate(recipe.materials):
+                self.material_index[recipe.id, k] = graph.item_ids[material]
+                self.material_needed[recipe.id, k] = needed
+
+        # 每种矿石的产出物品下标与概率
+        self.ore_outputs = []
+        for ore_name in evaluator.ores:
+            outputs = graph.ore_outputs[ore_name]
+            index = np.array([graph.item_ids[item] for item, _ in outputs], dtype=np.intp)
+            probs = np.array([float(prob) for _, prob in outputs])
+            self.ore_outputs.append((index, probs))
+
+    def _sample_yields(self, o, hours):
+        """抽样 hours 个小时的炸矿产出数量 (小时 × 物品)"""
+        index, probs = self.ore_outputs[o]
+        cycles = self.evaluator.mining_cycles_per_hour
+        counts = np.zeros((hours, len(self.evaluator.items)))
+        if len(index) == 0:
+            return counts
+        if probs.sum() <= 1.0:
+            # 剩余概率为“无产出”
+            draws = self.rng.multinomial(cycles, np.append(probs, 1.0 - probs.sum()), size=hours)
+            sampled = draws[:, :-1]
+        else:
+            # 概率和超过1时产出相互独立
+            sampled = self.rng.binomial(cycles, probs, size=(hours, len(probs)))
+        counts[:, index] = sampled
+        return counts
+
+    def _craft_profit(self, crafts, de_value, craft_cost):
+        """制作分解净收益（铜币），暴击按二项分布抽样"""
+        crafts = np.minimum(crafts, self.evaluator.max_crafts_per_hour)
+        crits = self.rng.binomial(crafts.astype(np.int64), CRIT_RATE)
+        return (crafts + crits) * de_value - crafts * craft_cost
+
+    def _simulate_chunk(self, o, hours, prices, ore_present, de_value, craft_cost, relevant):
+        evaluator = self.evaluator
+        taxed = 1.0 - TAX_RATE
+        ore_price = prices[evaluator.ore_item_index[o]]
+
+        counts = self._sample_yields(o, hours) if ore_present else np.zeros((hours, len(prices)))
+        if ore_present:
+            mining = taxed * (counts @ prices) - ore_price * evaluator.mining_cycles_per_hour
+        else:
+            mining = np.zeros(hours)
+
+        # 各配方可用材料：炸矿产出（混合策略中未产出的材料视为可无限采购）
+        needed = self.material_needed
+        available = counts[:, self.material_index]
+        mined_material = np.isin(self.material_index, self.ore_outputs[o][0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.floor(available / np.where(needed > 0, needed, 1.0))
+        ratio = np.where(needed > 0, ratio, np.inf)
+        crafting_crafts = np.where(mined_material, ratio, np.where(needed > 0, 0.0, np.inf)).min(axis=2)
+        hybrid_crafts = np.where(mined_material, ratio, np.inf).min(axis=2)
+
+        columns = [mining]
+        for r in range(len(evaluator.recipes)):
+            if relevant[r] and ore_present:
+                crafting = self._craft_profit(crafting_crafts[:, r], de_value[r], craft_cost[r])
+                hybrid = self._craft_profit(hybrid_crafts[:, r], de_value[r], craft_cost[r])
+                columns.extend([mining + crafting, mining + hybrid])
+            else:
+                columns.extend([np.full(hours, np.nan), np.full(hours, np.nan)])
+        purchase_crafts = np.full(hours, float(evaluator.max_crafts_per_hour))
+        for r in range(len(evaluator.recipes)):
+            columns.append(self._craft_profit(purchase_crafts, de_value[r], craft_cost[r]))
+
+        return np.stack(columns, axis=1) / 10000.0
+
+    def simulate(self, market_data, hours=100000, chunk_hours=20000):
+        """模拟 hours 个小时，返回 {矿石: [策略统计, ...]}
+
+        每条统计包含：strategy, type, expected_g（期望值模型）, mean_g, std_g,
+        p5_g, p50_g, p95_g, loss_probability
+        """
+        evaluator = self.evaluator
+        prices, present = evaluator.price_vector(market_data)
+        expected = evaluator.strategy_table(evaluator.evaluate(prices, present))
+        names = evaluator.strategy_names()
+
+        taxed = 1.0 - TAX_RATE
+        de_value = taxed * (evaluator.disenchant_matrix @ prices)
+        craft_cost = taxed * (evaluator.material_matrix @ prices) + evaluator.recipe_cost
+
+        results = {}
+        for o, ore_name in enumerate(evaluator.ores):
+            ore_present = bool(present[evaluator.ore_item_index[o]])
+            samples = np.empty((hours, len(names)), dtype=np.float32)
+            total = np.zeros(len(names))
+            total_sq = np.zeros(len(names))
+            for begin in range(0, hours, chunk_hours):
+                size = min(chunk_hours, hours - begin)
+                chunk = self._simulate_chunk(o, size, prices, ore_present, de_value, craft_cost,
+                                             evaluator.relevance[o])
+                samples[begin:begin + size] = chunk
+                total += chunk.sum(axis=0)
+                total_sq += (chunk ** 2).sum(axis=0)
+
+            mean = total / hours
+            std = np.sqrt(np.maximum(total_sq / hours - mean ** 2, 0.0))
+            p5, p50, p95 = np.percentile(samples, [5, 50, 95], axis=0)
+            loss = (samples < 0).mean(axis=0)
+
+            stats = []
+            for s, (strategy_name, strategy_type) in enumerate(names):
+                if np.isnan(expected[o, s]):
+                    continue
+                stats.append({
+                    "strategy": strategy_name,
+                    "type": strategy_type,
+                    "expected_g": float(expected[o, s]),
+                    "mean_g": float(mean[s]),
+                    "std_g": float(std[s]),
+                    "p5_g": float(p5[s]),
+                    "p50_g": float(p50[s]),
+                    "p95_g": float(p95[s]),
+                    "loss_probability": float(loss[s]),
+                })
+            results[ore_name] = stats
+
+        return results
+
+
+def run_simulation(hours=100000, seed=None, output_file=None, history_path=None):
+    """对历史中最新的市场快照做蒙特卡洛模拟，打印并可选保存每个策略的收益分布"""
+    import pandas as pd
+    from backtest import latest_snapshot
+
+    timestamp, market_data = latest_snapshot(history_path)
+    if market_data is None:
+        print("没有可模拟的市场数据")
+        return {}
+
+    results = MonteCarloSimulator(seed=seed).simulate(market_data, hours)
+
+    print(f"\n蒙特卡洛模拟 ({timestamp:%Y-%m-%d %H:%M:%S}, {hours} 小时)")
+    rows = []
+    for ore_name, stats in results.items():
+        print(f"\n{ore_name}:")
+        print(f"  {'策略':<20} {'期望':>12} {'均值':>12} {'标准差':>10} {'P5':>12} {'P95':>12} {'亏损概率':>8}")
+        for s in stats:
+            print(f"  {s['strategy']:<20} {s['expected_g']:>12.2f} {s['mean_g']:>12.2f} {s['std_g']:>10.2f} "
+                  f"{s['p5_g']:>12.2f} {s['p95_g']:>12.2f} {s['loss_probability']:>8.1%}")
+            rows.append({"timestamp": timestamp, "ore": ore_name, **s})
+
+    if output_file:
+        pd.DataFrame(rows).to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n模拟结果已保存至: {output_file}")
+    return results
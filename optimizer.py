@@ -0,0 +1,221 @@
+import time
+import numpy as np
+import config
+from config import TAX_RATE, CRIT_RATE, MINING_TIME_PER_ORE, CRAFTING_TIME
+from recipe_graph import get_recipe_graph
+from metrics import timed, count
+from money import to_copper, copper_to_gold
+
+
+class SimplexError(Exception):
+    pass
+
+
+def simplex(c, A, b, basis=None, tol=1e-9, max_iter=10000):
+    """单纯形法求解 max c·x，s.t. A x ≤ b, x ≥ 0（b ≥ 0，原点可行，无需两阶段）
+
+    basis 为上次的最优基（列编号，含松弛变量 n..n+m-1）时从该基热启动：
+    只有价格（目标系数）变化时原最优基仍可行，通常几次换基即可重新达到最优；
+    可购买数量（右端项）变化导致该基不可行时退回松弛基冷启动。
+    返回 (x, 目标值, 最优基, 换基次数)。
+    """
+    m, n = A.shape
+    full = np.hstack([A, np.eye(m)])
+    cost = np.concatenate([c, np.zeros(m)])
+
+    tableau = None
+    if basis is not None and len(basis) == m:
+        try:
+            tableau = np.linalg.solve(full[:, basis], np.column_stack([full, b]))
+        except np.linalg.LinAlgError:
+            tableau = None
+        if tableau is not None and tableau[:, -1].min() < -tol:
+            tableau = None
+    if tableau is None:
+        basis = list(range(n, n + m))
+        tableau = np.column_stack([full, b]).astype(float)
+    else:
+        basis = list(basis)
+
+    iterations = 0
+    degenerate = 0
+    while True:
+        reduced = cost - cost[basis] @ tableau[:, :-1]
+        reduced[basis] = 0.0
+        candidates = np.flatnonzero(reduced > tol * max(1.0, np.abs(cost).max()))
+        if len(candidates) == 0:
+            break
+        if iterations >= max_iter:
+            raise SimplexError("单纯形法超过最大迭代次数")
+
+        # 通常取最大检验数；连续退化换基时改用 Bland 规则防止循环
+        entering = candidates[0] if degenerate > 50 else candidates[np.argmax(reduced[candidates])]
+        column = tableau[:, entering]
+        rows = np.flatnonzero(column > tol)
+        if len(rows) == 0:
+            raise SimplexError("线性规划无界")
+        ratios = tableau[rows, -1] / column[rows]
+        best = ratios.min()
+        ties = rows[ratios <= best + tol]
+        leaving = min(ties, key=lambda r: basis[r])
+
+        degenerate = degenerate + 1 if best <= tol else 0
+        tableau[leaving] /= tableau[leaving, entering]
+        others = np.arange(m) != leaving
+        tableau[others] -= np.outer(tableau[others, entering], tableau[leaving])
+        basis[leaving] = entering
+        iterations += 1
+
+    x = np.zeros(n + m)
+    x[basis] = tableau[:, -1]
+    x = np.maximum(x[:n], 0.0)
+    return x, float(c @ x), basis, iterations
+
+
+class StrategyOptimizer:
+    """线性规划组合优化：同时决定每小时炸哪些矿石、做哪些配方、从拍卖行买哪些材料
+
+    变量（每小时）：各矿石炸矿次数 m、各配方制作次数 c、各物品采购数量 b。
+    约束：
+    - 炸矿时间 Σ m × MINING_TIME_PER_ORE ≤ 炸矿时间预算
+    - 制作时间 Σ c × CRAFTING_TIME ≤ 制作时间预算（制作与炸矿可同时进行，预算分开）
+    - 采购数量不超过拍卖行可购买数量（MarketItem.available）
+    - 物料守恒：每种物品的消耗（制作材料、炸矿用矿石）不超过 炸矿产出 + 分解产出 + 采购
+    目标：剩余物品按税后价出售的收入 - 采购支出 - 制作成本（铜币）。
+    约束矩阵只与配方有关，初始化时编译一次；每个快照只更新目标系数与采购上限，
+    并从上一快照的最优基热启动。结果为连续解（期望意义下的每小时次数）。
+    """
+
+    def __init__(self, graph=None, mining_seconds=None, crafting_seconds=None):
+        self.graph = graph if graph is not None else get_recipe_graph()
+        self.mining_seconds = config.OPTIMIZER_MINING_SECONDS if mining_seconds is None else mining_seconds
+        self.crafting_seconds = config.OPTIMIZER_CRAFTING_SECONDS if crafting_seconds is None else crafting_seconds
+        self._basis = None
+        self._compile()
+
+    def _compile(self):
+        graph = self.graph
+        self.ores, self.recipes, self.items = graph.ores, graph.recipe_names, graph.items
+        n_ore, n_recipe, n_item = len(self.ores), len(self.recipes), len(self.items)
+        item_ids = graph.item_ids
+
+        # 每个变量对各物品的净产出（正为产出，负为消耗）(物品 × 变量)
+        mining_flow = np.zeros((n_item, n_ore))
+        for o, ore_name in enumerate(self.ores):
+            for item, prob in graph.ore_outputs[ore_name]:
+                mining_flow[item_ids[item], o] += float(prob)
+            mining_flow[item_ids[ore_name], o] -= 1.0
+        crafting_flow = np.zeros((n_item, n_recipe))
+        for recipe in graph.recipes.values():
+            for material, needed in recipe.materials:
+                crafting_flow[item_ids[material], recipe.id] -= needed
+            for material, quantity in recipe.disenchant:
+                crafting_flow[item_ids[material], recipe.id] += (1 + CRIT_RATE) * quantity
+        self.flow = np.hstack([mining_flow, crafting_flow, np.eye(n_item)])
+        self.recipe_cost = np.array([graph.recipes[name].cost for name in self.recipes], dtype=float)
+
+        # 约束矩阵：物料守恒 (-flow ≤ 0)、炸矿时间、制作时间、采购上限
+        n_var = n_ore + n_recipe + n_item
+        time_rows = np.zeros((2, n_var))
+        time_rows[0, :n_ore] = MINING_TIME_PER_ORE
+        time_rows[1, n_ore:n_ore + n_recipe] = CRAFTING_TIME
+        purchase_rows = np.zeros((n_item, n_var))
+        purchase_rows[:, n_ore + n_recipe:] = np.eye(n_item)
+        self.A = np.vstack([-self.flow, time_rows, purchase_rows])
+        self.n_var = n_var
+
+    def _objective(self, prices):
+        """每个变量的收益系数（铜币）：按税后价计算净产出的价值，采购按税前价支付"""
+        sell_value = prices * (1.0 - TAX_RATE)
+        c = sell_value @ self.flow
+        n_ore, n_recipe = len(self.ores), len(self.recipes)
+        c[n_ore:n_ore + n_recipe] -= self.recipe_cost
+        c[n_ore + n_recipe:] -= prices
+        return c
+
+    @timed("optimize")
+    def optimize(self, market_data, warm_start=True):
+        """求解一个快照的最优组合，返回方案字典（金额为铜币与金币）"""
+        # 没有价格的物品既不能采购也没有出售价值
+        prices = np.zeros(len(self.items))
+        available = np.zeros(len(self.items))
+        for i, name in enumerate(self.items):
+            item = market_data.get(name)
+            if item is not None:
+                prices[i] = item.price
+                available[i] = item.available
+
+        n_item = len(self.items)
+        b = np.concatenate([np.zeros(n_item), [self.mining_seconds, self.crafting_seconds], available])
+
+        start = time.perf_counter()
+        x, profit, basis, iterations = simplex(self._objective(prices), self.A, b,
+                                               self._basis if warm_start else None)
+        self._basis = basis
+        count("optimizer_pivots", iterations)
+        return self._plan(x, profit, iterations, time.perf_counter() - start)
+
+    def _plan(self, x, profit, iterations, seconds, tol=1e-6):
+        n_ore, n_recipe = len(self.ores), len(self.recipes)
+        mining, crafts, purchases = x[:n_ore], x[n_ore:n_ore + n_recipe], x[n_ore + n_recipe:]
+        # 剩余物品（产出 + 采购 - 消耗）全部出售
+        sales = self.flow @ x
+        profit_copper = to_copper(profit)
+        return {
+            "profit_copper": profit_copper,
+            "profit_g": copper_to_gold(profit_copper),
+            "mining": {ore: float(v) for ore, v in zip(self.ores, mining) if v > tol},
+            "crafts": {recipe: float(v) for recipe, v in zip(self.recipes, crafts) if v > tol},
+            "purchases": {item: float(v) for item, v in zip(self.items, purchases) if v > tol},
+            "sales": {item: float(v) for item, v in zip(self.items, sales) if v > tol},
+            "mining_seconds": float(mining.sum() * MINING_TIME_PER_ORE),
+            "crafting_seconds": float(crafts.sum() * CRAFTING_TIME),
+            "iterations": iterations,
+            "solve_ms": seconds * 1000,
+        }
+
+
+def format_plan(plan):
+    """最优组合的文字说明"""
+    lines = [f"最优组合每小时收益: {plan['profit_g']:.4f}G "
+             f"(求解 {plan['solve_ms']:.2f}ms, {plan['iterations']} 次换基)"]
+    for ore_name, cycles in plan["mining"].items():
+        lines.append(f"  炸矿 {ore_name}: {cycles:.1f} 次")
+    for recipe_name, crafts in plan["crafts"].items():
+        lines.append(f"  制作 {recipe_name}: {crafts:.1f} 次")
+    for item, quantity in plan["purchases"].items():
+        lines.append(f"  采购 {item}: {quantity:.1f}")
+    for item, quantity in plan["sales"].items():
+        lines.append(f"  出售 {item}: {quantity:.1f}")
+    lines.append(f"  炸矿用时 {plan['mining_seconds']:.0f}s，制作用时 {plan['crafting_seconds']:.0f}s")
+    return "\n".join(lines)
+
+
+def run_optimization(history_path=None, mining_seconds=None, crafting_seconds=None):
+    """对历史中最新的市场快照求解最优组合并打印（时间预算默认取 config）"""
+    from backtest import latest_snapshot
+
+    timestamp, market_data = latest_snapshot(history_path)
+    if market_data is None:
+        print("没有可优化的市场数据")
+        return None
+
+    if mining_seconds is None and crafting_seconds is None:
+        optimizer = get_optimizer()
+    else:
+        optimizer = StrategyOptimizer(mining_seconds=mining_seconds, crafting_seconds=crafting_seconds)
+    plan = optimizer.optimize(market_data)
+    print(f"\n组合优化 ({timestamp:%Y-%m-%d %H:%M:%S})")
+    print(format_plan(plan))
+    return plan
+
+
+_default_optimizer = None
+
+
+def get_optimizer():
+    """获取共享的组合优化器（跨快照保留最优基用于热启动）"""
+    global _default_optimizer
+    if _default_optimizer is None:
+        _default_optimizer = StrategyOptimizer()
+    return _default_optimizer
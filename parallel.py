@@ -0,0 +1,129 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import config
+from calculator import ProfitCalculator, get_evaluation_engine
+from market_snapshot import MarketSnapshot
+from money import gold_to_copper
+from recipe_graph import get_recipe_graph
+
+# 工作进程内的评估引擎（由初始化函数创建，每个进程只编译一次）
+_worker_engine = None
+
+
+def _init_worker(mode):
+    global _worker_engine
+    _worker_engine = get_evaluation_engine(mode)
+
+
+def _evaluate_chunk(snapshots, units):
+    """工作进程：评估一批 (快照键, 矿石) 单元，矿石为 None 表示该快照的所有矿石"""
+    results = []
+    calculators = {}
+    for key, ore_name in units:
+        calculator = calculators.get(key)
+        if calculator is None:
+            calculator = calculators[key] = ProfitCalculator(snapshots[key], engine=_worker_engine)
+        ore_names = calculator.strategy_evaluator.graph.ores if ore_name is None else [ore_name]
+        for name in ore_names:
+            results.append((key, name, calculator.evaluate_strategies(name)))
+    return results
+
+
+class ParallelEvaluator:
+    """多进程策略评估
+
+    独立的评估单元分批交给进程池：
+    - "python" 模式下单元为 (快照, 矿石)，逐配方计算的开销分散到各进程
+    - "compiled" / "incremental" 模式下引擎一次评估全部矿石，单元为整个快照
+    快照可以是不同时间点、不同服务器/阵营的导出或同一快照的不同情景，以字典的键区分。
+    配方图在创建进程池前编译，fork 启动的工作进程直接共享只读的配方表。
+    """
+
+    def __init__(self, workers=None, mode=None, chunk_size=None):
+        workers = config.EVALUATION_WORKERS if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = config.EVALUATION_MODE if mode is None else mode
+        self.chunk_size = chunk_size
+        self._pool = None
+
+        get_recipe_graph()
+        self._engine = get_evaluation_engine(self.mode)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.mode,))
+        return self._pool
+
+    def _units(self, snapshots, ores):
+        if self._engine is not None and ores is None:
+            return [(key, None) for key in snapshots]
+        ores = get_recipe_graph().ores if ores is None else ores
+        return [(key, ore_name) for key in snapshots for ore_name in ores]
+
+    def evaluate(self, snapshots, ores=None):
+        """评估 {键: 市场数据}，返回 {键: {矿石: 结果}}，结果格式同 ProfitCalculator.evaluate_strategies"""
+        units = self._units(snapshots, ores)
+        results = {key: {} for key in snapshots}
+
+        if self.workers <= 1 or len(units) <= 1:
+            global _worker_engine
+            _worker_engine = self._engine
+            chunk_results = [_evaluate_chunk(snapshots, units)]
+        else:
+            chunk_size = self.chunk_size or max(1, -(-len(units) // (self.workers * 4)))
+            futures = []
+            for begin in range(0, len(units), chunk_size):
+                chunk = units[begin:begin + chunk_size]
+                # 每批只传递用到的快照
+                chunk_snapshots = {key: snapshots[key] for key, _ in chunk}
+                futures.append(self._get_pool().submit(_evaluate_chunk, chunk_snapshots, chunk))
+            chunk_results = [future.result() for future in futures]
+
+        for chunk in chunk_results:
+            for key, ore_name, ore_results in chunk:
+                results[key][ore_name] = ore_results
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def scenario_snapshots(market_data, scenarios):
+    """由基准快照生成情景快照
+
+    scenarios: {情景名称: {物品名称: 价格(金币)}}，价格为 None 表示该物品缺失。
+    返回 {情景名称: 市场数据}，可直接交给 ParallelEvaluator.evaluate。
+    """
+    snapshots = {}
+    if not isinstance(market_data, MarketSnapshot):
+        market_data = MarketSnapshot.from_items(market_data)
+    for scenario_name, overrides in scenarios.items():
+        snapshot = market_data.copy()
+        for name, price_g in overrides.items():
+            if price_g is None:
+                snapshot.pop(name, None)
+            else:
+                available = market_data[name].available if name in market_data else 0
+                snapshot.set(name, gold_to_copper(price_g), available)
+        snapshots[scenario_name] = snapshot
+    return snapshots
+
+
+_default_evaluator = None
+
+
+def get_parallel_evaluator():
+    """获取共享的多进程评估器（进程池在首次并行评估时创建，之后复用）"""
+    global _default_evaluator
+    if _default_evaluator is None:
+        _default_evaluator = ParallelEvaluator()
+    return _default_evaluator
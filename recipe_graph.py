@@ -0,0 +1,100 @@
+from collections import namedtuple
+from config import MINING_RECIPES, CRAFTING_RECIPES, DISENCHANT_RESULTS
+
+# 编译后的配方：materials / disenchant 为 ((物品名称, 数量), ...)，cost 为铜币
+CompiledRecipe = namedtuple('CompiledRecipe', ['id', 'name', 'materials', 'disenchant', 'cost'])
+
+
+class RecipeGraph:
+    """配方图：启动时由 config 编译一次，供各评估器共享
+
+    - 物品、矿石、配方均分配整数编号（按配置顺序）
+    - 反向索引：材料 -> 使用它的配方，分解产物 -> 产出它的配方，矿石 -> 可制作的配方
+    - 相关性集合：每种矿石的产出能用于哪些配方（即“去除无关配方”）
+    """
+
+    def __init__(self, mining_recipes=None, crafting_recipes=None, disenchant_results=None):
+        mining_recipes = MINING_RECIPES if mining_recipes is None else mining_recipes
+        crafting_recipes = CRAFTING_RECIPES if crafting_recipes is None else crafting_recipes
+        disenchant_results = DISENCHANT_RESULTS if disenchant_results is None else disenchant_results
+
+        # 物品编号：矿石、炸矿产出、制作材料、分解产物
+        self.items = []
+        self.item_ids = {}
+
+        self.ores = list(mining_recipes)
+        self.ore_ids = {ore_name: i for i, ore_name in enumerate(self.ores)}
+        self.ore_outputs = {}
+        for ore_name, outputs in mining_recipes.items():
+            self._item_id(ore_name)
+            # 同一产出重复出现时以最后一项为准
+            merged = {}
+            for item, prob in outputs:
+                self._item_id(item)
+                merged[item] = prob
+            self.ore_outputs[ore_name] = tuple(merged.items())
+
+        self.recipes = {}
+        for recipe_id, (recipe_name, recipe) in enumerate(crafting_recipes.items()):
+            materials = tuple(recipe['materials'].items())
+            disenchant = tuple(disenchant_results.get(recipe_name, {}).items())
+            for material, _ in materials + disenchant:
+                self._item_id(material)
+            self.recipes[recipe_name] = CompiledRecipe(recipe_id, recipe_name, materials, disenchant,
+                                                       recipe['cost'] * 10000)
+        self.recipe_names = list(self.recipes)
+
+        # 反向索引（物品编号 -> 配方编号元组，按配置顺序）
+        by_material, by_disenchant = {}, {}
+        for recipe in self.recipes.values():
+            for material, _ in recipe.materials:
+                by_material.setdefault(self.item_ids[material], []).append(recipe.id)
+            for material, _ in recipe.disenchant:
+                by_disenchant.setdefault(self.item_ids[material], []).append(recipe.id)
+        self.recipes_by_material = {k: tuple(dict.fromkeys(v)) for k, v in by_material.items()}
+        self.recipes_by_disenchant = {k: tuple(dict.fromkeys(v)) for k, v in by_disenchant.items()}
+
+        # 矿石 -> 可用其产出制作的配方（相关性集合）
+        self.recipes_by_ore = {}
+        for ore_name, outputs in self.ore_outputs.items():
+            self.recipes_by_ore[ore_name] = self._recipes_using_ids(self.item_ids[item] for item, _ in outputs)
+
+    def _item_id(self, name):
+        if name not in self.item_ids:
+            self.item_ids[name] = len(self.items)
+            self.items.append(name)
+        return self.item_ids[name]
+
+    def _recipes_using_ids(self, item_ids):
+        recipe_ids = set()
+        for item_id in item_ids:
+            recipe_ids.update(self.recipes_by_material.get(item_id, ()))
+        return tuple(self.recipe_names[i] for i in sorted(recipe_ids))
+
+    def relevant_recipes(self, ore_name):
+        """使用该矿石产出材料的配方（按配置顺序）"""
+        return self.recipes_by_ore.get(ore_name, ())
+
+    def recipes_using(self, items):
+        """使用任一给定物品作为材料的配方（按配置顺序）"""
+        return self._recipes_using_ids(self.item_ids[item] for item in items if item in self.item_ids)
+
+    def recipe_items(self, recipe_name):
+        """配方涉及的所有物品（材料与分解产物）"""
+        recipe = self.recipes[recipe_name]
+        return [material for material, _ in recipe.materials + recipe.disenchant]
+
+    def referenced_items(self):
+        """配方中引用到的所有物品"""
+        return set(self.items)
+
+
+_default_graph = None
+
+
+def get_recipe_graph():
+    """获取基于 config 编译的共享配方图（每个进程只编译一次）"""
+    global _default_graph
+    if _default_graph is None:
+        _default_graph = RecipeGraph()
+    return _default_graph
@@ -1,56 +1,69 @@
-import csv
-import os
 from datetime import datetime
+from history_writer import get_history_writer
+from metrics import timed, count
+from money import copper_to_gold, format_gold, gold_to_copper
 
 
 def generate_report_entry(timestamp, ore_name, market_data, results):
-    """生成报告条目"""
+    """生成报告条目（金额为整数铜币，*_g 为对应金币）"""
     ore_item = market_data.get(ore_name)
-    ore_price_g = ore_item.price / 10000 if ore_item else 0.0
+    ore_price = ore_item.price if ore_item else 0
 
     # 计算投入金额（矿石总成本）
-    investment = ore_price_g * results.get("mining_cycles", 9000)
+    investment = ore_price * results.get("mining_cycles", 9000)
+
+    # 评估结果中的铜币金额（旧格式结果只有金币字段）
+    mining_profit = results.get("mining_profit_copper", gold_to_copper(results["mining_profit_g"]))
+    disenchant_profit = results.get("disenchant_profit_copper", gold_to_copper(results["disenchant_profit_g"]))
+    strategy_profit = results.get("strategy_profit_copper", gold_to_copper(results["strategy_profit_g"]))
 
     return {
         "timestamp": timestamp,
         "ore_name": ore_name,
-        "investment_g": round(investment, 4),
-        "buy_price_g": round(ore_price_g, 4),
-        "mining_profit_g": round(results["mining_profit_g"], 4),
+        "investment_copper": investment,
+        "buy_price_copper": ore_price,
+        "mining_profit_copper": mining_profit,
+        "disenchant_profit_copper": disenchant_profit,
+        "strategy_profit_copper": strategy_profit,
+        "investment_g": copper_to_gold(investment),
+        "buy_price_g": copper_to_gold(ore_price),
+        "mining_profit_g": copper_to_gold(mining_profit),
         "mining_profit_pct": round(results["mining_profit_pct"], 4),
-        "mining_hourly_g": round(results["mining_hourly_g"], 4),
-        "disenchant_profit_g": round(results["disenchant_profit_g"], 4),
-        "disenchant_hourly_g": round(results["disenchant_hourly_g"], 4),
+        "mining_hourly_g": copper_to_gold(mining_profit),
+        "disenchant_profit_g": copper_to_gold(disenchant_profit),
+        "disenchant_hourly_g": copper_to_gold(disenchant_profit),
         "best_strategy": results["best_strategy"],
-        "strategy_profit_g": round(results["strategy_profit_g"], 4)
+        "strategy_profit_g": copper_to_gold(strategy_profit)
     }
 
 
+REPORT_HEADER = [
+    "Timestamp", "Ore", "Investment(G)", "Buy Price(G)", "Mining Profit(G)",
+    "Mining Profit(%)", "Mining Hourly(G)", "Disenchant Profit(G)",
+    "Disenchant Hourly(G)", "Best Strategy", "Strategy Profit(G)"
+]
+
+
+@timed("save_report")
 def save_report_entry(entry, filename="data/reports/mining_report.csv"):
-    """保存报告条目到CSV"""
-    file_exists = os.path.isfile(filename)
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-
-    with open(filename, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-
-        if not file_exists:
-            writer.writerow([
-                "Timestamp", "Ore", "Investment(G)", "Buy Price(G)", "Mining Profit(G)",
-                "Mining Profit(%)", "Mining Hourly(G)", "Disenchant Profit(G)",
-                "Disenchant Hourly(G)", "Best Strategy", "Strategy Profit(G)"
-            ])
-
-        writer.writerow([
-            entry["timestamp"],
-            entry["ore_name"],
-            f"{entry['investment_g']:.4f}",
-            f"{entry['buy_price_g']:.4f}",
-            f"{entry['mining_profit_g']:.4f}",
-            f"{entry['mining_profit_pct']:.4f}",
-            f"{entry['mining_hourly_g']:.4f}",
-            f"{entry['disenchant_profit_g']:.4f}",
-            f"{entry['disenchant_hourly_g']:.4f}",
-            entry["best_strategy"],
-            f"{entry['strategy_profit_g']:.4f}"
-        ])
\ No newline at end of file
+    """保存报告条目到CSV（由历史写入器在本次处理结束时批量写入）"""
+    row = [
+        entry["timestamp"],
+        entry["ore_name"],
+        format_gold(entry["investment_copper"]),
+        format_gold(entry["buy_price_copper"]),
+        format_gold(entry["mining_profit_copper"]),
+        f"{entry['mining_profit_pct']:.4f}",
+        format_gold(entry["mining_profit_copper"]),
+        format_gold(entry["disenchant_profit_copper"]),
+        format_gold(entry["disenchant_profit_copper"]),
+        entry["best_strategy"],
+        format_gold(entry["strategy_profit_copper"])
+    ]
+
+    def write(batch):
+        start, end = batch.append(filename, REPORT_HEADER, [row])
+        count("bytes_written.report", end - start)
+
+    get_history_writer().submit(write)
+    count("rows_written.report")
\ No newline at end of file
@@ -0,0 +1,184 @@
+import math
+from collections import deque
+import config
+
+
+class RollingWindow:
+    """单个序列的滚动统计：均值、标准差、最小/最大值、EMA，每次更新均摊 O(1)
+
+    窗口同时受样本数（capacity）与时长（max_age 秒）限制。
+    累计和与平方和对整数（铜币价格、收益）精确，不存在浮点漂移；
+    最小/最大值由单调队列维护。
+    """
+
+    __slots__ = ("capacity", "max_age", "alpha", "_values", "_min", "_max",
+                 "_seq", "_sum", "_sumsq", "ema")
+
+    def __init__(self, capacity, max_age=None, alpha=0.1):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.alpha = alpha
+        self._values = deque()  # (序号, 时间, 数值)
+        self._min = deque()     # (序号, 数值)，数值递增
+        self._max = deque()     # (序号, 数值)，数值递减
+        self._seq = 0
+        self._sum = 0
+        self._sumsq = 0
+        self.ema = None
+
+    def push(self, timestamp, value):
+        seq = self._seq
+        self._seq += 1
+        self._values.append((seq, timestamp, value))
+        self._sum += value
+        self._sumsq += value * value
+        self.ema = value if self.ema is None else self.ema + self.alpha * (value - self.ema)
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((seq, value))
+
+        self.expire(timestamp)
+
+    def expire(self, now):
+        """移出超出样本数或时长的旧值"""
+        values = self._values
+        cutoff = now.timestamp() - self.max_age if self.max_age is not None else None
+        while values and (len(values) > self.capacity or
+                          (cutoff is not None and values[0][1].timestamp() < cutoff)):
+            seq, _, old = values.popleft()
+            self._sum -= old
+            self._sumsq -= old * old
+            if self._min[0][0] == seq:
+                self._min.popleft()
+            if self._max[0][0] == seq:
+                self._max.popleft()
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def last(self):
+        return self._values[-1][2] if self._values else None
+
+    @property
+    def mean(self):
+        return self._sum / len(self._values) if self._values else None
+
+    @property
+    def std(self):
+        """样本标准差（少于2个样本时为 None）"""
+        n = len(self._values)
+        if n < 2:
+            return None
+        return math.sqrt(max(n * self._sumsq - self._sum * self._sum, 0) / (n * (n - 1)))
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    def zscore(self, value):
+        """value 偏离窗口均值的标准差倍数（标准差为 0 或样本不足时为 None）"""
+        std = self.std
+        if not std:
+            return None
+        return (value - self.mean) / std
+
+    def to_dict(self):
+        return {"count": len(self), "last": self.last, "mean": self.mean, "std": self.std,
+                "min": self.min, "max": self.max, "ema": self.ema}
+
+
+class SnapshotBuffer:
+    """最近 N 个快照的内存环形缓冲区及各物品价格、各策略收益的滚动统计
+
+    主循环每处理一个快照调用一次 push，之后可直接查询统计（金额均为铜币），
+    实时判断不再需要重新读取 CSV 历史。
+    """
+
+    def __init__(self, capacity=None, max_age=None, alpha=None, items=None):
+        self.capacity = capacity or config.ROLLING_WINDOW_SIZE
+        self.max_age = config.ROLLING_WINDOW_SECONDS if max_age is None else max_age
+        self.alpha = alpha or config.ROLLING_EMA_ALPHA
+        # 只统计这些物品（None 表示快照中的全部物品）
+        self.items = items
+        self.snapshots = deque(maxlen=self.capacity)  # (时间, 市场数据, {矿石: 结果})
+        self.prices = {}
+        self.strategies = {}
+
+    def _window(self, table, key):
+        window = table.get(key)
+        if window is None:
+            window = table[key] = RollingWindow(self.capacity, self.max_age, self.alpha)
+        return window
+
+    def push(self, timestamp, market_data, results_by_ore=None):
+        """加入一个快照及其评估结果"""
+        self.snapshots.append((timestamp, market_data, results_by_ore or {}))
+
+        if self.items is None:
+            items = market_data.values()
+        else:
+            items = [market_data[name] for name in self.items if name in market_data]
+        for item in items:
+            self._window(self.prices, item.name).push(timestamp, item.price)
+
+        for ore_name, results in (results_by_ore or {}).items():
+            for strategy_name, data in results.get("all_strategies", {}).items():
+                self._window(self.strategies, (ore_name, strategy_name)).push(timestamp, data["profit_copper"])
+
+        # 本次快照中缺失的序列也按时长移出旧值
+        if self.max_age is not None:
+            for window in self.prices.values():
+                window.expire(timestamp)
+            for window in self.strategies.values():
+                window.expire(timestamp)
+
+    def latest(self):
+        """最近一个快照 (时间, 市场数据, {矿石: 结果})"""
+        return self.snapshots[-1] if self.snapshots else None
+
+    def price_stats(self, item_name):
+        window = self.prices.get(item_name)
+        return window.to_dict() if window is not None else None
+
+    def strategy_stats(self, ore_name, strategy_name):
+        window = self.strategies.get((ore_name, strategy_name))
+        return window.to_dict() if window is not None else None
+
+    def price_anomalies(self, market_data, threshold=None, min_samples=None):
+        """价格偏离窗口均值超过 threshold 个标准差的物品，返回 [(物品, 价格, 均值, z)]，按 |z| 降序"""
+        threshold = config.ANOMALY_ZSCORE if threshold is None else threshold
+        min_samples = config.ANOMALY_MIN_SAMPLES if min_samples is None else min_samples
+        anomalies = []
+        for name, window in self.prices.items():
+            if len(window) < min_samples or name not in market_data:
+                continue
+            price = market_data[name].price
+            z = window.zscore(price)
+            if z is not None and abs(z) >= threshold:
+                anomalies.append((name, price, window.mean, z))
+        anomalies.sort(key=lambda row: -abs(row[3]))
+        return anomalies
+
+
+_default_buffer = None
+
+
+def get_snapshot_buffer():
+    """获取共享的快照缓冲区（默认只统计配方中引用到的物品）"""
+    global _default_buffer
+    if _default_buffer is None:
+        items = None
+        if config.ROLLING_RECIPE_ITEMS_ONLY:
+            from recipe_graph import get_recipe_graph
+            items = get_recipe_graph().items
+        _default_buffer = SnapshotBuffer(items=items)
+    return _default_buffer
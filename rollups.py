@@ -0,0 +1,360 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import config
+from config import HISTORY_DIR
+from history_reader import read_history, truncate_before
+from metrics import timed, count
+from money import format_gold
+
+# 分层保留：原始分钟数据定期汇总为 1 小时与 1 天的K线（rollups/<层级>/ 下与原始文件相同的结构），
+# 各层按 config.ROLLUP_RETENTION_DAYS 裁剪。图表按窗口天数选择能给出足够数据点的最粗层级，
+# 最后一根完整K线之后的部分仍从原始数据读取。
+# rollups/state.json 记录每个层级、每个原始文件已汇总到的时间（不含），之后只处理新增部分。
+
+TIERS = ("1h", "1d")
+TIER_FREQ = {"1h": "h", "1d": "D"}
+TIER_SPAN = {"1h": pd.Timedelta(hours=1), "1d": pd.Timedelta(days=1)}
+BARS_PER_DAY = {"raw": 24 * 60, "1h": 24, "1d": 1}
+
+# 物品K线：开高低收（收盘价为 price_g），区间内平均/最小/最大可购买数量与数据点数
+ITEM_ROLLUP_HEADER = ["timestamp", "open_g", "high_g", "low_g", "price_g",
+                      "available", "available_min", "available_max", "samples"]
+# 策略K线：三项收益为区间均值，另有总收益最小/最大/最新值与数据点数
+STRATEGY_ROLLUP_HEADER = ["timestamp", "ore", "strategy", "mining_profit_g", "disenchant_profit_g",
+                          "total_profit_g", "total_min_g", "total_max_g", "total_last_g", "samples", "type"]
+
+STRATEGY_FILE = "strategy_history.csv"
+MARKET_FILE = "full_history.csv"
+
+
+def _to_copper(series):
+    return np.rint(series.to_numpy(dtype=float) * 10000).astype(np.int64)
+
+
+def _item_bars(df, freq):
+    frame = pd.DataFrame({
+        "bar": df["timestamp"].dt.floor(freq),
+        "price": _to_copper(df["price_g"]),
+        "available": df["available"].to_numpy(dtype=np.int64),
+    })
+    grouped = frame.groupby("bar", sort=True)
+    prices = grouped["price"].agg(["first", "max", "min", "last"])
+    available = grouped["available"].agg(["mean", "min", "max", "size"])
+    return [
+        [bar.strftime("%Y-%m-%d %H:%M:%S"), format_gold(p[0]), format_gold(p[1]), format_gold(p[2]),
+         format_gold(p[3]), int(round(a[0])), int(a[1]), int(a[2]), int(a[3])]
+        for bar, p, a in zip(prices.index, prices.to_numpy(), available.to_numpy())
+    ]
+
+
+def _strategy_bars(df, freq):
+    frame = pd.DataFrame({
+        "bar": df["timestamp"].dt.floor(freq),
+        "ore": df["ore"].to_numpy(),
+        "strategy": df["strategy"].to_numpy(),
+        "mining": _to_copper(df["mining_profit_g"]),
+        "disenchant": _to_copper(df["disenchant_profit_g"]),
+        "total": _to_copper(df["total_profit_g"]),
+        "type": df["type"].to_numpy(),
+    })
+    bars = frame.groupby(["bar", "ore", "strategy"], sort=True).agg(
+        mining=("mining", "mean"), disenchant=("disenchant", "mean"), total=("total", "mean"),
+        total_min=("total", "min"), total_max=("total", "max"), total_last=("total", "last"),
+        samples=("total", "size"), type=("type", "last"))
+    return [
+        [bar.strftime("%Y-%m-%d %H:%M:%S"), ore, strategy,
+         format_gold(round(row.mining)), format_gold(round(row.disenchant)), format_gold(round(row.total)),
+         format_gold(row.total_min), format_gold(row.total_max), format_gold(row.total_last),
+         int(row.samples), row.type]
+        for (bar, ore, strategy), row in zip(bars.index, bars.itertuples(index=False))
+    ]
+
+
+def _append_csv(path, header, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_exists = os.path.isfile(path)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if not file_exists:
+            writer.writerow(header)
+        writer.writerows(rows)
+
+
+class RollupStore:
+    """原始历史的 1 小时 / 1 天汇总与分层保留"""
+
+    def __init__(self, history_dir=None):
+        self.history_dir = history_dir or HISTORY_DIR
+        self.directory = os.path.join(self.history_dir, "rollups")
+        self.state = None
+
+    def _state_path(self):
+        return os.path.join(self.directory, "state.json")
+
+    def _load_state(self):
+        if self.state is None:
+            self.state = {tier: {} for tier in TIERS}
+            if os.path.isfile(self._state_path()):
+                with open(self._state_path(), encoding='utf-8') as f:
+                    self.state.update(json.load(f))
+        return self.state
+
+    def _save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._load_state(), f, ensure_ascii=False)
+        os.replace(tmp_path, self._state_path())
+
+    def raw_path(self, key):
+        return os.path.join(self.history_dir, key)
+
+    def tier_path(self, tier, key):
+        return os.path.join(self.directory, tier, key)
+
+    def _raw_keys(self):
+        """参与汇总的原始文件（相对历史目录）：各物品文件与策略历史"""
+        keys = []
+        items_dir = os.path.join(self.history_dir, "items")
+        if os.path.isdir(items_dir):
+            keys += [f"items/{name}" for name in sorted(os.listdir(items_dir)) if name.endswith(".csv")]
+        if os.path.isfile(self.raw_path(STRATEGY_FILE)):
+            keys.append(STRATEGY_FILE)
+        return keys
+
+    # ---- 汇总 ----
+
+    def _roll_file(self, key, now):
+        """将一个原始文件中已完整的小时/天汇总进各层级，返回写入的K线数"""
+        state = self._load_state()
+        marks = [state[tier].get(key) for tier in TIERS]
+        start = None if any(mark is None for mark in marks) else min(marks)
+        df = read_history(self.raw_path(key), start=start)
+
+        if df.empty:
+            return 0
+        # 区间在出现更晚的数据后才算结束（时间戳早于当前时间的补录数据不会被跳过），当前区间留到下次
+        latest = min(df["timestamp"].max(), pd.Timestamp(now))
+
+        written = 0
+        for tier in TIERS:
+            end = latest.floor(TIER_FREQ[tier])
+            mark = state[tier].get(key)
+            if mark is not None and end <= pd.Timestamp(mark):
+                continue
+            rows = df[df["timestamp"] < end]
+            if mark is not None:
+                rows = rows[rows["timestamp"] >= pd.Timestamp(mark)]
+            if not rows.empty:
+                if key == STRATEGY_FILE:
+                    header, bars = STRATEGY_ROLLUP_HEADER, _strategy_bars(rows, TIER_FREQ[tier])
+                else:
+                    header, bars = ITEM_ROLLUP_HEADER, _item_bars(rows, TIER_FREQ[tier])
+                _append_csv(self.tier_path(tier, key), header, bars)
+                written += len(bars)
+            state[tier][key] = end.strftime("%Y-%m-%d %H:%M:%S")
+        return written
+
+    @timed("compact_history")
+    def compact(self, now=None, prune=True):
+        """汇总新增的完整区间并按保留期裁剪，返回 {"bars": K线数, "pruned_bytes": 裁剪字节数}"""
+        now = now or datetime.now()
+        bars = 0
+        for key in self._raw_keys():
+            bars += self._roll_file(key, now)
+        self._save_state()
+        count("rollup_bars_written", bars)
+
+        pruned = self.prune(now) if prune else 0
+        return {"bars": bars, "pruned_bytes": pruned}
+
+    def rebuild(self, now=None):
+        """删除全部汇总并从原始数据重新生成（不裁剪）"""
+        import shutil
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        self.state = None
+        return self.compact(now, prune=False)
+
+    # ---- 保留期 ----
+
+    def prune(self, now=None):
+        """按各层级的保留天数删除过期数据，返回删除的字节数
+
+        原始数据只裁剪到各层级都已汇总的位置；裁剪策略历史前先补齐策略聚合，之后调整其已聚合位置。
+        """
+        import strategy_aggregates
+
+        now = now or datetime.now()
+        state = self._load_state()
+        retention = config.ROLLUP_RETENTION_DAYS
+        removed = 0
+
+        raw_days = retention.get("raw")
+        if raw_days is not None:
+            cutoff = (now - timedelta(days=raw_days)).strftime("%Y-%m-%d")
+            for key in self._raw_keys():
+                marks = [state[tier].get(key) for tier in TIERS]
+                if any(mark is None for mark in marks):
+                    continue
+                day = min([cutoff] + [mark[:10] for mark in marks])
+                if key == STRATEGY_FILE:
+                    # 与写入时使用同一个聚合对象，使其内存中的已聚合位置一并更新
+                    if self.history_dir == strategy_aggregates.HISTORY_DIR:
+                        aggregates = strategy_aggregates.get_strategy_aggregates()
+                    else:
+                        aggregates = strategy_aggregates.StrategyAggregates(self.history_dir)
+                    aggregates.catch_up()
+                    truncated = truncate_before(self.raw_path(key), day)
+                    aggregates.truncated(truncated)
+                else:
+                    truncated = truncate_before(self.raw_path(key), day)
+                removed += truncated
+            # 完整历史文件不参与汇总，其数据由各物品文件的K线覆盖（回测读取时用K线补齐被裁剪的部分），
+            # 因此只裁剪到所有物品文件的各层级都已汇总的位置
+            item_marks = [state[tier].get(key) for key in self._raw_keys() if key != STRATEGY_FILE for tier in TIERS]
+            if item_marks and all(mark is not None for mark in item_marks):
+                day = min([cutoff] + [mark[:10] for mark in item_marks])
+                removed += truncate_before(self.raw_path(MARKET_FILE), day)
+
+        for tier in TIERS:
+            days = retention.get(tier)
+            tier_dir = os.path.join(self.directory, tier)
+            if days is None or not os.path.isdir(tier_dir):
+                continue
+            cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d")
+            for key in list(state[tier]):
+                removed += truncate_before(self.tier_path(tier, key), cutoff)
+
+        count("rollup_bytes_pruned", removed)
+        return removed
+
+    # ---- 读取 ----
+
+    def read(self, key, days, columns=None, filters=None, now=None):
+        """读取最近 days 天的历史：按窗口选择层级，该层级最后一根K线之后依次用更细的层级与原始数据补齐"""
+        begin = pd.Timestamp((now or datetime.now()) - timedelta(days=days))
+        tier = choose_tier(days)
+        count(f"history_reads.{tier}")
+
+        state = self._load_state()
+        frames = []
+        chain = TIERS[:TIERS.index(tier) + 1] if tier != "raw" else ()
+        for level in reversed(chain):
+            mark = state.get(level, {}).get(key)
+            if mark is None or pd.Timestamp(mark) <= begin or not os.path.isfile(self.tier_path(level, key)):
+                continue
+            mark = pd.Timestamp(mark)
+            df = read_history(self.tier_path(level, key), start=begin, columns=columns, filters=filters)
+            frames.append(df[df["timestamp"] < mark] if not df.empty else df)
+            begin = mark
+        frames.append(read_history(self.raw_path(key), start=begin, columns=columns, filters=filters))
+
+        frames = [frame for frame in frames if not frame.empty]
+        if len(frames) <= 1:
+            return frames[0] if frames else pd.DataFrame(columns=columns or [])
+        return pd.concat(frames, ignore_index=True)
+
+
+def choose_tier(days):
+    """窗口内能给出至少 ROLLUP_MIN_POINTS 个数据点、且仍在保留期内的最粗层级"""
+    retention = config.ROLLUP_RETENTION_DAYS
+    for tier in reversed(TIERS):
+        kept = retention.get(tier)
+        if days * BARS_PER_DAY[tier] >= config.ROLLUP_MIN_POINTS and (kept is None or days <= kept):
+            return tier
+    return "raw"
+
+
+def read_item_history(item_name, days, columns=None, history_dir=None):
+    """读取物品最近 days 天的价格/可购买数量（长窗口自动使用小时或天K线）"""
+    return get_rollup_store(history_dir).read(f"items/{item_name}.csv", days, columns=columns)
+
+
+def read_strategy_history(days, strategies=None, ore_name=None, history_dir=None):
+    """读取最近 days 天、指定策略（及矿石）的策略收益（长窗口自动使用小时或天K线）"""
+    filters = {}
+    if strategies is not None:
+        filters['strategy'] = strategies
+    if ore_name:
+        filters['ore'] = ore_name
+    return get_rollup_store(history_dir).read(STRATEGY_FILE, days, filters=filters)
+
+
+def read_market_history(before=None, start=None, end=None, history_dir=None):
+    """用物品K线补齐已被裁剪的完整市场历史
+
+    返回各物品在 before 之前已结束的K线（优先小时K线，小时K线已裁剪的更早部分用天K线），
+    列同 full_history.csv：价格取收盘价、可购买数量取区间均值，时间为K线起点，每根K线视为一个快照。
+    """
+    store = get_rollup_store(history_dir)
+    limit = pd.Timestamp(before) if before is not None else None
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    names = set()
+    for tier in TIERS:
+        tier_items = os.path.join(store.directory, tier, "items")
+        if os.path.isdir(tier_items):
+            names.update(name[:-4] for name in os.listdir(tier_items) if name.endswith(".csv"))
+
+    frames = []
+    for item_name in sorted(names):
+        item_limit = limit
+        for tier in TIERS:
+            stop = end if item_limit is None else (item_limit if end is None else min(end, item_limit))
+            df = read_history(store.tier_path(tier, f"items/{item_name}.csv"), start=start, end=stop,
+                              columns=["price_g", "available"])
+            if df.empty:
+                continue
+            if item_limit is not None:
+                # 只取在补齐范围内已完整结束的K线，与原始数据或更细层级重叠的K线不取
+                df = df[df["timestamp"] + TIER_SPAN[tier] <= item_limit]
+            if df.empty:
+                continue
+            df.insert(1, "item", item_name)
+            frames.append(df)
+            item_limit = df["timestamp"].min()
+
+    if not frames:
+        return pd.DataFrame(columns=["timestamp", "item", "price_g", "available"])
+    return pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+_default_store = None
+_last_compaction = None
+
+
+def get_rollup_store(history_dir=None):
+    """获取当前历史目录的汇总存储（历史目录改变时重新创建）"""
+    global _default_store
+    history_dir = history_dir or HISTORY_DIR
+    if _default_store is None or _default_store.history_dir != history_dir:
+        _default_store = RollupStore(history_dir)
+    return _default_store
+
+
+def schedule_compaction(writer):
+    """距上次汇总超过 ROLLUP_INTERVAL 秒时，在历史写入线程中当前批次写完后执行一次汇总与裁剪"""
+    global _last_compaction
+    if not config.ROLLUP_INTERVAL:
+        return
+    now = time.monotonic()
+    if _last_compaction is not None and now - _last_compaction < config.ROLLUP_INTERVAL:
+        return
+    _last_compaction = now
+    store = get_rollup_store()
+    writer.submit(lambda batch: batch.after(store.compact))
+
+
+def run_compaction(rebuild=False):
+    """命令行：汇总并裁剪历史"""
+    store = get_rollup_store()
+    result = store.rebuild() if rebuild else store.compact()
+    print(f"已汇总 {result['bars']} 根K线，裁剪 {result['pruned_bytes'] / 1024:.1f} KB 过期数据")
+    return result
@@ -0,0 +1,253 @@
+import numpy as np
+import config
+from metrics import timed
+from vector_engine import get_vectorized_evaluator
+
+# 敏感性分析：对一个或两个输入（物品价格、TAX_RATE、CRIT_RATE）取网格，
+# 整个网格作为批量价格矩阵一次交给 VectorizedEvaluator 评估所有 (矿石, 策略)，
+# 再沿第一个参数求每个策略的盈亏平衡点与最优策略的切换边界。
+# 制作次数只取决于数量不取决于价格，收益对单个价格（及税率、暴击率）是线性的，
+# 因此相邻网格点之间线性插值得到的交点是精确的（误差仅来自取整到铜币）。
+
+RATE_PARAMS = ("TAX_RATE", "CRIT_RATE")
+
+
+class SensitivityAxis:
+    """一个扫描参数：物品价格（金币）或税率/暴击率"""
+
+    def __init__(self, name, values, item_index=None):
+        self.name = name
+        self.values = np.asarray(values, dtype=float)
+        self.item_index = item_index
+
+    @property
+    def is_price(self):
+        return self.item_index is not None
+
+    def label(self):
+        return f"{self.name}价格(G)" if self.is_price else self.name
+
+
+def parse_axis(text, evaluator, prices, points=None):
+    """解析 参数[=起点:终点[:点数]]；价格以金币计，省略范围时价格取当前价 ±SENSITIVITY_PRICE_SPAN，
+    税率/暴击率取 0 到当前值的两倍（不超过1）"""
+    name, _, span = text.partition("=")
+    name = name.strip()
+    points = points or config.SENSITIVITY_POINTS
+
+    if name.upper() in RATE_PARAMS:
+        name = name.upper()
+        current = getattr(config, name)
+        low, high = 0.0, min(2.0 * current, 1.0) if current > 0 else 1.0
+        item_index = None
+    elif name in evaluator.item_index:
+        item_index = evaluator.item_index[name]
+        current = prices[item_index] / 10000.0
+        low, high = current * (1 - config.SENSITIVITY_PRICE_SPAN), current * (1 + config.SENSITIVITY_PRICE_SPAN)
+    else:
+        raise ValueError(f"未知的物品或参数: {name}（可用 {', '.join(RATE_PARAMS)} 或配方中的物品）")
+
+    if span:
+        parts = span.split(":")
+        if len(parts) not in (2, 3):
+            raise ValueError(f"范围格式应为 起点:终点[:点数]: {span}")
+        low, high = float(parts[0]), float(parts[1])
+        if len(parts) == 3:
+            points = int(parts[2])
+    if high <= low:
+        raise ValueError(f"{name} 的范围无效: {low} ~ {high}（当前价格为0时请指定范围）")
+    return SensitivityAxis(name, np.linspace(low, high, points), item_index)
+
+
+class SensitivityResult:
+    """网格评估结果
+
+    profit: (第一参数点数[, 第二参数点数], 矿石, 策略) 铜币收益（int64，无效项为0），valid 为有效掩码，
+    best: 每个网格点、每种矿石的最优策略列号（列顺序同 strategy_names）。
+    """
+
+    def __init__(self, axes, ores, names, profit, valid, best):
+        self.axes = axes
+        self.ores = ores
+        self.names = names
+        self.profit = profit
+        self.valid = valid
+        self.best = best
+
+    def best_profit(self):
+        return np.take_along_axis(self.profit, self.best[..., None], axis=-1)[..., 0]
+
+    def break_even(self):
+        """沿第一个参数的每个策略收益过零点
+
+        返回 [(第二参数下标或 None, 矿石, 策略列号, 参数值, 方向)]，方向 1 为由亏转盈，-1 为由盈转亏。
+        """
+        return self._crossings(self.profit.astype(float), self.valid)
+
+    def best_break_even(self):
+        """最优策略收益（各策略收益的上包络）的过零点：低于/高于该值时所有策略都亏损"""
+        profit = self.best_profit().astype(float)[..., None]
+        valid = self.valid.any(axis=-1)[..., None]
+        return [(j, o, None, x, direction) for j, o, _, x, direction in self._crossings(profit, valid)]
+
+    def _crossings(self, profit, valid):
+        values = self.axes[0].values
+        y0, y1 = profit[:-1], profit[1:]
+        both = valid[:-1] & valid[1:]
+        changed = both & ((y0 >= 0) != (y1 >= 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = y0 / (y0 - y1)
+        step = np.diff(values).reshape((-1,) + (1,) * (profit.ndim - 1))
+        x = values[:-1].reshape(step.shape) + step * t
+
+        results = []
+        for index in zip(*np.nonzero(changed)):
+            rest = index[1:]
+            j = rest[0] if len(self.axes) > 1 else None
+            o, s = rest[-2], rest[-1]
+            results.append((j, int(o), int(s), float(x[index]), 1 if y1[index] > y0[index] else -1))
+        return results
+
+    def switches(self):
+        """沿第一个参数最优策略改变的位置：返回 [(第二参数下标或 None, 矿石, 原策略, 新策略, 参数值)]
+
+        边界取两个策略收益相等处（相邻网格点之间跳过多个策略时只给出首尾两个策略的交点）。
+        """
+        values = self.axes[0].values
+        best = self.best
+        changed = best[:-1] != best[1:]
+        results = []
+        for index in zip(*np.nonzero(changed)):
+            k, rest = index[0], index[1:]
+            old, new = best[index], best[(k + 1,) + rest]
+            gap0 = float(self.profit[index + (old,)] - self.profit[index + (new,)])
+            gap1 = float(self.profit[(k + 1,) + rest + (old,)] - self.profit[(k + 1,) + rest + (new,)])
+            t = gap0 / (gap0 - gap1) if gap0 != gap1 else 0.0
+            x = values[k] + (values[k + 1] - values[k]) * t
+            j = rest[0] if len(self.axes) > 1 else None
+            results.append((j, int(rest[-1]), int(old), int(new), float(x)))
+        return results
+
+
+class SensitivityAnalyzer:
+    """用矩阵化评估器在参数网格上批量评估所有策略"""
+
+    def __init__(self, evaluator=None):
+        self.evaluator = evaluator if evaluator is not None else get_vectorized_evaluator()
+
+    @timed("sensitivity")
+    def sweep(self, market_data, axes):
+        """axes: 一个或两个 SensitivityAxis，返回 SensitivityResult"""
+        if not 1 <= len(axes) <= 2:
+            raise ValueError("敏感性分析支持一个或两个参数")
+        if len(axes) == 2 and axes[0].name == axes[1].name:
+            raise ValueError(f"两个参数相同: {axes[0].name}")
+        evaluator = self.evaluator
+        prices, present = evaluator.price_vector(market_data)
+        shape = tuple(len(axis.values) for axis in axes)
+
+        grid_prices = np.broadcast_to(prices, shape + prices.shape).copy()
+        grid_present = present.copy()
+        rates = {"TAX_RATE": np.full(shape, config.TAX_RATE), "CRIT_RATE": np.full(shape, config.CRIT_RATE)}
+        for d, axis in enumerate(axes):
+            values = axis.values.reshape((-1,) + (1,) * (len(axes) - 1 - d))
+            if axis.is_price:
+                # 扫描的物品视为在售
+                grid_prices[..., axis.item_index] = np.rint(values * 10000)
+                grid_present[axis.item_index] = True
+            else:
+                rates[axis.name] = np.broadcast_to(values, shape).copy()
+
+        profit, valid = evaluator.evaluate_copper(grid_prices, grid_present,
+                                                  rates["TAX_RATE"], rates["CRIT_RATE"])
+        best = evaluator.best_index(profit, valid)
+        return SensitivityResult(axes, evaluator.ores, evaluator.strategy_names(), profit, valid, best)
+
+
+def _format_value(axis, value):
+    return f"{value:.4f}G" if axis.is_price else f"{value:.4f}"
+
+
+def run_sensitivity(axis_texts, points=None, output_file=None, boundaries_file=None, history_path=None):
+    """对历史中最新的市场快照做敏感性分析，打印并可选保存最优策略网格与盈亏平衡/切换边界"""
+    import time
+    import pandas as pd
+    from backtest import latest_snapshot
+
+    timestamp, market_data = latest_snapshot(history_path)
+    if market_data is None:
+        print("没有可分析的市场数据")
+        return None
+
+    analyzer = SensitivityAnalyzer()
+    prices, _ = analyzer.evaluator.price_vector(market_data)
+    axes = [parse_axis(text, analyzer.evaluator, prices, points) for text in axis_texts]
+    start = time.perf_counter()
+    result = analyzer.sweep(market_data, axes)
+    elapsed = (time.perf_counter() - start) * 1000.0
+
+    first, second = axes[0], axes[1] if len(axes) > 1 else None
+    grid_size = int(np.prod([len(axis.values) for axis in axes]))
+    print(f"\n敏感性分析 ({timestamp:%Y-%m-%d %H:%M:%S}, {' × '.join(axis.label() for axis in axes)}, "
+          f"{grid_size} 个网格点, 用时 {elapsed:.1f}ms)")
+
+    switches = result.switches()
+    best_even = result.best_break_even()
+    break_even = result.break_even()
+    ever_best = {(o, s) for o in range(len(result.ores)) for s in np.unique(result.best[..., o])}
+    second_values = range(len(second.values)) if second is not None else [None]
+
+    for o, ore_name in enumerate(result.ores):
+        print(f"\n{ore_name}:")
+        for j in second_values:
+            if second is not None:
+                print(f"  {second.label()} = {_format_value(second, second.values[j])}:")
+            indent = "    " if second is not None else "  "
+            start_best = result.best[(0, j, o) if j is not None else (0, o)]
+            print(f"{indent}{_format_value(first, first.values[0])} 起最优: {result.names[start_best][0]}")
+            for sj, so, old, new, x in switches:
+                if sj == j and so == o:
+                    print(f"{indent}{_format_value(first, x)} 起最优: {result.names[new][0]} (原 {result.names[old][0]})")
+            for sj, so, _, x, direction in best_even:
+                if sj == j and so == o:
+                    state = "高于此值至少一个策略盈利" if direction > 0 else "高于此值所有策略亏损"
+                    print(f"{indent}盈亏平衡 {_format_value(first, x)}: {state}")
+            for sj, so, s, x, direction in break_even:
+                if sj == j and so == o and (o, s) in ever_best:
+                    state = "由亏转盈" if direction > 0 else "由盈转亏"
+                    print(f"{indent}  {result.names[s][0]} 盈亏平衡 {_format_value(first, x)} ({state})")
+
+    def axis_columns(j):
+        return {second.label(): second.values[j]} if second is not None else {}
+
+    if output_file:
+        best_profit = result.best_profit()
+        rows = []
+        for index in np.ndindex(result.best.shape):
+            o = index[-1]
+            if not result.valid[index].any():
+                continue
+            row = {first.label(): first.values[index[0]]}
+            if second is not None:
+                row[second.label()] = second.values[index[1]]
+            row.update({"ore": result.ores[o], "best_strategy": result.names[result.best[index]][0],
+                        "best_profit_g": best_profit[index] / 10000.0})
+            rows.append(row)
+        pd.DataFrame(rows).to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n最优策略网格已保存至: {output_file}")
+
+    if boundaries_file:
+        rows = []
+        for j, o, old, new, x in switches:
+            rows.append({**axis_columns(j), "ore": result.ores[o], "kind": "switch", first.label(): x,
+                         "strategy": result.names[new][0], "previous_strategy": result.names[old][0],
+                         "direction": ""})
+        for j, o, _, x, direction in best_even:
+            rows.append({**axis_columns(j), "ore": result.ores[o], "kind": "best_break_even", first.label(): x,
+                         "strategy": "", "previous_strategy": "", "direction": direction})
+        for j, o, s, x, direction in break_even:
+            rows.append({**axis_columns(j), "ore": result.ores[o], "kind": "break_even", first.label(): x,
+                         "strategy": result.names[s][0], "previous_strategy": "", "direction": direction})
+        pd.DataFrame(rows).to_csv(boundaries_file, index=False, encoding='utf-8-sig')
+        print(f"盈亏平衡与切换边界已保存至: {boundaries_file}")
+    return result
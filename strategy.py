@@ -1,10 +1,56 @@
-from config import MINING_RECIPES, CRAFTING_RECIPES, DISENCHANT_RESULTS
 from config import TAX_RATE, CRIT_RATE, MINING_TIME_PER_ORE
+from recipe_graph import get_recipe_graph
+from metrics import timed
+from money import to_copper, copper_to_gold
+
+
+def strategy_entry(profit_copper, strategy_type):
+    """策略收益条目：profit_copper 为取整后的铜币，profit 为对应金币（兼容旧字段）"""
+    profit_copper = to_copper(profit_copper)
+    return {"profit": copper_to_gold(profit_copper), "profit_copper": profit_copper, "type": strategy_type}
+
+
+def build_results(strategies, best_strategy_name, mining_profit_pct):
+    """由策略条目组合出矿石评估结果（各评估引擎共用，金额同时给出铜币与金币）"""
+    mining_profit_copper = strategies["纯炸矿"]["profit_copper"]
+    best_profit_copper = strategies[best_strategy_name]["profit_copper"]
+
+    # 提取最优策略的分解收益：策略利润 - 炸矿利润
+    disenchant_profit_copper = 0
+    if best_strategy_name != "纯炸矿":
+        disenchant_profit_copper = best_profit_copper - mining_profit_copper
+
+    return {
+        "mining_profit_g": copper_to_gold(mining_profit_copper),
+        "mining_profit_pct": mining_profit_pct,
+        "mining_hourly_g": copper_to_gold(mining_profit_copper),
+        "disenchant_profit_g": copper_to_gold(disenchant_profit_copper),
+        "disenchant_hourly_g": copper_to_gold(disenchant_profit_copper),  # 无时间消耗，所以等于总收益
+        "best_strategy": best_strategy_name,
+        "strategy_profit_g": copper_to_gold(best_profit_copper),
+        "mining_profit_copper": mining_profit_copper,
+        "disenchant_profit_copper": disenchant_profit_copper,
+        "strategy_profit_copper": best_profit_copper,
+        "all_strategies": strategies
+    }
+
+
+def best_strategy(strategies):
+    """按整数铜币比较，收益相同时取靠前的策略"""
+    best_strategy_name = "纯炸矿"
+    best_profit_copper = strategies["纯炸矿"]["profit_copper"]
+    for strategy_name, strategy_data in strategies.items():
+        if strategy_data["profit_copper"] > best_profit_copper:
+            best_strategy_name = strategy_name
+            best_profit_copper = strategy_data["profit_copper"]
+    return best_strategy_name
 
 
 class StrategyEvaluator:
-    def __init__(self, market_data):
+    def __init__(self, market_data, graph=None):
         self.market_data = market_data
+        # 编译后的配方图（共享）
+        self.graph = graph if graph is not None else get_recipe_graph()
         # 计算每小时最大制作次数
         self.max_crafts_per_hour = 720  # 3600/5=720
 
@@ -16,14 +62,19 @@ class StrategyEvaluator:
 
     def calculate_crafting_profit(self, recipe_name, material_quantities={}, max_crafts_limit=None):
         """计算制作+分解收益 - 修复成本计算"""
-        if recipe_name not in CRAFTING_RECIPES:
-            return 0.0, 0.0
+        disenchant_profit_g = self.crafting_profit_copper(recipe_name, material_quantities,
+                                                          max_crafts_limit) / 10000.0  # 转换为金币
+        return disenchant_profit_g, disenchant_profit_g  # 每小时收益=总收益（无时间消耗）
 
-        recipe = CRAFTING_RECIPES[recipe_name]
+    def crafting_profit_copper(self, recipe_name, material_quantities={}, max_crafts_limit=None):
+        """制作+分解净收益（铜币，未取整的期望值）"""
+        recipe = self.graph.recipes.get(recipe_name)
+        if recipe is None:
+            return 0.0
 
         # 计算可制作次数（受材料限制）
         max_craft = float('inf')
-        for material, needed in recipe['materials'].items():
+        for material, needed in recipe.materials:
             available = material_quantities.get(material, 0)
             # 避免除零错误
             if needed <= 0:
@@ -39,23 +90,21 @@ class StrategyEvaluator:
 
         # 计算分解收益（税后）
         disenchant_profit = 0.0
-        if recipe_name in DISENCHANT_RESULTS:
-            disenchant_results = DISENCHANT_RESULTS[recipe_name]
-            for material, quantity in disenchant_results.items():
-                if material in self.market_data:
-                    material_price = float(self.market_data[material].price)
-                    # 分解产物出售需扣税
-                    material_price_after_tax = self.calculate_after_tax(material_price)
-                    disenchant_profit += material_price_after_tax * quantity * expected_craft
+        for material, quantity in recipe.disenchant:
+            if material in self.market_data:
+                material_price = self.market_data[material].price
+                # 分解产物出售需扣税
+                material_price_after_tax = self.calculate_after_tax(material_price)
+                disenchant_profit += material_price_after_tax * quantity * expected_craft
 
-        # 减去制作成本（金币转换为铜币）
-        crafting_cost = recipe['cost'] * 10000 * max_craft
+        # 减去制作成本（配方图中已转换为铜币）
+        crafting_cost = recipe.cost * max_craft
 
         # 材料机会成本（正确计算采购成本）
         material_opportunity_cost = 0.0
-        for material, needed in recipe['materials'].items():
+        for material, needed in recipe.materials:
             if material in self.market_data:
-                material_price = float(self.market_data[material].price)
+                material_price = self.market_data[material].price
 
                 # 判断材料来源
                 is_purchased = True  # 默认视为采购
@@ -71,53 +120,63 @@ class StrategyEvaluator:
 
                 material_opportunity_cost += material_price_after_tax * needed * max_craft
 
-        # 净收益
-        net_disenchant_profit = disenchant_profit - crafting_cost - material_opportunity_cost
-        disenchant_profit_g = net_disenchant_profit / 10000.0  # 转换为金币
-
-        return disenchant_profit_g, disenchant_profit_g  # 每小时收益=总收益（无时间消耗）
+        # 净收益（铜币）
+        return disenchant_profit - crafting_cost - material_opportunity_cost
 
-    def evaluate_purchase_strategy(self, recipe_name):
-        """评估采购+制作策略 - 添加制作次数限制"""
-        # 假设可以无限采购材料
+    def purchase_quantities(self, recipe_name):
+        """采购+制作：假设可以无限采购材料"""
         material_quantities = {}
-        for material in CRAFTING_RECIPES[recipe_name]['materials']:
+        for material, _ in self.graph.recipes[recipe_name].materials:
             material_quantities[material] = float('inf')  # 无限供应
+        return material_quantities
 
-        return self.calculate_crafting_profit(recipe_name, material_quantities, self.max_crafts_per_hour)
-
-    def evaluate_hybrid_strategy(self, recipe_name, mining_materials):
-        """评估混合策略（炸矿材料+采购补充） - 添加制作次数限制"""
+    def hybrid_quantities(self, recipe_name, mining_materials):
+        """混合策略：炸矿材料 + 不足部分采购补充"""
         # 复制炸矿材料数据
         material_quantities = mining_materials.copy()
 
         # 对于配方中需要的材料，如果炸矿产出不足，假设可以采购补充
-        for material in CRAFTING_RECIPES[recipe_name]['materials']:
+        for material, _ in self.graph.recipes[recipe_name].materials:
             if material not in material_quantities:
                 material_quantities[material] = float('inf')  # 无限供应
+        return material_quantities
 
-        return self.calculate_crafting_profit(recipe_name, material_quantities, self.max_crafts_per_hour)
+    def evaluate_purchase_strategy(self, recipe_name):
+        """评估采购+制作策略 - 添加制作次数限制"""
+        return self.calculate_crafting_profit(recipe_name, self.purchase_quantities(recipe_name),
+                                              self.max_crafts_per_hour)
 
+    def evaluate_hybrid_strategy(self, recipe_name, mining_materials):
+        """评估混合策略（炸矿材料+采购补充） - 添加制作次数限制"""
+        return self.calculate_crafting_profit(recipe_name, self.hybrid_quantities(recipe_name, mining_materials),
+                                              self.max_crafts_per_hour)
+
+    def _relevant_recipes(self, ore_name, mining_results):
+        """与炸矿产出相关的配方：产出与配置一致时直接使用预计算的相关性集合"""
+        if not mining_results:
+            return ()
+        outputs = self.graph.ore_outputs.get(ore_name, ())
+        if len(outputs) == len(mining_results) and all(item in mining_results for item, _ in outputs):
+            return self.graph.relevant_recipes(ore_name)
+        return self.graph.recipes_using(mining_results)
+
+    @timed("evaluate_all_strategies")
     def evaluate_all_strategies(self, ore_name, mining_results):
         """评估所有策略 - 修复纯采购策略比较"""
         strategies = {}
 
-        # 1. 纯炸矿策略
+        # 1. 纯炸矿策略（铜币）
         mining_profit = 0.0
-        ore_price = 0.0
+        ore_price = 0
 
         # 获取矿石价格
         if ore_name in self.market_data:
-            ore_price = float(self.market_data[ore_name].price)
-
-        # 计算炸矿成本
-        mining_cost = 0.0
+            ore_price = self.market_data[ore_name].price
 
         # 计算炸矿收益（税后）
         for item, quantity in mining_results.items():
             if item in self.market_data:
-                item_price = float(self.market_data[item].price)
-                item_price_after_tax = self.calculate_after_tax(item_price)
+                item_price_after_tax = self.calculate_after_tax(self.market_data[item].price)
                 mining_profit += item_price_after_tax * quantity
 
         # 计算矿石成本（每小时）
@@ -126,56 +185,25 @@ class StrategyEvaluator:
 
         # 炸矿净收益
         net_mining_profit = mining_profit - mining_cost
-        mining_profit_g = net_mining_profit / 10000.0
-
-        strategies["纯炸矿"] = {
-            "profit": mining_profit_g,
-            "type": "mining"
-        }
-
-        # 2. 炸矿+制作策略
-        for recipe_name in CRAFTING_RECIPES:
-            # 检查配方是否使用该矿石的产出材料
-            recipe_materials = CRAFTING_RECIPES[recipe_name]['materials']
-            if any(material in mining_results for material in recipe_materials):
-                # 2a. 仅使用炸矿材料
-                profit_g, _ = self.calculate_crafting_profit(recipe_name, mining_results, self.max_crafts_per_hour)
-                strategy_name = f"炸矿+制作{recipe_name}"
-                strategies[strategy_name] = {
-                    "profit": mining_profit_g + profit_g,
-                    "type": "crafting"
-                }
-
-                # 2b. 混合策略（炸矿材料+采购补充）
-                hybrid_profit_g, _ = self.evaluate_hybrid_strategy(recipe_name, mining_results)
-                hybrid_strategy_name = f"混合+制作{recipe_name}"
-                strategies[hybrid_strategy_name] = {
-                    "profit": mining_profit_g + hybrid_profit_g,
-                    "type": "hybrid"
-                }
+        strategies["纯炸矿"] = strategy_entry(net_mining_profit, "mining")
+
+        # 2. 炸矿+制作策略（只遍历使用该矿石产出材料的配方，由配方图索引给出）
+        for recipe_name in self._relevant_recipes(ore_name, mining_results):
+            # 2a. 仅使用炸矿材料
+            profit = self.crafting_profit_copper(recipe_name, mining_results, self.max_crafts_per_hour)
+            strategies[f"炸矿+制作{recipe_name}"] = strategy_entry(net_mining_profit + profit, "crafting")
+
+            # 2b. 混合策略（炸矿材料+采购补充）
+            hybrid_profit = self.crafting_profit_copper(recipe_name, self.hybrid_quantities(recipe_name, mining_results),
+                                                        self.max_crafts_per_hour)
+            strategies[f"混合+制作{recipe_name}"] = strategy_entry(net_mining_profit + hybrid_profit, "hybrid")
 
         # 3. 纯采购+制作策略（独立于炸矿）
-        for recipe_name in CRAFTING_RECIPES:
-            profit_g, _ = self.evaluate_purchase_strategy(recipe_name)
-            strategy_name = f"采购+制作{recipe_name}"
-            strategies[strategy_name] = {
-                "profit": profit_g,  # 纯采购策略不依赖炸矿收益
-                "type": "purchase"
-            }
-
-        # 寻找最优策略
-        best_strategy_name = "纯炸矿"
-        best_profit = mining_profit_g
-
-        for strategy_name, strategy_data in strategies.items():
-            # 纯采购策略独立比较
-            if strategy_data["type"] == "purchase":
-                if strategy_data["profit"] > best_profit:
-                    best_strategy_name = strategy_name
-                    best_profit = strategy_data["profit"]
-            # 其他策略基于炸矿收益
-            elif strategy_data["profit"] > best_profit:
-                best_strategy_name = strategy_name
-                best_profit = strategy_data["profit"]
-
-        return strategies, best_strategy_name, best_profit
\ No newline at end of file
+        for recipe_name in self.graph.recipe_names:
+            profit = self.crafting_profit_copper(recipe_name, self.purchase_quantities(recipe_name),
+                                                 self.max_crafts_per_hour)
+            strategies[f"采购+制作{recipe_name}"] = strategy_entry(profit, "purchase")
+
+        # 寻找最优策略（按整数铜币比较）
+        best_strategy_name = best_strategy(strategies)
+        return strategies, best_strategy_name, strategies[best_strategy_name]["profit"]
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+from io import StringIO
+from config import HISTORY_DIR, HISTORY_BACKEND
+from money import parse_gold, copper_to_gold, strategy_copper
+
+# 每个 (天, 矿石, 策略) 的聚合：
+# [次数, 总收益之和, 总收益平方和, 最小值, 最大值, 最新时间, 最新收益, 炸矿收益之和, 分解收益之和]
+# 金额均为整数铜币，和与平方和精确，任意天数窗口的均值/标准差都由各天聚合合并得到
+COUNT, SUM, SUMSQ, MIN, MAX, LAST_TIME, LAST, MINING_SUM, DISENCHANT_SUM = range(9)
+
+
+def _new_aggregate(timestamp, total, mining, disenchant):
+    return [1, total, total * total, total, total, timestamp, total, mining, disenchant]
+
+
+def _add(aggregate, timestamp, total, mining, disenchant):
+    aggregate[COUNT] += 1
+    aggregate[SUM] += total
+    aggregate[SUMSQ] += total * total
+    aggregate[MIN] = min(aggregate[MIN], total)
+    aggregate[MAX] = max(aggregate[MAX], total)
+    if timestamp >= aggregate[LAST_TIME]:
+        aggregate[LAST_TIME] = timestamp
+        aggregate[LAST] = total
+    aggregate[MINING_SUM] += mining
+    aggregate[DISENCHANT_SUM] += disenchant
+
+
+def _merge(target, aggregate):
+    if target is None:
+        return list(aggregate)
+    target[COUNT] += aggregate[COUNT]
+    target[SUM] += aggregate[SUM]
+    target[SUMSQ] += aggregate[SUMSQ]
+    target[MIN] = min(target[MIN], aggregate[MIN])
+    target[MAX] = max(target[MAX], aggregate[MAX])
+    if aggregate[LAST_TIME] >= target[LAST_TIME]:
+        target[LAST_TIME] = aggregate[LAST_TIME]
+        target[LAST] = aggregate[LAST]
+    target[MINING_SUM] += aggregate[MINING_SUM]
+    target[DISENCHANT_SUM] += aggregate[DISENCHANT_SUM]
+    return target
+
+
+class StrategyAggregates:
+    """按 (天, 矿石, 策略) 持久化的策略收益聚合
+
+    record_all_strategies 写入历史时同步更新；策略报告直接合并窗口内各天的聚合，
+    不再读取整个策略历史。aggregates/<YYYY-MM-DD>.json 保存每天的聚合，
+    state.json 记录已聚合到的历史位置（CSV 字节偏移 / 列式记录键），
+    历史被其他途径追加时按该位置补齐，CSV 被重写（变小）时重建。
+    """
+
+    def __init__(self, history_dir=None, backend=None):
+        self.history_dir = history_dir or HISTORY_DIR
+        self.backend = backend or HISTORY_BACKEND
+        self.directory = os.path.join(self.history_dir, "aggregates")
+        self.days = {}  # {天: {矿石: {策略: 聚合}}}，按需从磁盘加载
+        self.state = None
+
+    # ---- 持久化 ----
+
+    def _state_path(self):
+        return os.path.join(self.directory, "state.json")
+
+    def _load_state(self):
+        if self.state is None:
+            self.state = {"csv_size": 0, "store_key": None}
+            if os.path.isfile(self._state_path()):
+                with open(self._state_path(), encoding='utf-8') as f:
+                    self.state.update(json.load(f))
+        return self.state
+
+    def _day(self, day):
+        aggregates = self.days.get(day)
+        if aggregates is None:
+            aggregates = {}
+            path = os.path.join(self.directory, f"{day}.json")
+            if os.path.isfile(path):
+                with open(path, encoding='utf-8') as f:
+                    aggregates = json.load(f)
+            self.days[day] = aggregates
+        return aggregates
+
+    def _write_json(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _save(self, days):
+        for day in days:
+            self._write_json(os.path.join(self.directory, f"{day}.json"), self.days[day])
+        self._write_json(self._state_path(), self.state)
+
+    # ---- 更新 ----
+
+    def _apply(self, rows):
+        """rows: [(时间字符串, 矿石, 策略, 炸矿, 分解, 总收益)]（铜币），返回涉及的天"""
+        touched = set()
+        for timestamp, ore_name, strategy_name, mining, disenchant, total in rows:
+            day = timestamp[:10]
+            strategies = self._day(day).setdefault(ore_name, {})
+            aggregate = strategies.get(strategy_name)
+            if aggregate is None:
+                strategies[strategy_name] = _new_aggregate(timestamp, total, mining, disenchant)
+            else:
+                _add(aggregate, timestamp, total, mining, disenchant)
+            touched.add(day)
+        return touched
+
+    def record(self, timestamp, strategies_by_ore, position=None):
+        """记录一次评估的所有策略 {矿石: {策略: 数据}}（在写入历史之后调用）
+
+        position: CSV 为本次写入的 (起始, 结束) 字节偏移，列式存储为记录键。
+        与已聚合位置衔接时直接累加，否则从历史补齐（补齐时已包含本次写入）。
+        """
+        state = self._load_state()
+        if self.backend == "columnar":
+            # 只有同一天中紧接已聚合记录的下一条才直接累加，跨天或中间有未聚合的记录时从存储补齐
+            from history_store import next_key
+            last_key = state["store_key"]
+            in_order = position is not None and last_key is not None and position == next_key(last_key)
+        else:
+            in_order = position is not None and position[0] == state["csv_size"]
+        if not in_order:
+            self.catch_up()
+            return
+
+        ts = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(ts, ore_name, strategy_name,
+                 strategy_copper(data, "mining_profit"), strategy_copper(data, "disenchant_profit"),
+                 strategy_copper(data, "profit"))
+                for ore_name, all_strategies in strategies_by_ore.items()
+                for strategy_name, data in all_strategies.items()]
+        touched = self._apply(rows)
+        if self.backend == "columnar":
+            state["store_key"] = position
+        else:
+            state["csv_size"] = position[1]
+        self._save(touched)
+
+    def catch_up(self):
+        """将历史中尚未聚合的部分补入聚合"""
+        state = self._load_state()
+        if self.backend == "columnar":
+            touched = self._catch_up_store(state)
+        else:
+            touched = self._catch_up_csv(state)
+        if touched is not None:
+            self._save(touched)
+
+    def _catch_up_csv(self, state):
+        path = os.path.join(self.history_dir, "strategy_history.csv")
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        if size == state["csv_size"]:
+            return None
+        if size < state["csv_size"]:
+            # 历史文件被重写，重新聚合
+            self.clear()
+            state = self._load_state()
+
+        with open(path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+            f.seek(max(state["csv_size"], f.tell()))
+            data = f.read(size - f.tell())
+        # 只处理完整的行，未写完的最后一行留到下次
+        complete = data.rfind(b"\n") + 1
+        columns = {name: i for i, name in enumerate(header)}
+
+        rows = []
+        for row in csv.reader(StringIO(data[:complete].decode('utf-8'))):
+            if len(row) < len(header):
+                continue
+            rows.append((row[columns["timestamp"]], row[columns["ore"]], row[columns["strategy"]],
+                         parse_gold(row[columns["mining_profit_g"]]),
+                         parse_gold(row[columns["disenchant_profit_g"]]),
+                         parse_gold(row[columns["total_profit_g"]])))
+        touched = self._apply(rows)
+        state["csv_size"] = size - len(data) + complete
+        return touched
+
+    def _catch_up_store(self, state):
+        import history_store
+
+        touched = None
+        for key, us, columns in history_store._iter_records("strategy", after=state["store_key"]):
+            ts = history_store._to_datetime(us).strftime("%Y-%m-%d %H:%M:%S")
+            rows = [(ts, ore_name, strategy_name, int(mining), int(disenchant), int(total))
+                    for ore_name, strategy_name, mining, disenchant, total in
+                    zip(columns["ore"], columns["strategy"], columns["mining_profit"],
+                        columns["disenchant_profit"], columns["total_profit"])]
+            touched = (touched or set()) | self._apply(rows)
+            state["store_key"] = key
+        return touched
+
+    def truncated(self, removed):
+        """策略历史文件头部被裁剪 removed 字节后调整已聚合位置（裁剪前应先 catch_up）"""
+        state = self._load_state()
+        if self.backend == "columnar" or not removed:
+            return
+        state["csv_size"] = max(state["csv_size"] - removed, 0)
+        self._write_json(self._state_path(), state)
+
+    def clear(self):
+        """删除全部聚合"""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+        self.days = {}
+        self.state = None
+
+    def rebuild(self):
+        """从策略历史重新生成全部聚合"""
+        self.clear()
+        self.catch_up()
+        print(f"已重建策略聚合: {len(self._stored_days())} 天")
+
+    # ---- 查询 ----
+
+    def _stored_days(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith(".json") and name != "state.json")
+
+    def summary(self, start_day=None, end_day=None, ore_name=None):
+        """合并 [start_day, end_day] 内各天的聚合，返回 {策略: 聚合}"""
+        self.catch_up()
+        merged = {}
+        for day in self._stored_days():
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            for ore, strategies in self._day(day).items():
+                if ore_name and ore != ore_name:
+                    continue
+                for strategy_name, aggregate in strategies.items():
+                    merged[strategy_name] = _merge(merged.get(strategy_name), aggregate)
+        return merged
+
+
+def report_row(strategy_name, aggregate):
+    """聚合转为策略报告的一行（金币）"""
+    n, total = aggregate[COUNT], aggregate[SUM]
+    std_dev = float('nan')
+    if n > 1:
+        std_dev = (max(n * aggregate[SUMSQ] - total * total, 0) / (n * (n - 1))) ** 0.5 / 10000.0
+    return {
+        "strategy": strategy_name,
+        "count": n,
+        "avg_profit": copper_to_gold(total / n),
+        "min_profit": copper_to_gold(aggregate[MIN]),
+        "max_profit": copper_to_gold(aggregate[MAX]),
+        "std_dev": std_dev,
+        "avg_mining": copper_to_gold(aggregate[MINING_SUM] / n),
+        "avg_disenchant": copper_to_gold(aggregate[DISENCHANT_SUM] / n),
+        "last_profit": copper_to_gold(aggregate[LAST])
+    }
+
+
+_default_aggregates = None
+
+
+def get_strategy_aggregates():
+    """获取当前历史目录的策略聚合（历史目录或存储后端改变时重新创建）"""
+    global _default_aggregates
+    if (_default_aggregates is None or _default_aggregates.history_dir != HISTORY_DIR
+            or _default_aggregates.backend != HISTORY_BACKEND):
+        _default_aggregates = StrategyAggregates()
+    return _default_aggregates
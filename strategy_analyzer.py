@@ -1,97 +1,34 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
-import numpy as np
 from datetime import datetime, timedelta
-from config import HISTORY_DIR, BASE_DIR
-import matplotlib as mpl
-import matplotlib.font_manager as fm
+from config import HISTORY_DIR
+from font_resolver import setup_fonts
+from rollups import read_strategy_history
+from strategy_aggregates import get_strategy_aggregates, report_row
 import warnings
 
 # 忽略警告
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
-# 设置中文字体支持
-def set_chinese_font():
-    try:
-        # 尝试使用系统字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False  # 正确显示负号
-
-        # 检查字体是否可用
-        available_fonts = [f.name for f in fm.fontManager.ttflist]
-        chinese_fonts = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
-
-        # 如果没有找到中文字体，尝试使用内置字体
-        if not any(font in available_fonts for font in chinese_fonts):
-            # 使用内置的WenQuanYi Micro Hei字体
-            plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei']
-
-            # 如果仍然不可用，尝试下载并注册字体
-            if 'WenQuanYi Micro Hei' not in available_fonts:
-                try:
-                    import os
-                    from urllib.request import urlretrieve
-
-                    # 下载字体文件
-                    font_url = "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/SimplifiedChinese/NotoSansCJKsc-Regular.otf"
-                    font_path = os.path.join(BASE_DIR, "NotoSansCJKsc-Regular.otf")
-
-                    if not os.path.exists(font_path):
-                        print("下载中文字体文件...")
-                        urlretrieve(font_url, font_path)
-
-                    # 注册字体
-                    font_prop = fm.FontProperties(fname=font_path)
-                    fm.fontManager.addfont(font_path)
-                    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-                    print(f"已注册字体: {font_prop.get_name()}")
-                except Exception as e:
-                    print(f"字体下载失败: {e}")
-                    # 回退到默认字体
-                    plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
-    except Exception as e:
-        print(f"设置中文字体失败: {e}")
-
-
-# 初始化字体设置
-set_chinese_font()
-
-
-def load_strategy_history():
-    """加载策略历史数据"""
-    strategy_history_path = os.path.join(HISTORY_DIR, "strategy_history.csv")
-    if not os.path.exists(strategy_history_path):
+def _strategy_history(days, strategies, ore_name, source=None):
+    """读取最近N天、指定策略（及矿石）的数据（按天数自动选择分钟/小时/天数据；批量渲染时由数据源提供，只读取一次）"""
+    if source is not None:
+        return source.strategy_history(days, strategies, ore_name)
+    if not os.path.exists(os.path.join(HISTORY_DIR, "strategy_history.csv")):
         print("找不到策略历史文件")
         return pd.DataFrame()
-
     try:
-        df = pd.read_csv(strategy_history_path, parse_dates=['timestamp'])
-        return df
+        return read_strategy_history(days, strategies, ore_name, HISTORY_DIR)
     except Exception as e:
         print(f"加载策略历史数据出错: {e}")
         return pd.DataFrame()
 
 
-def generate_strategy_trend(strategy_name, ore_name=None, days=30, output_file="strategy_trend.png"):
+def generate_strategy_trend(strategy_name, ore_name=None, days=30, output_file="strategy_trend.png", source=None):
     """生成策略收益趋势图"""
-    df = load_strategy_history()
-    if df.empty:
-        return
-
-    # 过滤数据
-    strategy_df = df[df['strategy'] == strategy_name]
-    if ore_name:
-        strategy_df = strategy_df[strategy_df['ore'] == ore_name]
-
-    if strategy_df.empty:
-        print(f"找不到策略 '{strategy_name}' 的历史数据")
-        return
-
-    # 过滤最近N天的数据
-    cutoff_date = datetime.now() - timedelta(days=days)
-    strategy_df = strategy_df[strategy_df['timestamp'] >= cutoff_date]
+    # 只读取最近N天、该策略（及矿石）的数据
+    strategy_df = _strategy_history(days, [strategy_name], ore_name, source)
 
     if strategy_df.empty:
         print(f"策略 '{strategy_name}' 最近 {days} 天没有数据")
@@ -100,6 +37,9 @@ def generate_strategy_trend(strategy_name, ore_name=None, days=30, output_file="
     # 按时间排序
     strategy_df = strategy_df.sort_values('timestamp')
 
+    import matplotlib.pyplot as plt
+    setup_fonts()
+
     # 创建图表
     plt.figure(figsize=(14, 8))
 
@@ -127,24 +67,18 @@ def generate_strategy_trend(strategy_name, ore_name=None, days=30, output_file="
     plt.close()
 
 
-def compare_strategies(strategy_names, ore_name=None, days=30, output_file="strategy_comparison.png"):
+def compare_strategies(strategy_names, ore_name=None, days=30, output_file="strategy_comparison.png", source=None):
     """比较多个策略的收益"""
-    df = load_strategy_history()
-    if df.empty:
-        return
-
-    # 过滤数据
-    if ore_name:
-        df = df[df['ore'] == ore_name]
-
-    # 过滤最近N天的数据
-    cutoff_date = datetime.now() - timedelta(days=days)
-    df = df[df['timestamp'] >= cutoff_date]
+    # 只读取最近N天、所选策略（及矿石）的数据
+    df = _strategy_history(days, strategy_names, ore_name, source)
 
     if df.empty:
         print(f"最近 {days} 天没有策略数据")
         return
 
+    import matplotlib.pyplot as plt
+    setup_fonts()
+
     # 创建图表
     plt.figure(figsize=(14, 8))
 
@@ -171,43 +105,17 @@ def compare_strategies(strategy_names, ore_name=None, days=30, output_file="stra
 
 
 def generate_strategy_report(ore_name=None, days=30, output_file="strategy_report.csv"):
-    """生成策略表现报告"""
-    df = load_strategy_history()
-    if df.empty:
-        return None
-
-    # 过滤数据
-    if ore_name:
-        df = df[df['ore'] == ore_name]
-
-    # 过滤最近N天的数据
+    """生成策略表现报告（由按天的策略聚合合并得到，窗口按天对齐，包含截止时间当天）"""
     cutoff_date = datetime.now() - timedelta(days=days)
-    df = df[df['timestamp'] >= cutoff_date]
+    aggregates = get_strategy_aggregates().summary(start_day=cutoff_date.strftime("%Y-%m-%d"),
+                                                   ore_name=ore_name)
 
-    if df.empty:
+    if not aggregates:
         print(f"最近 {days} 天没有策略数据")
         return None
 
-    # 计算每个策略的统计指标
-    report_data = []
-    for strategy, group in df.groupby('strategy'):
-        report_data.append({
-            "strategy": strategy,
-            "count": len(group),
-            "avg_profit": group['total_profit_g'].mean(),
-            "min_profit": group['total_profit_g'].min(),
-            "max_profit": group['total_profit_g'].max(),
-            "std_dev": group['total_profit_g'].std(),
-            "avg_mining": group['mining_profit_g'].mean(),
-            "avg_disenchant": group['disenchant_profit_g'].mean(),
-            "last_profit": group.sort_values('timestamp', ascending=False).iloc[0]['total_profit_g']
-        })
-
-    # 创建DataFrame并排序
-    report_df = pd.DataFrame(report_data)
-    if report_df.empty:
-        return None
-
+    # 每个策略只需合并各天的计数、和、平方和、最值与最新值
+    report_df = pd.DataFrame([report_row(strategy, aggregate) for strategy, aggregate in aggregates.items()])
     report_df = report_df.sort_values('avg_profit', ascending=False)
 
     # 保存报告
@@ -217,13 +125,13 @@ def generate_strategy_report(ore_name=None, days=30, output_file="strategy_repor
     return report_df
 
 
-def analyze_strategy_performance(strategy_name, ore_name=None, days=90):
+def analyze_strategy_performance(strategy_name, ore_name=None, days=90, source=None):
     """分析策略表现并生成报告"""
     # 生成趋势图
     trend_file = f"{strategy_name}_trend.png"
-    generate_strategy_trend(strategy_name, ore_name, days, trend_file)
+    generate_strategy_trend(strategy_name, ore_name, days, trend_file, source)
 
-    # 生成详细报告
+    # 生成详细报告（来自按天聚合，不再重复读取策略历史）
     report_file = f"{strategy_name}_report.csv"
     report_df = generate_strategy_report(ore_name, days, report_file)
 
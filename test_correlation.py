@@ -0,0 +1,63 @@
+import os
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from correlation import analyze_correlations, correlation_matrix, rolling_correlation
+
+NOW = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+
+def _write_items(directory, days=10, freq="30min", n_items=4, seed=0):
+    """物品历史：一个公共随机游走因子加各自的噪声，部分时段缺失"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(pd.Timestamp(NOW) - pd.Timedelta(days=days), NOW, freq=freq)
+    factor = np.cumsum(rng.normal(0, 1, len(times)))
+    os.makedirs(os.path.join(directory, "items"))
+    for i in range(n_items):
+        prices = 100 + (i + 1) * factor + rng.normal(0, 2, len(times))
+        keep = rng.random(len(times)) > 0.1
+        pd.DataFrame({"timestamp": times[keep].strftime("%Y-%m-%d %H:%M:%S"), "price_g": prices[keep].round(4),
+                      "available": 1}).to_csv(os.path.join(directory, "items", f"物品{i}.csv"), index=False)
+
+
+def test_matrix_and_rolling_match_pandas():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=(200, 5)).cumsum(axis=0)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    corr, samples = correlation_matrix(values, min_periods=20)
+    frame = pd.DataFrame(values)
+    assert np.allclose(corr, frame.corr(min_periods=20).to_numpy(), atol=1e-10, equal_nan=True)
+    assert (samples == frame.notna().astype(int).T.dot(frame.notna().astype(int)).to_numpy()).all()
+
+    rolling = rolling_correlation(values, np.array([0, 1]), np.array([2, 3]), window=30, min_periods=10)
+    expected = np.column_stack([frame[0].rolling(30, min_periods=10).corr(frame[2]),
+                                frame[1].rolling(30, min_periods=10).corr(frame[3])])[29:]
+    assert np.allclose(rolling, expected, atol=1e-8, equal_nan=True)
+
+
+def test_top_pairs_with_fewer_grid_points_than_window():
+    with tempfile.TemporaryDirectory() as directory:
+        _write_items(directory)
+        # --days 10 --freq 6h：41 个网格点足够计算相关，但少于默认的 48 点窗口
+        analysis = analyze_correlations(days=10, freq="6h", history_dir=directory, now=NOW)
+        assert 20 <= len(analysis.grid) < 48
+        pairs, series = analysis.top_pairs(top=3, window=48)
+        assert len(pairs) == 3 and pairs["correlation"].notna().all()
+        assert pairs[["rolling_mean", "rolling_min", "rolling_max", "rolling_last"]].isna().all().all()
+        assert series.empty and list(series.columns) == [f"{a}|{b}" for a, b in zip(pairs.item1, pairs.item2)]
+
+        # 窗口不超过网格点数时照常计算
+        pairs, series = analysis.top_pairs(top=3, window=10)
+        assert len(series) == len(analysis.grid) - 9
+        assert pairs["rolling_last"].notna().all()
+
+        # --days 10 --freq D：网格点数连最小样本数都不够，没有物品对但不报错
+        pairs, series = analyze_correlations(days=10, freq="D", history_dir=directory, now=NOW).top_pairs(3, 48)
+        assert pairs.empty and series.empty
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
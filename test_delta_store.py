@@ -0,0 +1,109 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from delta_store import DeltaStore
+from market_snapshot import MarketSnapshot
+
+
+def _snapshots(n=120, seed=0):
+    """每 23 分钟一个快照（跨多天）：每次少数物品变价，偶尔有物品下架或新上架"""
+    rng = np.random.default_rng(seed)
+    names = [f"物品{i}" for i in range(40)]
+    prices = rng.integers(100, 10 ** 7, len(names))
+    available = rng.integers(0, 1000, len(names))
+    present = rng.random(len(names)) > 0.2
+    start = datetime(2025, 8, 1, 9, 0)
+    for k in range(n):
+        changed = rng.random(len(names)) < 0.15
+        prices = np.where(changed, rng.integers(100, 10 ** 7, len(names)), prices)
+        available = np.where(changed, rng.integers(0, 1000, len(names)), available)
+        present ^= rng.random(len(names)) < 0.05
+        rows = np.flatnonzero(present)
+        yield start + timedelta(minutes=23 * k), MarketSnapshot.from_columns(
+            [names[i] for i in rows], prices[rows], available[rows])
+
+
+def _history_frame(written):
+    return pd.DataFrame([(timestamp, name, item.price / 10000.0, item.available)
+                         for timestamp, snapshot in written for name, item in snapshot.items()],
+                        columns=["timestamp", "item", "price_g", "available"])
+
+
+def test_round_trip_and_point_lookups():
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeltaStore(directory, keyframe_interval=5)
+        written = list(_snapshots())
+        for timestamp, snapshot in written:
+            store.write(snapshot, timestamp)
+        assert len(store.days()) == 3
+
+        # 重新打开（不共享写入状态）后完整重建
+        reader = DeltaStore(directory)
+        restored = list(reader.iter_snapshots())
+        assert [t for t, _ in restored] == [t for t, _ in written]
+        assert all(a == b for (_, a), (_, b) in zip(restored, written))
+
+        # 从中间的关键帧开始读取一个范围
+        start, end = written[37][0] + timedelta(seconds=1), written[90][0]
+        assert [t for t, _ in reader.iter_snapshots(start, end)] == [t for t, _ in written[38:91]]
+
+        # 任意时间点取不晚于它的最近快照（包括跨天与第一个快照之前）
+        assert reader.snapshot_at(written[0][0] - timedelta(minutes=1)) is None
+        for k in (0, 4, 5, 6, 61, 62, 119):
+            timestamp, snapshot = reader.snapshot_at(written[k][0] + timedelta(minutes=10))
+            assert timestamp == written[k][0] and snapshot == written[k][1]
+
+        df = reader.load_market_history()
+        expected = _history_frame(written)
+        key = ["timestamp", "item"]
+        pd.testing.assert_frame_equal(df.sort_values(key).reset_index(drop=True),
+                                      expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+def test_restart_after_torn_write():
+    with tempfile.TemporaryDirectory() as directory:
+        written = list(_snapshots(n=30, seed=1))
+        store = DeltaStore(directory, keyframe_interval=7)
+        for timestamp, snapshot in written[:20]:
+            store.write(snapshot, timestamp)
+
+        # 模拟进程在写一条记录时中断，重启后继续写入
+        data_path, _ = store._paths(written[19][0].strftime("%Y-%m-%d"))
+        with open(data_path, 'ab') as f:
+            f.write(b"\x01\x02\x03")
+        store = DeltaStore(directory, keyframe_interval=7)
+        for timestamp, snapshot in written[20:]:
+            store.write(snapshot, timestamp)
+
+        restored = list(DeltaStore(directory).iter_snapshots())
+        assert len(restored) == len(written)
+        assert all(a == b for (_, a), (_, b) in zip(restored, written))
+
+
+def test_export_csv_is_incremental():
+    with tempfile.TemporaryDirectory() as directory:
+        written = list(_snapshots(n=20, seed=2))
+        store = DeltaStore(os.path.join(directory, "delta"), keyframe_interval=4)
+        output = os.path.join(directory, "export")
+        for timestamp, snapshot in written[:12]:
+            store.write(snapshot, timestamp)
+        assert store.export_csv(output) == 12
+        for timestamp, snapshot in written[12:]:
+            store.write(snapshot, timestamp)
+        assert store.export_csv(output) == 8
+        assert store.export_csv(output) == 0
+
+        df = pd.read_csv(os.path.join(output, "full_history.csv"), parse_dates=["timestamp"])
+        expected = _history_frame(written)
+        key = ["timestamp", "item"]
+        pd.testing.assert_frame_equal(df.sort_values(key).reset_index(drop=True),
+                                      expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
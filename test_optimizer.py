@@ -0,0 +1,67 @@
+import numpy as np
+from market_snapshot import MarketSnapshot
+from optimizer import StrategyOptimizer, simplex
+from recipe_graph import get_recipe_graph
+
+
+def _snapshots(graph, n=40, seed=0):
+    """随机市场快照：价格随机游走，部分物品偶尔缺失，可购买数量随机"""
+    rng = np.random.default_rng(seed)
+    items = list(graph.items)
+    prices = rng.integers(1000, 2000000, len(items)).astype(float)
+    for _ in range(n):
+        prices = np.maximum(prices * rng.lognormal(0.0, 0.1, len(items)), 1.0)
+        present = rng.random(len(items)) > 0.1
+        available = rng.integers(0, 5000, len(items))
+        names = [name for name, keep in zip(items, present) if keep]
+        yield MarketSnapshot.from_columns(names, np.rint(prices[present]), available[present])
+
+
+def test_warm_start_matches_cold_start():
+    graph = get_recipe_graph()
+    warm = StrategyOptimizer(graph)
+    cold = StrategyOptimizer(graph)
+    for market_data in _snapshots(graph):
+        warm_plan = warm.optimize(market_data, warm_start=True)
+        cold_plan = cold.optimize(market_data, warm_start=False)
+        assert abs(warm_plan["profit_copper"] - cold_plan["profit_copper"]) <= 1
+
+
+def test_solution_is_feasible():
+    graph = get_recipe_graph()
+    optimizer = StrategyOptimizer(graph)
+    for market_data in _snapshots(graph, n=10, seed=1):
+        prices = np.array([market_data[name].price if name in market_data else 0 for name in optimizer.items],
+                          dtype=float)
+        available = np.array([market_data[name].available if name in market_data else 0
+                              for name in optimizer.items], dtype=float)
+        b = np.concatenate([np.zeros(len(optimizer.items)),
+                            [optimizer.mining_seconds, optimizer.crafting_seconds], available])
+        x, profit, _, _ = simplex(optimizer._objective(prices), optimizer.A, b)
+        assert (optimizer.A @ x <= b + 1e-6 * np.maximum(1.0, b)).all()
+        assert np.isclose(profit, optimizer._objective(prices) @ x)
+
+
+def test_degenerate_cycling_example_terminates():
+    # Beale 的循环示例：按最大检验数选入基变量且不处理退化时会无限循环，最优值为 1/20
+    c = np.array([0.75, -150.0, 0.02, -6.0])
+    A = np.array([[0.25, -60.0, -0.04, 9.0],
+                  [0.5, -90.0, -0.02, 3.0],
+                  [0.0, 0.0, 1.0, 0.0]])
+    b = np.array([0.0, 0.0, 1.0])
+    x, profit, basis, _ = simplex(c, A, b)
+    assert np.isclose(profit, 0.05) and np.allclose(x, [0.04, 0.0, 1.0, 0.0])
+    assert (A @ x <= b + 1e-9).all() and (x >= 0).all()
+
+    # 从最优基热启动不需换基；右端项按比例放大时原最优基仍可行，最优值同比放大
+    _, warm_profit, _, iterations = simplex(c, A, b, basis)
+    assert np.isclose(warm_profit, 0.05) and iterations == 0
+    _, scaled_profit, _, _ = simplex(c, A, b * 2, basis)
+    assert np.isclose(scaled_profit, 0.1)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
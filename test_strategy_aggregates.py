@@ -0,0 +1,109 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import history_store
+from history_recorder import _strategy_row, _append_strategy_rows
+from history_writer import GroupCommit
+from strategy_aggregates import StrategyAggregates, report_row
+
+ORES = ["铜矿石", "铁矿石"]
+STRATEGIES = ["纯炸矿", "炸矿+制作A", "炸矿+制作B"]
+
+
+def _evaluations(n=300, seed=0):
+    """约每 37 分钟一次评估（跨多天），收益为整数铜币"""
+    rng = random.Random(seed)
+    start = datetime(2025, 8, 1, 3, 0)
+    for i in range(n):
+        strategies_by_ore = {}
+        for ore_name in ORES:
+            strategies = {}
+            for name in STRATEGIES:
+                mining = rng.randint(-10 ** 6, 10 ** 6)
+                disenchant = rng.randint(0, 10 ** 5)
+                strategies[name] = {"mining_profit_copper": mining, "disenchant_profit_copper": disenchant,
+                                    "profit_copper": mining + disenchant, "type": "crafting"}
+            strategies_by_ore[ore_name] = strategies
+        yield start + timedelta(minutes=37 * i), strategies_by_ore
+
+
+def _expected(history, start_day=None, ore_name=None):
+    """用 pandas 分组直接从完整策略历史计算报告"""
+    df = history.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if start_day:
+        df = df[df["timestamp"] >= pd.Timestamp(start_day)]
+    if ore_name:
+        df = df[df["ore"] == ore_name]
+    df = df.sort_values("timestamp", kind="stable")
+    grouped = df.groupby("strategy")
+    return pd.DataFrame({
+        "count": grouped["total_profit_g"].count(),
+        "avg_profit": grouped["total_profit_g"].mean(),
+        "min_profit": grouped["total_profit_g"].min(),
+        "max_profit": grouped["total_profit_g"].max(),
+        "std_dev": grouped["total_profit_g"].std(),
+        "avg_mining": grouped["mining_profit_g"].mean(),
+        "avg_disenchant": grouped["disenchant_profit_g"].mean(),
+        "last_profit": grouped["total_profit_g"].last(),
+    })
+
+
+def _check(aggregates, history):
+    for start_day, ore_name in [(None, None), ("2025-08-03", None), ("2025-08-05", "铁矿石")]:
+        summary = aggregates.summary(start_day=start_day, ore_name=ore_name)
+        report = pd.DataFrame([report_row(name, a) for name, a in summary.items()]).set_index("strategy")
+        expected = _expected(history, start_day, ore_name)
+        report = report.loc[expected.index, expected.columns]
+        assert (report["count"] == expected["count"]).all()
+        assert np.allclose(report.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-9, atol=1e-9)
+
+
+def test_csv_aggregates_match_groupby():
+    with tempfile.TemporaryDirectory() as directory:
+        aggregates = StrategyAggregates(directory, "csv")
+        for i, (timestamp, strategies_by_ore) in enumerate(_evaluations()):
+            batch = GroupCommit(sync=False)
+            for ore_name, strategies in strategies_by_ore.items():
+                rows = [_strategy_row(timestamp, ore_name, name, data) for name, data in strategies.items()]
+                position = _append_strategy_rows(batch, rows, directory)
+                batch.close()
+                # 每隔几次不记录聚合，模拟由其他途径追加的历史（之后按位置补齐）
+                if i % 7 != 3:
+                    aggregates.record(timestamp, {ore_name: strategies}, position)
+
+        history = pd.read_csv(os.path.join(directory, "strategy_history.csv"))
+        _check(aggregates, history)
+        # 从磁盘重新加载与重建得到相同结果
+        _check(StrategyAggregates(directory, "csv"), history)
+        aggregates.rebuild()
+        _check(aggregates, history)
+
+
+def test_columnar_aggregates_match_groupby():
+    with tempfile.TemporaryDirectory() as directory:
+        saved, history_store.STORE_DIR = history_store.STORE_DIR, os.path.join(directory, "store")
+        try:
+            aggregates = StrategyAggregates(directory, "columnar")
+            for i, (timestamp, strategies_by_ore) in enumerate(_evaluations()):
+                position = history_store.write_strategy_snapshot(timestamp, strategies_by_ore)
+                if i % 7 != 3:
+                    aggregates.record(timestamp, strategies_by_ore, position)
+
+            history = history_store.load_strategy_history()
+            assert len(history) == 300 * len(ORES) * len(STRATEGIES)
+            _check(aggregates, history)
+            aggregates.rebuild()
+            _check(aggregates, history)
+        finally:
+            history_store.STORE_DIR = saved
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
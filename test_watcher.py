@@ -0,0 +1,69 @@
+import os
+import tempfile
+from watcher import ExportWatcher
+
+
+def _lines(start, stop):
+    return "".join(f"物品{i},{i * 100},{i % 7}\n" for i in range(start, stop))
+
+
+def test_export_written_in_several_flushes_is_one_snapshot():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "atr.csv")
+        watcher = ExportWatcher(directory)
+
+        # 3000 行分三次落盘，最后一行不以换行结尾
+        with open(path, 'w', encoding='utf-8') as f:
+            for start in (0, 1000, 2000):
+                f.write(_lines(start, start + 1000))
+                f.flush()
+                assert watcher.poll() == []
+            f.write("物品3000,300000,1")
+            f.flush()
+            assert watcher.poll() == []
+
+        updates = watcher.poll()
+        assert len(updates) == 1
+        file_path, text = updates[0]
+        assert file_path == path
+        assert len(text.splitlines()) == 3001
+        assert text.endswith("物品3000,300000,1")
+        assert watcher.poll() == []
+
+
+def test_appended_export_reads_only_new_rows():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "atr.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_lines(0, 10))
+        watcher = ExportWatcher(path)
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(_lines(10, 15))
+        assert watcher.poll() == []
+        [(_, text)] = watcher.poll()
+        assert text == _lines(10, 15)
+
+
+def test_rewritten_export_is_read_from_start():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "atr.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_lines(0, 10))
+        watcher = ExportWatcher(directory, process_existing=True)
+        assert watcher.poll() == []
+        [(_, text)] = watcher.poll()
+        assert text == _lines(0, 10)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_lines(100, 105))
+        assert watcher.poll() == []
+        [(_, text)] = watcher.poll()
+        assert text == _lines(100, 105)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,249 @@
+import numpy as np
+from config import TAX_RATE, CRIT_RATE, MINING_TIME_PER_ORE
+from recipe_graph import get_recipe_graph
+from strategy import strategy_entry, build_results
+
+
+class VectorizedEvaluator:
+    """矩阵化策略评估器
+
+    配方表在初始化时一次性编译为稠密的产出、材料、分解矩阵，
+    之后每次评估只需对价格向量做几次矩阵乘法即可得到所有 (矿石, 策略) 的收益。
+    价格可以带任意前导维度（例如 时间 × 物品），用于批量评估。
+    """
+
+    def __init__(self, graph=None, max_crafts_per_hour=720):
+        self.graph = graph if graph is not None else get_recipe_graph()
+        self.max_crafts_per_hour = max_crafts_per_hour
+        self.mining_cycles_per_hour = int(3600 / MINING_TIME_PER_ORE)
+        # (物品编号表, 本评估器物品在该表中的编号)
+        self._table_cache = None
+        self._compile()
+
+    def _compile(self):
+        """将配方图编译为矩阵（物品编号与配方图一致）"""
+        graph = self.graph
+        self.ores = graph.ores
+        self.recipes = graph.recipe_names
+        self.items = graph.items
+        self.item_index = graph.item_ids
+
+        n_ore, n_recipe, n_item = len(self.ores), len(self.recipes), len(self.items)
+        cycles = self.mining_cycles_per_hour
+
+        self.ore_item_index = np.array([self.item_index[ore] for ore in self.ores], dtype=np.intp)
+
+        # 产出矩阵：每小时期望产出数量 (矿石 × 物品)
+        self.yield_matrix = np.zeros((n_ore, n_item))
+        yield_mask = np.zeros((n_ore, n_item), dtype=bool)
+        for o, ore_name in enumerate(self.ores):
+            for item, prob in graph.ore_outputs[ore_name]:
+                self.yield_matrix[o, self.item_index[item]] = float(prob) * float(cycles)
+                yield_mask[o, self.item_index[item]] = True
+
+        # 材料矩阵、分解矩阵 (配方 × 物品)，制作成本 (铜币)
+        self.material_matrix = np.zeros((n_recipe, n_item))
+        material_mask = np.zeros((n_recipe, n_item), dtype=bool)
+        self.disenchant_matrix = np.zeros((n_recipe, n_item))
+        self.recipe_cost = np.zeros(n_recipe)
+        for recipe in graph.recipes.values():
+            for material, needed in recipe.materials:
+                self.material_matrix[recipe.id, self.item_index[material]] = needed
+                material_mask[recipe.id, self.item_index[material]] = True
+            for material, quantity in recipe.disenchant:
+                self.disenchant_matrix[recipe.id, self.item_index[material]] = quantity
+            self.recipe_cost[recipe.id] = recipe.cost
+
+        # 相关性：配方是否使用该矿石的产出材料 (矿石 × 配方)，来自配方图的索引
+        self.relevance = np.zeros((n_ore, n_recipe), dtype=bool)
+        for o, ore_name in enumerate(self.ores):
+            for recipe_name in graph.relevant_recipes(ore_name):
+                self.relevance[o, graph.recipes[recipe_name].id] = True
+
+        # 各策略可用材料数量：仅炸矿 / 炸矿+采购补充 / 纯采购
+        mined = np.where(yield_mask, self.yield_matrix, 0.0)[:, None, :]
+        supplemented = np.where(yield_mask, self.yield_matrix, np.inf)[:, None, :]
+        purchased = np.full((1, 1, n_item), np.inf)
+
+        self._crafting = self._compile_variant(mined, yield_mask[:, None, :], material_mask)
+        self._hybrid = self._compile_variant(supplemented, True, material_mask)
+        purchase = self._compile_variant(purchased, True, material_mask)
+        self._purchase = tuple(matrix[0] for matrix in purchase)
+
+    def _compile_variant(self, quantities, in_stock, material_mask):
+        """按材料数量计算制作次数，并折算为 分解产出/税后材料/税前材料/固定成本 四个系数矩阵"""
+        needed = self.material_matrix[None, :, :]
+        quantities = np.broadcast_to(quantities, np.broadcast_shapes(quantities.shape, needed.shape))
+
+        # 可制作次数（受材料与每小时制作次数限制）
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(needed > 0, quantities / np.where(needed > 0, needed, 1.0), np.inf)
+        crafts = np.minimum(ratio.min(axis=2), self.max_crafts_per_hour)
+        used = needed * crafts[:, :, None]
+
+        # 自有材料按税后机会成本计价，其余按采购价计价
+        taxed = material_mask[None, :, :] & in_stock & (quantities >= used)
+        used_taxed = np.where(taxed, used, 0.0)
+        used_untaxed = np.where(taxed, 0.0, used)
+
+        disenchant = self.disenchant_matrix[None, :, :] * crafts[:, :, None]
+        fixed_cost = self.recipe_cost[None, :] * crafts
+        return disenchant, used_taxed, used_untaxed, fixed_cost
+
+    def price_vector(self, market_data):
+        """将市场数据转为价格向量（铜币）与存在掩码"""
+        if hasattr(market_data, "gather"):
+            # MarketSnapshot：按物品编号直接从数组中取价
+            prices, present = market_data.gather(self._table_ids(market_data.table))
+            return prices.astype(float), present
+        prices = np.zeros(len(self.items))
+        present = np.zeros(len(self.items), dtype=bool)
+        for name, i in self.item_index.items():
+            item = market_data.get(name)
+            if item is not None:
+                prices[i] = item.price
+                present[i] = True
+        return prices, present
+
+    def _table_ids(self, table):
+        """本评估器物品在快照物品编号表中的编号（按编号表缓存）"""
+        cached = self._table_cache
+        if cached is None or cached[0] is not table:
+            cached = self._table_cache = (table, np.array(table.ids_for(self.items), dtype=np.int64))
+        return cached[1]
+
+    @staticmethod
+    def _apply(prices, matrix):
+        """prices (..., 物品) 与 matrix (..., 物品) 的批量点积"""
+        flat = matrix.reshape(-1, matrix.shape[-1])
+        return (prices @ flat.T).reshape(prices.shape[:-1] + matrix.shape[:-1])
+
+    def _variant_profit(self, prices, variant, tax, crit):
+        disenchant, used_taxed, used_untaxed, fixed_cost = variant
+        extra = (slice(None),) + (None,) * (disenchant.ndim - 1)
+        net = (1.0 + crit[extra]) * (1.0 - tax[extra]) * self._apply(prices, disenchant)
+        net = net - (1.0 - tax[extra]) * self._apply(prices, used_taxed)
+        return net - self._apply(prices, used_untaxed) - fixed_cost
+
+    def evaluate(self, prices, present=None, tax_rate=TAX_RATE, crit_rate=CRIT_RATE):
+        """批量评估所有策略
+
+        prices: (..., 物品) 铜币价格；present: 同形状布尔掩码，缺省视为全部存在。
+        tax_rate / crit_rate 可以是标量，或与前导维度同形状的数组。
+        返回金币收益数组（已取整到铜）：mining (..., 矿石)、crafting / hybrid (..., 矿石, 配方)、
+        purchase (..., 配方)；矿石缺失时其炸矿相关策略为 NaN。
+        """
+        results = self._evaluate(prices, present, tax_rate, crit_rate)
+        return {key: np.rint(value) / 10000.0 for key, value in results.items()}
+
+    def evaluate_copper(self, prices, present=None, tax_rate=TAX_RATE, crit_rate=CRIT_RATE):
+        """批量评估，返回 (int64 铜币策略表 (..., 矿石, 策略), 有效掩码)，列顺序同 strategy_names()"""
+        return self.round_table(self.strategy_table(self._evaluate(prices, present, tax_rate, crit_rate)))
+
+    @staticmethod
+    def round_table(table):
+        """铜币策略表取整为 int64（无效项为0），返回 (表, 有效掩码)"""
+        valid = ~np.isnan(table)
+        return np.where(valid, np.rint(table), 0).astype(np.int64), valid
+
+    def _evaluate(self, prices, present, tax_rate, crit_rate):
+        """未取整的铜币收益（缺失为 NaN）"""
+        prices = np.asarray(prices, dtype=float)
+        lead = prices.shape[:-1]
+        flat_prices = prices.reshape(-1, prices.shape[-1])
+        tax = np.broadcast_to(np.asarray(tax_rate, dtype=float), lead).reshape(-1)
+        crit = np.broadcast_to(np.asarray(crit_rate, dtype=float), lead).reshape(-1)
+
+        if present is None:
+            ore_present = np.ones((flat_prices.shape[0], len(self.ores)), dtype=bool)
+        else:
+            present = np.broadcast_to(np.asarray(present, dtype=bool), prices.shape)
+            ore_present = present.reshape(-1, prices.shape[-1])[:, self.ore_item_index]
+
+        # 炸矿收益（税后产出 - 矿石成本）
+        revenue = (1.0 - tax[:, None]) * (flat_prices @ self.yield_matrix.T)
+        ore_cost = flat_prices[:, self.ore_item_index] * self.mining_cycles_per_hour
+        mining = np.where(ore_present, revenue - ore_cost, 0.0)
+
+        # 炸矿+制作、混合策略 = 炸矿收益 + 制作分解净收益
+        crafting = mining[:, :, None] + self._variant_profit(flat_prices, self._crafting, tax, crit)
+        hybrid = mining[:, :, None] + self._variant_profit(flat_prices, self._hybrid, tax, crit)
+        valid = ore_present[:, :, None] & self.relevance[None, :, :]
+        crafting = np.where(valid, crafting, np.nan)
+        hybrid = np.where(valid, hybrid, np.nan)
+
+        # 纯采购+制作（与矿石无关）
+        purchase = self._variant_profit(flat_prices, self._purchase, tax, crit)
+
+        n_ore, n_recipe = len(self.ores), len(self.recipes)
+        return {
+            "mining": mining.reshape(lead + (n_ore,)),
+            "crafting": crafting.reshape(lead + (n_ore, n_recipe)),
+            "hybrid": hybrid.reshape(lead + (n_ore, n_recipe)),
+            "purchase": purchase.reshape(lead + (n_recipe,)),
+        }
+
+    def strategy_names(self):
+        """按评估顺序返回 (策略名称, 类型) 列表，与 StrategyEvaluator 的顺序一致"""
+        names = [("纯炸矿", "mining")]
+        for recipe_name in self.recipes:
+            names.append((f"炸矿+制作{recipe_name}", "crafting"))
+            names.append((f"混合+制作{recipe_name}", "hybrid"))
+        for recipe_name in self.recipes:
+            names.append((f"采购+制作{recipe_name}", "purchase"))
+        return names
+
+    def strategy_table(self, results):
+        """将评估结果排列为 (..., 矿石, 策略) 数组，列顺序同 strategy_names()"""
+        mining = results["mining"]
+        paired = np.stack([results["crafting"], results["hybrid"]], axis=-1)
+        paired = paired.reshape(paired.shape[:-2] + (-1,))
+        purchase = np.broadcast_to(results["purchase"][..., None, :],
+                                   mining.shape + (len(self.recipes),))
+        return np.concatenate([mining[..., None], paired, purchase], axis=-1)
+
+    @staticmethod
+    def best_index(table, valid=None):
+        """最优策略列号（并列时取靠前者，与逐个比较的结果一致）
+
+        table 为浮点表时以 NaN 表示无效；为整数铜币表时需给出有效掩码 valid。
+        """
+        if valid is None:
+            return np.argmax(np.where(np.isnan(table), -np.inf, table), axis=-1)
+        return np.argmax(np.where(valid, table, np.iinfo(np.int64).min), axis=-1)
+
+    def evaluate_snapshot(self, market_data):
+        """评估单个市场快照，返回 {矿石: 结果}，格式同 ProfitCalculator.evaluate_strategies"""
+        prices, present = self.price_vector(market_data)
+        results = self._evaluate(prices, present, TAX_RATE, CRIT_RATE)
+        table, valid = self.round_table(self.strategy_table(results))
+        best = self.best_index(table, valid)
+        names = self.strategy_names()
+
+        snapshot_results = {}
+        for o, ore_name in enumerate(self.ores):
+            all_strategies = {}
+            for s, (strategy_name, strategy_type) in enumerate(names):
+                if valid[o, s]:
+                    all_strategies[strategy_name] = strategy_entry(int(table[o, s]), strategy_type)
+
+            total_ore_cost = prices[self.ore_item_index[o]] * self.mining_cycles_per_hour
+            if not present[self.ore_item_index[o]]:
+                total_ore_cost = 0.0
+            mining_profit = float(results["mining"][o])
+            mining_profit_pct = (mining_profit / total_ore_cost) * 100.0 if total_ore_cost > 0 else 0.0
+
+            snapshot_results[ore_name] = build_results(all_strategies, names[best[o]][0], mining_profit_pct)
+
+        return snapshot_results
+
+
+_default_evaluator = None
+
+
+def get_vectorized_evaluator():
+    """获取基于共享配方图编译的评估器（每个进程只编译一次）"""
+    global _default_evaluator
+    if _default_evaluator is None:
+        _default_evaluator = VectorizedEvaluator()
+    return _default_evaluator
@@ -0,0 +1,108 @@
+import os
+import time
+
+
+class ExportWatcher:
+    """监视 Auctionator (ATR) 导出文件或目录，增量读取新写入的数据
+
+    path 为目录时监视其中所有匹配后缀的文件，为文件时只监视该文件。
+    文件被追加时只读取新增部分；被重写（内容与已读部分不一致或变小）时从头读取。
+    文件大小与修改时间稳定一个轮询周期后才读取，分多次落盘的导出作为一个快照整体读取。
+    """
+
+    def __init__(self, path, poll_interval=0.05, suffix=".csv", process_existing=False):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.suffix = suffix
+        # 文件路径 -> {"offset", "size", "mtime", "tail", "consumed"}
+        self._states = {}
+
+        if not process_existing:
+            for file_path in self._list_files():
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                self._states[file_path] = {
+                    "offset": stat.st_size,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "tail": self._read_tail(file_path, stat.st_size),
+                    "consumed": True
+                }
+
+    def _list_files(self):
+        if os.path.isdir(self.path):
+            return [os.path.join(self.path, name) for name in sorted(os.listdir(self.path))
+                    if name.lower().endswith(self.suffix)]
+        if os.path.isfile(self.path):
+            return [self.path]
+        return []
+
+    @staticmethod
+    def _read_tail(file_path, offset, length=64):
+        """读取 offset 之前的一小段内容，用于判断文件是否被重写"""
+        start = max(0, offset - length)
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            return f.read(offset - start)
+
+    def _read_new(self, file_path, stat):
+        state = self._states.get(file_path)
+        if state is None:
+            state = {"offset": 0, "size": -1, "mtime": None, "tail": b"", "consumed": False}
+            self._states[file_path] = state
+
+        # 文件仍在写入：记下大小与修改时间，等下次轮询确认没有再变化后再读取
+        if stat.st_size != state["size"] or stat.st_mtime_ns != state["mtime"]:
+            state["size"] = stat.st_size
+            state["mtime"] = stat.st_mtime_ns
+            state["consumed"] = False
+            return None
+        if state["consumed"]:
+            return None
+        state["consumed"] = True
+
+        # 文件变小或已读部分被改写，视为新的导出，从头读取
+        offset = state["offset"]
+        if stat.st_size < offset or self._read_tail(file_path, offset) != state["tail"]:
+            offset = 0
+
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(stat.st_size - offset)
+        if not data:
+            return None
+
+        state["offset"] = offset + len(data)
+        state["tail"] = self._read_tail(file_path, state["offset"])
+        return data.decode('utf-8-sig', errors='replace')
+
+    def poll(self):
+        """检查一次，返回 [(文件路径, 新增文本)]"""
+        updates = []
+        for file_path in self._list_files():
+            try:
+                stat = os.stat(file_path)
+                text = self._read_new(file_path, stat)
+            except OSError:
+                continue  # 文件可能正在被替换，下次轮询再读
+            if text and text.strip():
+                updates.append((file_path, text))
+        return updates
+
+    def run(self, callback, stop_event=None, batch=False):
+        """持续监视，每有新数据立即调用 callback(文件路径, 文本)
+
+        batch 为 True 时每次轮询只调用一次 callback([(文件路径, 文本), ...])，
+        便于同时到达的多个导出一起处理。
+        """
+        while stop_event is None or not stop_event.is_set():
+            updates = self.poll()
+            if batch:
+                if updates:
+                    callback(updates)
+            else:
+                for file_path, text in updates:
+                    callback(file_path, text)
+            time.sleep(self.poll_interval)